@@ -0,0 +1,111 @@
+# benchmarks/bench_text_formatter.py
+"""
+Микробенчмарк экранирования MarkdownV2: короткие подписи кнопок и сводки заказа на 100 строк.
+Сравнивает utils.text_formatter.escape_markdown_v2 с прежней реализацией (19 replace подряд)
+и с однопроходными вариантами (str.translate, re.sub) и проверяет, что результаты совпадают.
+
+    python -m benchmarks.bench_text_formatter
+    python -m benchmarks.bench_text_formatter --repeat 7 --number 20000
+"""
+
+import argparse
+import random
+import re
+import string
+import timeit
+
+from utils.text_formatter import escape_markdown_v2
+
+
+def escape_markdown_v2_replace(text: str) -> str:
+    """
+    Прежняя реализация (19 последовательных str.replace) — эталон для сравнения.
+    """
+    if not isinstance(text, str):
+        text = str(text)
+    text = text.replace('\\', '\\\\')
+    for char in r'_*[]()~`>#+-=|{}.!':
+        text = text.replace(char, f'\\{char}')
+    return text
+
+
+_SPECIAL_CHARS = '\\' + r'_*[]()~`>#+-=|{}.!'
+_TRANSLATE_TABLE = str.maketrans({char: '\\' + char for char in _SPECIAL_CHARS})
+_SPECIAL_RE = re.compile('[' + re.escape(_SPECIAL_CHARS) + ']')
+
+
+def escape_markdown_v2_translate(text: str) -> str:
+    return str(text).translate(_TRANSLATE_TABLE)
+
+
+def escape_markdown_v2_regex(text: str) -> str:
+    return _SPECIAL_RE.sub(lambda match: '\\' + match.group(), str(text))
+
+
+IMPLEMENTATIONS = {
+    "replace": escape_markdown_v2_replace,
+    "translate": escape_markdown_v2_translate,
+    "regex": escape_markdown_v2_regex,
+    "current": escape_markdown_v2,
+}
+
+
+def make_labels(count: int, rng: random.Random) -> list[str]:
+    # Как в кнопках /my_orders и списках товаров: "Заказ #123 (01.02.2025) - ООО Ромашка"
+    return [
+        f"Заказ #{rng.randint(1, 99999)} ({rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2025) - "
+        f"{rng.choice(['ООО', 'ИП', 'ЗАО'])} {rng.choice(['Ромашка', 'Вектор-М', 'Альфа (опт)', 'Бета_2'])}"
+        for _ in range(count)
+    ]
+
+
+def make_summary(lines: int, rng: random.Random) -> str:
+    # Как сводка заказа/поступления: "- Товар 5 кг.: 2.5 x 120.00 = 300.00 грн."
+    return "\n".join(
+        f"- {rng.choice(['Сахар', 'Мука в/с', 'Масло [пром.]', 'Соль *йод*'])} {rng.randint(1, 50)} кг.: "
+        f"{rng.randint(1, 20)}.{rng.randint(0, 9)} x {rng.randint(10, 999)}.00 = {rng.randint(10, 9999)}.00 грн."
+        for _ in range(lines)
+    )
+
+
+def check_identical(rng: random.Random):
+    alphabet = string.printable + "абвгдеёжзАБВГ№«»—"
+    samples = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 200))) for _ in range(2000)]
+    samples += [r'_*[]()~`>#+-=|{}.!\\', "\\_", "", 12345, 12.5]
+    for sample in samples:
+        expected = escape_markdown_v2_replace(sample)
+        for name, func in IMPLEMENTATIONS.items():
+            actual = func(sample)
+            assert actual == expected, f"{name}: расхождение для {sample!r}: {actual!r} != {expected!r}"
+
+
+def bench(name: str, func, texts: list, repeat: int, number: int):
+    timings = timeit.repeat(lambda: [func(text) for text in texts], repeat=repeat, number=number)
+    per_call = min(timings) / number / len(texts)
+    print(f"  {name:<10} {per_call * 1e6:8.3f} мкс/вызов")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарк escape_markdown_v2")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    check_identical(rng)
+    print("Результаты всех реализаций совпадают")
+
+    cases = {
+        "подписи кнопок (50 шт.)": (make_labels(50, rng), args.number),
+        "названия без спецсимволов (50 шт.)": (["Сахар белый 50 кг"] * 50, args.number),
+        "сводка на 100 строк": ([make_summary(100, rng)], max(1, args.number // 10)),
+    }
+    for title, (texts, number) in cases.items():
+        print(f"\n{title}:")
+        timings = {name: bench(name, func, texts, args.repeat, number) for name, func in IMPLEMENTATIONS.items()}
+        print(f"  current относительно replace: x{timings['replace'] / timings['current']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+# benchmarks/load_test.py
+"""
+Нагрузочный тест диспетчера бота: синтетические апдейты сценариев /new_order, /add_delivery
+и /my_orders проходят через настоящий Dispatcher из main.py (middlewares, роутеры, FSM-хранилище,
+PostgreSQL). Запросы к Telegram перехватывает FakeSession с настраиваемой задержкой.
+
+Запуск из корня проекта (БД берется из .env — используйте отдельную локальную базу,
+тест создает заказы, поступления и служебные записи с пометкой [load-test]):
+
+    python -m db.migrate
+    python -m benchmarks.load_test --chats 20 --iterations 5 --latency 0.05
+    python -m benchmarks.load_test --flows my_orders --chats 100 --iterations 20
+
+Отчет по каждому сценарию: апдейтов в секунду, p50/p99 времени обработки апдейта,
+SQL-запросов и вызовов Telegram API на апдейт.
+"""
+
+import argparse
+import asyncio
+import datetime
+import itertools
+import statistics
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetMe, TelegramMethod
+from aiogram.types import Chat, Message, Update, User
+from sqlalchemy import event, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.future import select
+
+from db.fsm_storage import create_fsm_storage
+from db.models import Address, Client, Employee, Product, Supplier
+from db.setup import AsyncSessionLocal, engine
+from main import create_dispatcher
+from middlewares.send_queue import SendQueueMiddleware
+
+BOT_ID = 1000001
+FIXTURE_TAG = "[load-test]"
+
+
+class FakeSession(BaseSession):
+    """
+    Сессия бота без сети: записывает вызовы API и отвечает правдоподобными объектами
+    после искусственной задержки latency.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._message_ids = itertools.count(1000)
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: int | None = None):
+        self.calls[type(method).__name__] += 1
+        current_update_api_calls.set(current_update_api_calls.get() + 1)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if isinstance(method, GetMe):
+            return User(id=BOT_ID, is_bot=True, first_name="LoadTestBot", username="load_test_bot")
+        returning = str(method.__returning__)
+        if "Message" in returning:
+            chat_id = getattr(method, "chat_id", None) or 0
+            return Message(
+                message_id=getattr(method, "message_id", None) or next(self._message_ids),
+                date=datetime.datetime.now(),
+                chat=Chat(id=chat_id, type="private"),
+                from_user=User(id=BOT_ID, is_bot=True, first_name="LoadTestBot"),
+                text=getattr(method, "text", None) or "",
+            )
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+# Счетчики текущего апдейта (contextvar виден и в событиях SQLAlchemy, и в FakeSession)
+current_update_sql: ContextVar[int] = ContextVar("current_update_sql", default=0)
+current_update_api_calls: ContextVar[int] = ContextVar("current_update_api_calls", default=0)
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _count_sql(conn, cursor, statement, parameters, context, executemany):
+    current_update_sql.set(current_update_sql.get() + 1)
+
+
+@dataclass
+class Fixtures:
+    client_id: int
+    client_name: str
+    address_id: int
+    product_id: int
+    supplier_id: int
+
+
+@dataclass
+class FlowStats:
+    latencies: list = field(default_factory=list)
+    sql: list = field(default_factory=list)
+    api_calls: list = field(default_factory=list)
+    errors: int = 0
+
+
+async def prepare_fixtures(user_ids: list[int]) -> Fixtures:
+    """
+    Создает сотрудников для синтетических чатов и справочные записи для сценариев (если их еще нет).
+    """
+    async with AsyncSessionLocal() as session:
+        await session.execute(pg_insert(Employee).values([
+            {"name": f"{FIXTURE_TAG} сотрудник {user_id}", "role": "admin", "id_telegram": user_id}
+            for user_id in user_ids
+        ]).on_conflict_do_nothing(index_elements=[Employee.id_telegram]))
+
+        client_name = f"{FIXTURE_TAG} Клиент"
+        client_id = (await session.execute(select(Client.client_id).where(Client.name == client_name))).scalar()
+        if client_id is None:
+            client_id = (await session.execute(
+                insert(Client).values(name=client_name).returning(Client.client_id))).scalar_one()
+        address_id = (await session.execute(select(Address.address_id).where(Address.client_id == client_id))).scalar()
+        if address_id is None:
+            address_id = (await session.execute(insert(Address).values(
+                client_id=client_id, address_text=f"{FIXTURE_TAG} адрес").returning(Address.address_id))).scalar_one()
+
+        supplier_name = f"{FIXTURE_TAG} Поставщик"
+        supplier_id = (await session.execute(select(Supplier.supplier_id).where(Supplier.name == supplier_name))).scalar()
+        if supplier_id is None:
+            supplier_id = (await session.execute(
+                insert(Supplier).values(name=supplier_name).returning(Supplier.supplier_id))).scalar_one()
+
+        product_name = f"{FIXTURE_TAG} Товар"
+        product_id = (await session.execute(select(Product.product_id).where(Product.name == product_name))).scalar()
+        if product_id is None:
+            product_id = (await session.execute(insert(Product).values(
+                name=product_name, supplier_id=supplier_id, price=100, cost_per_unit=60
+            ).returning(Product.product_id))).scalar_one()
+
+        await session.commit()
+    return Fixtures(client_id=client_id, client_name=client_name, address_id=address_id,
+                    product_id=product_id, supplier_id=supplier_id)
+
+
+class UpdateFactory:
+    """
+    Строит апдейты от имени сотрудника в личном чате (chat_id == user_id).
+    """
+
+    _update_ids = itertools.count(1)
+    _message_ids = itertools.count(1)
+
+    def __init__(self, user_id: int):
+        self.user = User(id=user_id, is_bot=False, first_name="Load", last_name=str(user_id))
+        self.chat = Chat(id=user_id, type="private")
+
+    def message(self, text: str) -> Update:
+        return Update(update_id=next(self._update_ids), message=Message(
+            message_id=next(self._message_ids), date=datetime.datetime.now(),
+            chat=self.chat, from_user=self.user, text=text,
+        ))
+
+    def callback(self, data: str) -> Update:
+        bot_message = Message(
+            message_id=next(self._message_ids), date=datetime.datetime.now(), chat=self.chat,
+            from_user=User(id=BOT_ID, is_bot=True, first_name="LoadTestBot"), text="…",
+        )
+        return Update(update_id=next(self._update_ids), callback_query={
+            "id": str(next(self._update_ids)), "from": self.user.model_dump(), "chat_instance": str(self.chat.id),
+            "message": bot_message.model_dump(), "data": data,
+        })
+
+
+def new_order_flow(f: UpdateFactory, fx: Fixtures, iteration: int) -> list[Update]:
+    return [
+        f.message("/new_order"),
+        f.message(fx.client_name),
+        # У клиента фикстуры один адрес — send_address_options выбирает его сам
+        f.callback(f"select_client_{fx.client_id}"),
+        f.callback(f"select_product_order_{fx.product_id}"),
+        f.message("2"),
+        f.callback("complete_order_creation"),
+        f.callback("confirm_and_save_order"),
+    ]
+
+
+def add_delivery_flow(f: UpdateFactory, fx: Fixtures, iteration: int) -> list[Update]:
+    return [
+        f.message("/add_delivery"),
+        f.callback(f"select_supplier_{fx.supplier_id}"),
+        f.callback(f"select_date_{datetime.date.today().isoformat()}"),
+        f.message(f"LT-{f.chat.id}-{iteration}-{time.time_ns()}"), # Номер накладной уникален
+        f.callback(f"select_product_add_{fx.product_id}"),
+        f.message("5"),
+        f.message("60.5"),
+        f.callback("complete_receipt"),
+        f.callback("confirm_save_receipt"),
+    ]
+
+
+def my_orders_flow(f: UpdateFactory, fx: Fixtures, iteration: int) -> list[Update]:
+    return [
+        f.message("/my_orders"),
+        f.callback("cancel_order_editing"),
+    ]
+
+
+FLOWS = {
+    "new_order": new_order_flow,
+    "add_delivery": add_delivery_flow,
+    "my_orders": my_orders_flow,
+}
+
+
+async def run_chat(dp, bot: Bot, flow, user_id: int, fixtures: Fixtures, iterations: int, stats: FlowStats):
+    factory = UpdateFactory(user_id)
+    for iteration in range(iterations):
+        for update in flow(factory, fixtures, iteration):
+            sql_token = current_update_sql.set(0)
+            api_token = current_update_api_calls.set(0)
+            started = time.perf_counter()
+            try:
+                await dp.feed_update(bot, update)
+            except Exception:
+                stats.errors += 1
+            stats.latencies.append(time.perf_counter() - started)
+            stats.sql.append(current_update_sql.get())
+            stats.api_calls.append(current_update_api_calls.get())
+            current_update_sql.reset(sql_token)
+            current_update_api_calls.reset(api_token)
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def print_report(name: str, stats: FlowStats, elapsed: float, chats: int):
+    count = len(stats.latencies)
+    print(f"\n== {name}: {chats} чатов, {count} апдейтов за {elapsed:.2f} с ==")
+    print(f"  апдейтов/с:        {count / elapsed:.1f}")
+    print(f"  задержка p50/p99:  {percentile(stats.latencies, 0.5) * 1000:.1f} / "
+          f"{percentile(stats.latencies, 0.99) * 1000:.1f} мс")
+    print(f"  SQL на апдейт:     {statistics.mean(stats.sql):.1f} (макс. {max(stats.sql)})")
+    print(f"  API на апдейт:     {statistics.mean(stats.api_calls):.1f} (макс. {max(stats.api_calls)})")
+    if stats.errors:
+        print(f"  ошибок:            {stats.errors}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест диспетчера бота")
+    parser.add_argument("--flows", default=",".join(FLOWS), help="Сценарии через запятую: " + ", ".join(FLOWS))
+    parser.add_argument("--chats", type=int, default=10, help="Одновременных чатов (сотрудников)")
+    parser.add_argument("--iterations", type=int, default=3, help="Прохождений сценария каждым чатом")
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа Telegram API, с")
+    parser.add_argument("--user-id-base", type=int, default=9_000_000_000, help="id_telegram первого сотрудника")
+    parser.add_argument("--send-queue", action="store_true", help="Включить очередь отправки с лимитами Telegram")
+    args = parser.parse_args()
+
+    flows = [name.strip() for name in args.flows.split(",") if name.strip()]
+    unknown = set(flows) - set(FLOWS)
+    if unknown:
+        parser.error(f"Неизвестные сценарии: {', '.join(sorted(unknown))}")
+
+    session = FakeSession(latency=args.latency)
+    if args.send_queue:
+        session.middleware(SendQueueMiddleware())
+    bot = Bot(token=f"{BOT_ID}:load-test", session=session)
+    dp = create_dispatcher(await create_fsm_storage())
+    await dp.emit_startup(bot=bot, dispatcher=dp) # Проверка схемы БД, прогрев кэшей — как при запуске бота
+
+    user_ids = [args.user_id_base + i for i in range(args.chats)]
+    fixtures = await prepare_fixtures(user_ids)
+
+    try:
+        for name in flows:
+            stats = FlowStats()
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                run_chat(dp, bot, FLOWS[name], user_id, fixtures, args.iterations, stats)
+                for user_id in user_ids
+            ))
+            print_report(name, stats, time.perf_counter() - started, args.chats)
+        print("\nВызовы Telegram API:", dict(session.calls.most_common()))
+    finally:
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,6 +4,12 @@ import os
 
 load_dotenv()
 
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
 class Settings:
     BOT_TOKEN: str = os.getenv("BOT_TOKEN")
     DB_HOST: str = os.getenv("DB_HOST")
@@ -12,4 +18,110 @@ class Settings:
     DB_USER: str = os.getenv("DB_USER")
     DB_PASSWORD: str = os.getenv("DB_PASSWORD")
 
+    # Получение апдейтов: 'polling' (по умолчанию) или 'webhook'
+    BOT_MODE: str = os.getenv("BOT_MODE", "polling")
+    WEBHOOK_BASE_URL: str = os.getenv("WEBHOOK_BASE_URL", "") # Внешний адрес (https://bot.example.com)
+    WEBHOOK_PATH: str = os.getenv("WEBHOOK_PATH", "/webhook")
+    WEBHOOK_SECRET: str = os.getenv("WEBHOOK_SECRET", "") # Обязателен в режиме webhook; проверяется в заголовке X-Telegram-Bot-Api-Secret-Token
+    WEBHOOK_DELETE_ON_SHUTDOWN: bool = _env_bool("WEBHOOK_DELETE_ON_SHUTDOWN", True)
+    WEBAPP_HOST: str = os.getenv("WEBAPP_HOST", "0.0.0.0")
+    WEBAPP_PORT: int = int(os.getenv("WEBAPP_PORT", 8080))
+    TELEGRAM_API_SERVER: str = os.getenv("TELEGRAM_API_SERVER", "") # Свой Bot API сервер или тестовая заглушка
+
+    # Метрики Prometheus: /metrics на METRICS_HOST:METRICS_PORT (в обоих режимах, не на порту вебхука)
+    METRICS_ENABLED: bool = _env_bool("METRICS_ENABLED", True)
+    METRICS_HOST: str = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", 9100))
+
+    # Очередь исходящих сообщений (лимиты Telegram: ~30 сообщений/с на бота, ~1/с в личный чат, 20/мин в группу)
+    SEND_QUEUE_ENABLED: bool = _env_bool("SEND_QUEUE_ENABLED", True)
+    SEND_GLOBAL_RATE: float = float(os.getenv("SEND_GLOBAL_RATE", 30))
+    SEND_CHAT_RATE: float = float(os.getenv("SEND_CHAT_RATE", 1))
+    SEND_CHAT_BURST: float = float(os.getenv("SEND_CHAT_BURST", 3)) # Несколько сообщений подряд без ожидания
+    SEND_GROUP_RATE: float = float(os.getenv("SEND_GROUP_RATE", 20 / 60))
+    SEND_MAX_RETRIES: int = int(os.getenv("SEND_MAX_RETRIES", 3))
+
+    # Логирование (utils/logging_setup.py)
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    # Уровни отдельных логгеров: "имя=УРОВЕНЬ,...". На INFO SQLAlchemy пишет каждый запрос независимо
+    # от echo; для выборочного логирования SQL используйте DB_SQL_LOG_SAMPLE_RATE (логгер 'db.sql').
+    LOG_LEVELS: str = os.getenv("LOG_LEVELS", "aiogram=INFO,aiohttp.client=WARNING,sqlalchemy.engine=WARNING")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text") # 'text' или 'json'
+    LOG_DEBUG_SAMPLE_RATE: float = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", 1)) # Доля записей DEBUG в логе, 0..1
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+
+    # Пул соединений и драйвер asyncpg
+    DB_ECHO: bool = _env_bool("DB_ECHO", False) # Логировать каждый SQL-запрос (только для отладки)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING: bool = _env_bool("DB_POOL_PRE_PING", True)
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", 100))
+    DB_COMMAND_TIMEOUT: float = float(os.getenv("DB_COMMAND_TIMEOUT", 30))
+    DB_SQL_LOG_SAMPLE_RATE: float = float(os.getenv("DB_SQL_LOG_SAMPLE_RATE", 0)) # Доля SQL-запросов в логе, 0..1
+    # Применять миграции при старте бота (для локальной разработки; в проде — python -m db.migrate перед запуском)
+    DB_MIGRATE_ON_STARTUP: bool = _env_bool("DB_MIGRATE_ON_STARTUP", False)
+
+    # FSM-хранилище: 'postgres' (по умолчанию) или 'memory' (для локальной отладки)
+    FSM_STORAGE: str = os.getenv("FSM_STORAGE", "postgres")
+    FSM_STATE_TTL: float = float(os.getenv("FSM_STATE_TTL", 7 * 24 * 3600)) # Незавершенные сценарии хранятся неделю
+    # 0 — писать в БД сразу. В режиме вебхука за балансировщиком апдейты одного чата могут попасть
+    # в разные экземпляры бота, поэтому отложенная запись по умолчанию отключена.
+    FSM_FLUSH_INTERVAL: float = float(os.getenv("FSM_FLUSH_INTERVAL", 0 if BOT_MODE == "webhook" else 0.1))
+    FSM_CLEANUP_INTERVAL: float = float(os.getenv("FSM_CLEANUP_INTERVAL", 3600))
+    FSM_DB_POOL_SIZE: int = int(os.getenv("FSM_DB_POOL_SIZE", 5))
+
+    # Постраничный выбор товара
+    PRODUCT_PICKER_PAGE_SIZE: int = int(os.getenv("PRODUCT_PICKER_PAGE_SIZE", 20))
+    PRODUCT_PICKER_CACHE_PAGES: int = int(os.getenv("PRODUCT_PICKER_CACHE_PAGES", 256))
+
+    # Поиск клиентов: индекс имен в памяти процесса вместо запроса к pg_trgm
+    CLIENT_SEARCH_IN_MEMORY: bool = _env_bool("CLIENT_SEARCH_IN_MEMORY", False)
+    CLIENT_SEARCH_REFRESH_INTERVAL: float = float(os.getenv("CLIENT_SEARCH_REFRESH_INTERVAL", 300))
+
+    # Поиск товаров и инлайн-режим
+    PRODUCT_SEARCH_IN_MEMORY: bool = _env_bool("PRODUCT_SEARCH_IN_MEMORY", False)
+    PRODUCT_SEARCH_REFRESH_INTERVAL: float = float(os.getenv("PRODUCT_SEARCH_REFRESH_INTERVAL", 300))
+    INLINE_CACHE_TIME: int = int(os.getenv("INLINE_CACHE_TIME", 60)) # Секунды кэша ответа на инлайн-запрос
+
+    # Список /my_orders
+    MY_ORDERS_PAGE_SIZE: int = int(os.getenv("MY_ORDERS_PAGE_SIZE", 10))
+
+    # Отчет /accounts_receivable: сколько клиентов с наибольшим долгом показывать
+    RECEIVABLES_REPORT_LIMIT: int = int(os.getenv("RECEIVABLES_REPORT_LIMIT", 30))
+
+    # Касса: интервал снимков остатка со сверкой журнала (секунды, 0 — отключить)
+    CASH_SNAPSHOT_INTERVAL: float = float(os.getenv("CASH_SNAPSHOT_INTERVAL", 3600))
+
+    # Итоги оплат клиентов: интервал свертки оплат в дневные итоги (секунды, 0 — отключить)
+    PAYMENT_ROLLUP_INTERVAL: float = float(os.getenv("PAYMENT_ROLLUP_INTERVAL", 300))
+
+    # Отчет об остатках /inventory_report
+    STOCK_REPORT_PAGE_SIZE: int = int(os.getenv("STOCK_REPORT_PAGE_SIZE", 20))
+    STOCK_LOW_THRESHOLD: float = float(os.getenv("STOCK_LOW_THRESHOLD", 10)) # «Мало на складе»: остаток не больше
+    STOCK_REPORT_CACHE_SIZE: int = int(os.getenv("STOCK_REPORT_CACHE_SIZE", 256))
+    STOCK_REPORT_CACHE_TTL: float = float(os.getenv("STOCK_REPORT_CACHE_TTL", 300))
+    # Как часто проверять, не пора ли построить месячный снимок остатков (секунды, 0 — отключить)
+    STOCK_SNAPSHOT_INTERVAL: float = float(os.getenv("STOCK_SNAPSHOT_INTERVAL", 6 * 3600))
+
+    # Инвентаризация /adjust_inventory
+    STOCKTAKE_MAX_FILE_SIZE: int = int(os.getenv("STOCKTAKE_MAX_FILE_SIZE", 1024 * 1024)) # Байт
+    STOCKTAKE_PREVIEW_LIMIT: int = int(os.getenv("STOCKTAKE_PREVIEW_LIMIT", 40)) # Строк расхождений в сообщении
+
+    # Загрузка накладной поставщика файлом в /add_delivery
+    RECEIPT_IMPORT_MAX_FILE_SIZE: int = int(os.getenv("RECEIPT_IMPORT_MAX_FILE_SIZE", 5 * 1024 * 1024)) # Байт
+    RECEIPT_IMPORT_PREVIEW_LIMIT: int = int(os.getenv("RECEIPT_IMPORT_PREVIEW_LIMIT", 30)) # Позиций в сводке
+
+    # Выгрузки в CSV (/export_orders, /export_movements, /export_cash)
+    EXPORT_CHUNK_SIZE: int = int(os.getenv("EXPORT_CHUNK_SIZE", 2000)) # Строк за одну выборку из курсора
+
+    # Кэш сводки заказа в меню редактирования
+    ORDER_SUMMARY_CACHE_SIZE: int = int(os.getenv("ORDER_SUMMARY_CACHE_SIZE", 512))
+    ORDER_SUMMARY_CACHE_TTL: float = float(os.getenv("ORDER_SUMMARY_CACHE_TTL", 300))
+
+    # Кэш сотрудников для RoleMiddleware (секунды)
+    EMPLOYEE_CACHE_TTL: float = float(os.getenv("EMPLOYEE_CACHE_TTL", 300))
+    EMPLOYEE_NEGATIVE_CACHE_TTL: float = float(os.getenv("EMPLOYEE_NEGATIVE_CACHE_TTL", 30))
+
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,274 @@
+# db/fsm_storage.py
+
+import asyncio
+import datetime
+import json
+import logging
+import zlib
+from decimal import Decimal
+from typing import Any, Mapping
+
+import asyncpg
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey, StateType
+
+from config import settings
+
+ASYNCPG_DSN = (
+    f"postgresql://{settings.DB_USER}:{settings.DB_PASSWORD}@"
+    f"{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
+)
+
+_UNSET = object() # Поле записи не менялось с момента последнего сброса в БД
+
+# Данные длиннее порога сжимаются zlib. Первый байт — формат: b'j' JSON, b'z' сжатый JSON.
+_COMPRESS_THRESHOLD = 1024
+
+
+def _encode_value(value: Any) -> Any:
+    # datetime — подкласс date, поэтому проверяется первым
+    if isinstance(value, Decimal):
+        return {"$d": str(value)}
+    if isinstance(value, datetime.datetime):
+        return {"$t": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"$D": value.isoformat()}
+    raise TypeError(f"Тип {type(value).__name__} не поддерживается FSM-хранилищем")
+
+
+def _decode_object(obj: dict) -> Any:
+    if len(obj) == 1:
+        if "$d" in obj:
+            return Decimal(obj["$d"])
+        if "$t" in obj:
+            return datetime.datetime.fromisoformat(obj["$t"])
+        if "$D" in obj:
+            return datetime.date.fromisoformat(obj["$D"])
+    return obj
+
+
+def dump_data(data: Mapping[str, Any]) -> bytes:
+    """
+    Компактно сериализует данные FSM (включая Decimal, date и datetime из наших хэндлеров).
+    """
+    raw = json.dumps(data, default=_encode_value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if len(raw) > _COMPRESS_THRESHOLD:
+        return b"z" + zlib.compress(raw)
+    return b"j" + raw
+
+
+def load_data(blob: bytes | None) -> dict[str, Any]:
+    if not blob:
+        return {}
+    blob = bytes(blob)
+    raw = zlib.decompress(blob[1:]) if blob[:1] == b"z" else blob[1:]
+    return json.loads(raw, object_hook=_decode_object)
+
+
+_EMPTY_DATA = dump_data({}) # state.clear(): строка больше не нужна
+
+
+class PostgresStorage(BaseStorage):
+    """
+    FSM-хранилище в PostgreSQL (asyncpg): одна строка на (чат, пользователь).
+    Записи копятся в памяти и сбрасываются в БД пачкой раз в flush_interval,
+    так что несколько update_data/set_state одного апдейта дают одну запись.
+    Данные сериализуются сразу в set_data: ошибка получает хэндлер, который их записал.
+    Строки, не обновлявшиеся дольше state_ttl, периодически удаляются.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, table: str = "fsm_storage",
+                 state_ttl: float = 7 * 24 * 3600, flush_interval: float = 0.1,
+                 cleanup_interval: float = 3600):
+        self.pool = pool
+        self.table = table
+        self.state_ttl = state_ttl
+        self.flush_interval = flush_interval
+        self.cleanup_interval = cleanup_interval
+        self._pending: dict[StorageKey, list] = {}  # key -> [state, сериализованные data] ещё не записанные в БД
+        self._flushing: dict[StorageKey, list] = {} # записи, которые прямо сейчас пишутся в БД
+        self._flush_lock = asyncio.Lock()
+        self._tasks: list[asyncio.Task] = []
+
+        self._select_sql = (
+            f"SELECT state, data FROM {table} WHERE bot_id = $1 AND chat_id = $2 AND user_id = $3 "
+            "AND thread_id = $4 AND business_connection_id = $5 AND destiny = $6"
+        )
+        self._upsert_sql = (
+            f"INSERT INTO {table} (bot_id, chat_id, user_id, thread_id, business_connection_id, destiny, "
+            "state, data, updated_at) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, now()) "
+            "ON CONFLICT (bot_id, chat_id, user_id, thread_id, business_connection_id, destiny) DO UPDATE SET "
+            f"state = CASE WHEN $9 THEN EXCLUDED.state ELSE {table}.state END, "
+            f"data = CASE WHEN $10 THEN EXCLUDED.data ELSE {table}.data END, "
+            "updated_at = now()"
+        )
+        self._delete_sql = (
+            f"DELETE FROM {table} WHERE bot_id = $1 AND chat_id = $2 AND user_id = $3 "
+            "AND thread_id = $4 AND business_connection_id = $5 AND destiny = $6"
+        )
+
+    @classmethod
+    async def create(cls, dsn: str = ASYNCPG_DSN, **kwargs) -> "PostgresStorage":
+        """
+        Создает пул asyncpg и запускает фоновые задачи. Таблицу хранилища создает
+        ревизия db/migrations/r0009_fsm_storage.py.
+        """
+        pool = await asyncpg.create_pool(dsn, min_size=1, max_size=settings.FSM_DB_POOL_SIZE)
+        storage = cls(pool, **kwargs)
+        storage.start()
+        return storage
+
+    def start(self):
+        if self.flush_interval > 0:
+            self._tasks.append(asyncio.create_task(self._flush_loop()))
+        if self.cleanup_interval > 0 and self.state_ttl > 0:
+            self._tasks.append(asyncio.create_task(self._cleanup_loop()))
+
+    @staticmethod
+    def _key_args(key: StorageKey) -> tuple:
+        return (key.bot_id, key.chat_id, key.user_id, key.thread_id or 0,
+                key.business_connection_id or "", key.destiny)
+
+    def _local_record(self, key: StorageKey) -> tuple[Any, Any]:
+        """
+        Возвращает (state, сериализованные data) из еще не записанных в БД изменений;
+        _UNSET — если поле не менялось.
+        """
+        state, data = _UNSET, _UNSET
+        for records in (self._pending, self._flushing):
+            record = records.get(key)
+            if record is None:
+                continue
+            if state is _UNSET:
+                state = record[0]
+            if data is _UNSET:
+                data = record[1]
+        return state, data
+
+    async def _fetch(self, key: StorageKey) -> tuple[str | None, dict[str, Any]]:
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(self._select_sql, *self._key_args(key))
+        if row is None:
+            return None, {}
+        return row["state"], load_data(row["data"])
+
+    async def _write(self, key: StorageKey, state: Any = _UNSET, data: Any = _UNSET):
+        record = self._pending.setdefault(key, [_UNSET, _UNSET])
+        if state is not _UNSET:
+            record[0] = state
+        if data is not _UNSET:
+            record[1] = data
+        if self.flush_interval <= 0:
+            await self.flush()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._write(key, state=state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        state, _ = self._local_record(key)
+        if state is not _UNSET:
+            return state
+        state, _ = await self._fetch(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        await self._write(key, data=dump_data(data))
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, data = self._local_record(key)
+        if data is not _UNSET:
+            return load_data(data)
+        _, data = await self._fetch(key)
+        return data
+
+    async def flush(self):
+        """
+        Записывает все накопленные изменения в БД одним executemany на каждый тип операции.
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            self._flushing, self._pending = self._pending, {}
+            try:
+                upserts, deletes = [], []
+                for key, (state, data) in self._flushing.items():
+                    if state is None and data == _EMPTY_DATA:
+                        deletes.append(self._key_args(key))
+                        continue
+                    upserts.append((
+                        *self._key_args(key),
+                        None if state is _UNSET else state,
+                        None if data is _UNSET else data,
+                        state is not _UNSET,
+                        data is not _UNSET,
+                    ))
+                async with self.pool.acquire() as conn:
+                    async with conn.transaction():
+                        if upserts:
+                            await conn.executemany(self._upsert_sql, upserts)
+                        if deletes:
+                            await conn.executemany(self._delete_sql, deletes)
+            except Exception:
+                # Возвращаем записи в очередь, не затирая более свежие изменения
+                for key, (state, data) in self._flushing.items():
+                    record = self._pending.setdefault(key, [_UNSET, _UNSET])
+                    if record[0] is _UNSET:
+                        record[0] = state
+                    if record[1] is _UNSET:
+                        record[1] = data
+                raise
+            finally:
+                self._flushing = {}
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logging.error("PostgresStorage: ошибка при записи состояний FSM: %s", e, exc_info=True)
+
+    async def cleanup(self) -> int:
+        """
+        Удаляет состояния, которые не обновлялись дольше state_ttl. Возвращает число удаленных строк.
+        """
+        async with self.pool.acquire() as conn:
+            result = await conn.execute(
+                f"DELETE FROM {self.table} WHERE updated_at < now() - make_interval(secs => $1)",
+                float(self.state_ttl)
+            )
+        return int(result.split()[-1])
+
+    async def _cleanup_loop(self):
+        while True:
+            await asyncio.sleep(self.cleanup_interval)
+            try:
+                deleted = await self.cleanup()
+                if deleted:
+                    logging.info("PostgresStorage: удалено устаревших состояний FSM: %s", deleted)
+            except Exception as e:
+                logging.error("PostgresStorage: ошибка при очистке состояний FSM: %s", e, exc_info=True)
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        try:
+            await self.flush()
+        finally:
+            await self.pool.close()
+
+
+async def create_fsm_storage() -> BaseStorage:
+    """
+    Создает FSM-хранилище согласно настройке FSM_STORAGE ('postgres' или 'memory').
+    """
+    if settings.FSM_STORAGE == "memory":
+        from aiogram.fsm.storage.memory import MemoryStorage
+        return MemoryStorage()
+    return await PostgresStorage.create(
+        state_ttl=settings.FSM_STATE_TTL,
+        flush_interval=settings.FSM_FLUSH_INTERVAL,
+        cleanup_interval=settings.FSM_CLEANUP_INTERVAL,
+    )
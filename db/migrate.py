@@ -0,0 +1,195 @@
+# db/migrate.py
+"""
+Версионные миграции схемы БД.
+
+Ревизии — модули db/migrations/rNNNN_<название>.py с атрибутами revision (номер по порядку),
+description и корутиной upgrade(conn). Примененные ревизии записываются в таблицу schema_version.
+Бот при старте только сверяет версию схемы (check_schema_version), а применяет ревизии
+отдельная команда:
+
+    python -m db.migrate               # применить все новые ревизии
+    python -m db.migrate upgrade --to 2
+    python -m db.migrate current       # текущая версия схемы
+    python -m db.migrate history       # список ревизий
+
+Каждая ревизия выполняется в своей транзакции вместе с записью в schema_version.
+Ревизия с transactional = False выполняется в режиме AUTOCOMMIT — это нужно для
+CREATE INDEX CONCURRENTLY, который не блокирует запись в таблицу на время построения индекса.
+DDL таких ревизий должен быть идемпотентным (IF NOT EXISTS): при сбое часть выражений
+уже будет применена. Ревизии выполняются на отдельном движке без пула и без command_timeout
+(DB_COMMAND_TIMEOUT ограничивает только запросы бота). Базовая ревизия — зафиксированный DDL схемы на момент перехода
+на миграции (не create_all по текущим моделям), поэтому новая и обновляемая база проходят
+одни и те же ревизии. Изменения моделей оформляются новой ревизией; DDL пишется
+идемпотентно (IF NOT EXISTS), так как базы, созданные до миграций, уже содержат базовые таблицы.
+"""
+
+import argparse
+import asyncio
+import importlib
+import logging
+import pkgutil
+from types import ModuleType
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from config import settings
+from db.setup import DATABASE_URL, engine
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_PACKAGE = "db.migrations"
+# Ключ advisory-блокировки: две копии migrate не применяют ревизии одновременно
+MIGRATION_LOCK_KEY = 7_201_700_001
+
+# Отдельный движок для ревизий: без command_timeout пула бота (DB_COMMAND_TIMEOUT), который
+# обрывал бы построение индексов и заполнение больших таблиц, и без пула — соединения
+# нужны только на время миграции
+migration_engine = create_async_engine(
+    DATABASE_URL,
+    poolclass=NullPool,
+    connect_args={
+        "statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE,
+        "command_timeout": None,
+    },
+)
+
+SCHEMA_VERSION_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        revision integer PRIMARY KEY,
+        description text NOT NULL,
+        applied_at timestamptz NOT NULL DEFAULT now()
+    )
+"""
+
+
+class SchemaVersionError(RuntimeError):
+    """
+    Версия схемы БД не совпадает с ожидаемой ботом.
+    """
+
+
+def load_revisions() -> list[ModuleType]:
+    """
+    Импортирует модули ревизий и возвращает их по возрастанию номера (номера идут подряд с 1).
+    """
+    package = importlib.import_module(MIGRATIONS_PACKAGE)
+    revisions = [
+        importlib.import_module(f"{MIGRATIONS_PACKAGE}.{info.name}")
+        for info in pkgutil.iter_modules(package.__path__)
+        if info.name[:1] == "r" and info.name[1:5].isdigit()
+    ]
+    revisions.sort(key=lambda module: module.revision)
+    for expected, module in enumerate(revisions, start=1):
+        if module.revision != expected:
+            raise SchemaVersionError(f"Ревизии должны идти подряд: ожидалась {expected}, найдена {module.__name__}")
+    return revisions
+
+
+def head_revision() -> int:
+    revisions = load_revisions()
+    return revisions[-1].revision if revisions else 0
+
+
+async def get_current_revision(conn) -> int:
+    """
+    Текущая версия схемы (0 — миграции еще не применялись).
+    """
+    exists = (await conn.execute(text("SELECT to_regclass('schema_version') IS NOT NULL"))).scalar()
+    if not exists:
+        return 0
+    return (await conn.execute(text("SELECT coalesce(max(revision), 0) FROM schema_version"))).scalar()
+
+
+async def _record_revision(conn, module: ModuleType):
+    await conn.execute(
+        text("INSERT INTO schema_version (revision, description) VALUES (:revision, :description)"),
+        {"revision": module.revision, "description": module.description},
+    )
+
+
+async def upgrade(target: int | None = None) -> list[int]:
+    """
+    Применяет ревизии выше текущей версии (до target включительно) и возвращает их номера.
+    """
+    revisions = load_revisions()
+    applied = []
+    async with migration_engine.connect() as lock_conn:
+        # Сессионная блокировка без открытой транзакции: иначе ее снимок (backend_xmin) держит
+        # CREATE INDEX CONCURRENTLY в ожидании (Lock/virtualxid) до таймаута
+        lock_conn = await lock_conn.execution_options(isolation_level="AUTOCOMMIT")
+        await lock_conn.execute(text(f"SELECT pg_advisory_lock({MIGRATION_LOCK_KEY})"))
+        try:
+            async with migration_engine.begin() as conn:
+                await conn.execute(text(SCHEMA_VERSION_DDL))
+                current = await get_current_revision(conn)
+
+            for module in revisions:
+                if module.revision <= current or (target is not None and module.revision > target):
+                    continue
+                logger.info("Применяется ревизия %s: %s", module.revision, module.description)
+                if getattr(module, "transactional", True):
+                    async with migration_engine.begin() as conn:
+                        await module.upgrade(conn)
+                        await _record_revision(conn, module)
+                else:
+                    async with migration_engine.connect() as conn:
+                        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                        await module.upgrade(conn)
+                        await _record_revision(conn, module)
+                applied.append(module.revision)
+        finally:
+            await lock_conn.execute(text(f"SELECT pg_advisory_unlock({MIGRATION_LOCK_KEY})"))
+    return applied
+
+
+async def check_schema_version():
+    """
+    Проверка при старте бота: один короткий запрос вместо create_all.
+    Если схема отстает от ревизий в коде, бот не запускается.
+    """
+    head = head_revision()
+    async with engine.connect() as conn:
+        current = await get_current_revision(conn)
+    if current < head:
+        raise SchemaVersionError(
+            f"Схема БД устарела: версия {current}, требуется {head}. Выполните: python -m db.migrate"
+        )
+    if current > head:
+        logger.warning("Версия схемы БД (%s) новее ревизий в коде (%s) — бот старее базы", current, head)
+
+
+async def _show_history():
+    async with migration_engine.connect() as conn:
+        current = await get_current_revision(conn)
+    for module in load_revisions():
+        mark = "x" if module.revision <= current else " "
+        print(f"[{mark}] {module.revision:04d}  {module.description}")
+
+
+async def _main():
+    parser = argparse.ArgumentParser(prog="python -m db.migrate", description="Миграции схемы БД")
+    parser.add_argument("command", nargs="?", default="upgrade", choices=["upgrade", "current", "history"])
+    parser.add_argument("--to", type=int, default=None, help="Применить ревизии до указанной включительно")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "upgrade":
+            applied = await upgrade(args.to)
+            if applied:
+                print(f"Применены ревизии: {', '.join(map(str, applied))}")
+            else:
+                print("Новых ревизий нет")
+        elif args.command == "current":
+            async with migration_engine.connect() as conn:
+                print(f"Версия схемы: {await get_current_revision(conn)} (последняя ревизия: {head_revision()})")
+        else:
+            await _show_history()
+    finally:
+        await migration_engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(_main())
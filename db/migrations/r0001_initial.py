@@ -0,0 +1,258 @@
+# db/migrations/r0001_initial.py
+"""
+Базовая схема: таблицы и индексы db/models.py на момент перехода на миграции, зафиксированные
+явным DDL. Создание по текущим моделям (create_all) давало бы разную схему в новой и в
+обновляемой базе: объекты последующих ревизий появлялись бы раньше них. В существующей базе
+ничего не меняет (IF NOT EXISTS).
+"""
+
+from sqlalchemy import text
+
+revision = 1
+description = "Базовая схема (таблицы моделей)"
+
+DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS cash_flow (
+        transaction_id SERIAL NOT NULL,
+        transaction_date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        transaction_type VARCHAR NOT NULL,
+        amount NUMERIC(12, 2) NOT NULL,
+        description VARCHAR,
+        source_type VARCHAR,
+        source_id INTEGER,
+        current_balance NUMERIC(12, 2),
+        PRIMARY KEY (transaction_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_cash_flow_source ON cash_flow (source_type, source_id)",
+    "CREATE INDEX IF NOT EXISTS ix_cash_flow_source_id ON cash_flow (source_id)",
+    "CREATE INDEX IF NOT EXISTS ix_cash_flow_source_type ON cash_flow (source_type)",
+    "CREATE INDEX IF NOT EXISTS ix_cash_flow_transaction_date ON cash_flow (transaction_date)",
+    "CREATE INDEX IF NOT EXISTS ix_cash_flow_transaction_type ON cash_flow (transaction_type)",
+    """
+    CREATE TABLE IF NOT EXISTS categories (
+        category_id SERIAL NOT NULL,
+        name VARCHAR NOT NULL,
+        PRIMARY KEY (category_id),
+        UNIQUE (name)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS clients (
+        client_id SERIAL NOT NULL,
+        name VARCHAR NOT NULL,
+        PRIMARY KEY (client_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_clients_name ON clients (name)",
+    """
+    CREATE TABLE IF NOT EXISTS employees (
+        employee_id SERIAL NOT NULL,
+        name VARCHAR,
+        role VARCHAR,
+        id_telegram BIGINT NOT NULL,
+        PRIMARY KEY (employee_id),
+        UNIQUE (id_telegram)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_employees_name ON employees (name)",
+    """
+    CREATE TABLE IF NOT EXISTS suppliers (
+        supplier_id SERIAL NOT NULL,
+        name VARCHAR NOT NULL,
+        PRIMARY KEY (supplier_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_suppliers_name ON suppliers (name)",
+    """
+    CREATE TABLE IF NOT EXISTS addresses (
+        address_id SERIAL NOT NULL,
+        client_id INTEGER,
+        address_text VARCHAR NOT NULL,
+        PRIMARY KEY (address_id),
+        FOREIGN KEY(client_id) REFERENCES clients (client_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_addresses_client_id ON addresses (client_id)",
+    """
+    CREATE TABLE IF NOT EXISTS products (
+        product_id SERIAL NOT NULL,
+        name VARCHAR NOT NULL,
+        category_id INTEGER,
+        supplier_id INTEGER,
+        price NUMERIC(10, 2) NOT NULL,
+        cost_per_unit NUMERIC(10, 2) NOT NULL,
+        description VARCHAR,
+        PRIMARY KEY (product_id),
+        FOREIGN KEY(category_id) REFERENCES categories (category_id),
+        FOREIGN KEY(supplier_id) REFERENCES suppliers (supplier_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_products_category_id ON products (category_id)",
+    "CREATE INDEX IF NOT EXISTS ix_products_name ON products (name)",
+    "CREATE INDEX IF NOT EXISTS ix_products_supplier_id ON products (supplier_id)",
+    """
+    CREATE TABLE IF NOT EXISTS supplier_invoices (
+        supplier_invoice_id SERIAL NOT NULL,
+        supplier_id INTEGER,
+        invoice_number VARCHAR,
+        invoice_date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        due_date TIMESTAMP WITHOUT TIME ZONE,
+        total_amount NUMERIC(12, 2) NOT NULL,
+        amount_paid NUMERIC(12, 2) NOT NULL,
+        payment_status VARCHAR,
+        description VARCHAR,
+        created_at TIMESTAMP WITHOUT TIME ZONE,
+        PRIMARY KEY (supplier_invoice_id),
+        FOREIGN KEY(supplier_id) REFERENCES suppliers (supplier_id),
+        UNIQUE (invoice_number)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_supplier_invoices_due_date ON supplier_invoices (due_date)",
+    "CREATE INDEX IF NOT EXISTS ix_supplier_invoices_invoice_date ON supplier_invoices (invoice_date)",
+    "CREATE INDEX IF NOT EXISTS ix_supplier_invoices_payment_status ON supplier_invoices (payment_status)",
+    "CREATE INDEX IF NOT EXISTS ix_supplier_invoices_supplier_id ON supplier_invoices (supplier_id)",
+    """
+    CREATE TABLE IF NOT EXISTS incoming_deliveries (
+        delivery_id SERIAL NOT NULL,
+        delivery_date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        supplier_id INTEGER,
+        product_id INTEGER,
+        quantity NUMERIC(10, 2) NOT NULL,
+        unit_cost NUMERIC(10, 2) NOT NULL,
+        total_cost NUMERIC(12, 2) NOT NULL,
+        supplier_invoice_id INTEGER,
+        PRIMARY KEY (delivery_id),
+        FOREIGN KEY(supplier_id) REFERENCES suppliers (supplier_id),
+        FOREIGN KEY(product_id) REFERENCES products (product_id),
+        FOREIGN KEY(supplier_invoice_id) REFERENCES supplier_invoices (supplier_invoice_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_incoming_deliveries_delivery_date ON incoming_deliveries (delivery_date)",
+    "CREATE INDEX IF NOT EXISTS ix_incoming_deliveries_product_id ON incoming_deliveries (product_id)",
+    "CREATE INDEX IF NOT EXISTS ix_incoming_deliveries_supplier_id ON incoming_deliveries (supplier_id)",
+    "CREATE INDEX IF NOT EXISTS ix_incoming_deliveries_supplier_invoice_id ON incoming_deliveries (supplier_invoice_id)",
+    """
+    CREATE TABLE IF NOT EXISTS inventory_movements (
+        movement_id SERIAL NOT NULL,
+        product_id INTEGER,
+        movement_type VARCHAR NOT NULL,
+        quantity_change NUMERIC(10, 2) NOT NULL,
+        movement_date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        source_document_type VARCHAR NOT NULL,
+        source_document_id INTEGER,
+        description VARCHAR,
+        unit_cost NUMERIC(10, 2) NOT NULL,
+        PRIMARY KEY (movement_id),
+        FOREIGN KEY(product_id) REFERENCES products (product_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_inventory_movement_product_date ON inventory_movements (product_id, movement_date)",
+    "CREATE INDEX IF NOT EXISTS ix_inventory_movements_movement_date ON inventory_movements (movement_date)",
+    "CREATE INDEX IF NOT EXISTS ix_inventory_movements_movement_type ON inventory_movements (movement_type)",
+    "CREATE INDEX IF NOT EXISTS ix_inventory_movements_product_id ON inventory_movements (product_id)",
+    "CREATE INDEX IF NOT EXISTS ix_inventory_movements_source_document_id ON inventory_movements (source_document_id)",
+    "CREATE INDEX IF NOT EXISTS ix_inventory_movements_source_document_type ON inventory_movements (source_document_type)",
+    """
+    CREATE TABLE IF NOT EXISTS orders (
+        order_id SERIAL NOT NULL,
+        invoice_number VARCHAR,
+        order_date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        delivery_date TIMESTAMP WITHOUT TIME ZONE,
+        employee_id INTEGER,
+        client_id INTEGER,
+        address_id INTEGER,
+        total_amount NUMERIC(12, 2) NOT NULL,
+        status VARCHAR NOT NULL,
+        confirmation_date TIMESTAMP WITHOUT TIME ZONE,
+        payment_status VARCHAR NOT NULL,
+        amount_paid NUMERIC(12, 2) NOT NULL,
+        due_date TIMESTAMP WITHOUT TIME ZONE,
+        actual_payment_date TIMESTAMP WITHOUT TIME ZONE,
+        PRIMARY KEY (order_id),
+        UNIQUE (invoice_number),
+        FOREIGN KEY(employee_id) REFERENCES employees (employee_id),
+        FOREIGN KEY(client_id) REFERENCES clients (client_id),
+        FOREIGN KEY(address_id) REFERENCES addresses (address_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_order_client_status ON orders (client_id, status)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_actual_payment_date ON orders (actual_payment_date)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_address_id ON orders (address_id)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_client_id ON orders (client_id)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_confirmation_date ON orders (confirmation_date)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_delivery_date ON orders (delivery_date)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_due_date ON orders (due_date)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_employee_id ON orders (employee_id)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_order_date ON orders (order_date)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_payment_status ON orders (payment_status)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_status ON orders (status)",
+    """
+    CREATE TABLE IF NOT EXISTS stock (
+        product_id INTEGER NOT NULL,
+        quantity NUMERIC(10, 2) NOT NULL,
+        PRIMARY KEY (product_id),
+        FOREIGN KEY(product_id) REFERENCES products (product_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS client_payments (
+        payment_id SERIAL NOT NULL,
+        payment_date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        client_id INTEGER,
+        order_id INTEGER,
+        amount NUMERIC(12, 2) NOT NULL,
+        payment_method VARCHAR,
+        description VARCHAR,
+        payment_type VARCHAR,
+        PRIMARY KEY (payment_id),
+        FOREIGN KEY(client_id) REFERENCES clients (client_id),
+        FOREIGN KEY(order_id) REFERENCES orders (order_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_client_payments_client_id ON client_payments (client_id)",
+    "CREATE INDEX IF NOT EXISTS ix_client_payments_order_id ON client_payments (order_id)",
+    "CREATE INDEX IF NOT EXISTS ix_client_payments_payment_date ON client_payments (payment_date)",
+    "CREATE INDEX IF NOT EXISTS ix_client_payments_payment_method ON client_payments (payment_method)",
+    "CREATE INDEX IF NOT EXISTS ix_client_payments_payment_type ON client_payments (payment_type)",
+    """
+    CREATE TABLE IF NOT EXISTS order_lines (
+        order_line_id SERIAL NOT NULL,
+        order_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity NUMERIC(10, 2) NOT NULL,
+        unit_price NUMERIC(10, 2) NOT NULL,
+        line_total NUMERIC(12, 2) GENERATED ALWAYS AS (quantity * unit_price) STORED,
+        PRIMARY KEY (order_line_id),
+        FOREIGN KEY(order_id) REFERENCES orders (order_id),
+        FOREIGN KEY(product_id) REFERENCES products (product_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS supplier_payments (
+        payment_id SERIAL NOT NULL,
+        payment_date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        supplier_id INTEGER,
+        delivery_id INTEGER,
+        amount NUMERIC(12, 2) NOT NULL,
+        payment_method VARCHAR,
+        supplier_invoice_id INTEGER,
+        description VARCHAR,
+        PRIMARY KEY (payment_id),
+        FOREIGN KEY(supplier_id) REFERENCES suppliers (supplier_id),
+        FOREIGN KEY(delivery_id) REFERENCES incoming_deliveries (delivery_id),
+        FOREIGN KEY(supplier_invoice_id) REFERENCES supplier_invoices (supplier_invoice_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_supplier_payments_delivery_id ON supplier_payments (delivery_id)",
+    "CREATE INDEX IF NOT EXISTS ix_supplier_payments_payment_date ON supplier_payments (payment_date)",
+    "CREATE INDEX IF NOT EXISTS ix_supplier_payments_payment_method ON supplier_payments (payment_method)",
+    "CREATE INDEX IF NOT EXISTS ix_supplier_payments_supplier_id ON supplier_payments (supplier_id)",
+    "CREATE INDEX IF NOT EXISTS ix_supplier_payments_supplier_invoice_id ON supplier_payments (supplier_invoice_id)",
+]
+
+
+async def upgrade(conn):
+    for ddl in DDL:
+        await conn.execute(text(ddl))
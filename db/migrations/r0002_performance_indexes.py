@@ -0,0 +1,24 @@
+# db/migrations/r0002_performance_indexes.py
+"""
+Индексы для быстрых запросов (раньше создавались при каждом старте в db/indexes.py).
+"""
+
+from sqlalchemy import text
+
+revision = 2
+description = "pg_trgm и индексы поиска клиентов/товаров, списка /my_orders"
+
+DDL = [
+    # Поиск клиентов по имени: ILIKE '%...%' и сходство триграмм (process_client_name_search)
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS idx_clients_name_trgm ON clients USING gin (name gin_trgm_ops)",
+    # Инлайн-поиск товаров по названию
+    "CREATE INDEX IF NOT EXISTS idx_products_name_trgm ON products USING gin (name gin_trgm_ops)",
+    # Список /my_orders (то же определение, что в models.Order)
+    "CREATE INDEX IF NOT EXISTS idx_order_employee_status_date ON orders (employee_id, status, order_date DESC)",
+]
+
+
+async def upgrade(conn):
+    for ddl in DDL:
+        await conn.execute(text(ddl))
@@ -0,0 +1,39 @@
+# db/migrations/r0004_cash_ledger.py
+"""
+Нарастающий остаток кассы: заполняет cash_flow.current_balance для уже записанных операций
+и создает таблицу снимков остатка cash_balance_snapshots.
+"""
+
+from sqlalchemy import text
+
+revision = 4
+description = "Нарастающий остаток в cash_flow и снимки остатка кассы"
+
+DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS cash_balance_snapshots (
+        snapshot_id serial PRIMARY KEY,
+        taken_at timestamp without time zone NOT NULL DEFAULT now(),
+        transaction_id integer NOT NULL UNIQUE REFERENCES cash_flow (transaction_id),
+        balance numeric(12, 2) NOT NULL
+    )
+    """,
+    # Остаток после каждой операции в порядке записи (знак суммы — как в services/cash_ledger.py)
+    """
+    UPDATE cash_flow AS c
+    SET current_balance = s.balance
+    FROM (
+        SELECT transaction_id,
+               sum(CASE WHEN transaction_type = 'expense' THEN -amount ELSE amount END)
+                   OVER (ORDER BY transaction_id) AS balance
+        FROM cash_flow
+    ) AS s
+    WHERE c.transaction_id = s.transaction_id
+      AND c.current_balance IS DISTINCT FROM s.balance
+    """,
+]
+
+
+async def upgrade(conn):
+    for ddl in DDL:
+        await conn.execute(text(ddl))
@@ -0,0 +1,46 @@
+# db/migrations/r0005_payment_daily_totals.py
+"""
+Дневные итоги оплат клиентов payment_daily_totals и отметка client_payments.rolled_up
+для оплат, уже учтенных в итогах. Существующие оплаты сразу сворачиваются в итоги.
+"""
+
+from sqlalchemy import text
+
+revision = 5
+description = "Дневные итоги оплат клиентов"
+
+DDL = [
+    "ALTER TABLE client_payments ADD COLUMN IF NOT EXISTS rolled_up boolean NOT NULL DEFAULT false",
+    """
+    CREATE INDEX IF NOT EXISTS idx_client_payments_not_rolled_up
+    ON client_payments (payment_id) WHERE NOT rolled_up
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS payment_daily_totals (
+        day date NOT NULL,
+        payment_method varchar NOT NULL,
+        payment_type varchar NOT NULL,
+        total numeric(14, 2) NOT NULL DEFAULT 0,
+        payments_count integer NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, payment_method, payment_type)
+    )
+    """,
+    # ALTER TABLE выше держит исключительную блокировку client_payments до конца транзакции,
+    # так что между переносом в итоги и отметкой rolled_up новых оплат не появится
+    """
+    INSERT INTO payment_daily_totals (day, payment_method, payment_type, total, payments_count)
+    SELECT payment_date::date, coalesce(payment_method, ''), coalesce(payment_type, ''), sum(amount), count(*)
+    FROM client_payments
+    WHERE NOT rolled_up
+    GROUP BY 1, 2, 3
+    ON CONFLICT (day, payment_method, payment_type) DO UPDATE
+        SET total = payment_daily_totals.total + EXCLUDED.total,
+            payments_count = payment_daily_totals.payments_count + EXCLUDED.payments_count
+    """,
+    "UPDATE client_payments SET rolled_up = true WHERE NOT rolled_up",
+]
+
+
+async def upgrade(conn):
+    for ddl in DDL:
+        await conn.execute(text(ddl))
@@ -0,0 +1,30 @@
+# db/migrations/r0006_products_name_id_index.py
+"""
+Индекс для постраничного отчета об остатках (/inventory_report): порядок (name, product_id).
+Строится CONCURRENTLY, не блокируя запись в products.
+"""
+
+from sqlalchemy import text
+
+revision = 6
+description = "Индекс products (name, product_id) для отчета об остатках"
+transactional = False # CREATE INDEX CONCURRENTLY нельзя выполнять в транзакции
+
+
+async def upgrade(conn):
+    # Недостроенный после сбоя индекс остается INVALID — удаляем его перед повторной попыткой
+    await conn.execute(text("""
+        DO $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE c.relname = 'idx_products_name_id' AND NOT i.indisvalid
+            ) THEN
+                DROP INDEX idx_products_name_id;
+            END IF;
+        END
+        $$
+    """))
+    await conn.execute(text(
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_products_name_id ON products (name, product_id)"
+    ))
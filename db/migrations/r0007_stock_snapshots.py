@@ -0,0 +1,33 @@
+# db/migrations/r0007_stock_snapshots.py
+"""
+Ежемесячные снимки остатков для запросов «остаток на дату» (services/stock_history.py).
+Таблицы заполняет фоновая задача бота, начиная с месяца первого движения товара.
+"""
+
+from sqlalchemy import text
+
+revision = 7
+description = "Снимки остатков stock_snapshots и журнал построенных снимков"
+
+DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS stock_snapshots (
+        snapshot_date date NOT NULL,
+        product_id integer NOT NULL REFERENCES products (product_id),
+        quantity numeric(12, 2) NOT NULL,
+        PRIMARY KEY (snapshot_date, product_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stock_snapshot_runs (
+        snapshot_date date PRIMARY KEY,
+        products integer NOT NULL,
+        created_at timestamp without time zone NOT NULL DEFAULT now()
+    )
+    """,
+]
+
+
+async def upgrade(conn):
+    for ddl in DDL:
+        await conn.execute(text(ddl))
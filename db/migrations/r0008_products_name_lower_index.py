@@ -0,0 +1,30 @@
+# db/migrations/r0008_products_name_lower_index.py
+"""
+Индекс lower(name) для сопоставления названий товаров из списков инвентаризации
+(одним запросом lower(name) IN (...)). Строится CONCURRENTLY.
+"""
+
+from sqlalchemy import text
+
+revision = 8
+description = "Индекс products (lower(name)) для инвентаризации"
+transactional = False # CREATE INDEX CONCURRENTLY нельзя выполнять в транзакции
+
+
+async def upgrade(conn):
+    # Недостроенный после сбоя индекс остается INVALID — удаляем его перед повторной попыткой
+    await conn.execute(text("""
+        DO $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE c.relname = 'idx_products_name_lower' AND NOT i.indisvalid
+            ) THEN
+                DROP INDEX idx_products_name_lower;
+            END IF;
+        END
+        $$
+    """))
+    await conn.execute(text(
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_products_name_lower ON products (lower(name))"
+    ))
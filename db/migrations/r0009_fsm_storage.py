@@ -0,0 +1,33 @@
+# db/migrations/r0009_fsm_storage.py
+"""
+Таблица FSM-хранилища db/fsm_storage.PostgresStorage (раньше создавалась при каждом старте бота).
+"""
+
+from sqlalchemy import text
+
+revision = 9
+description = "Таблица состояний FSM fsm_storage"
+
+DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS fsm_storage (
+        bot_id bigint NOT NULL,
+        chat_id bigint NOT NULL,
+        user_id bigint NOT NULL,
+        thread_id bigint NOT NULL DEFAULT 0,
+        business_connection_id text NOT NULL DEFAULT '',
+        destiny text NOT NULL DEFAULT 'default',
+        state text,
+        data bytea,
+        updated_at timestamptz NOT NULL DEFAULT now(),
+        PRIMARY KEY (bot_id, chat_id, user_id, thread_id, business_connection_id, destiny)
+    )
+    """,
+    # Очистка устаревших состояний (PostgresStorage.cleanup)
+    "CREATE INDEX IF NOT EXISTS idx_fsm_storage_updated_at ON fsm_storage (updated_at)",
+]
+
+
+async def upgrade(conn):
+    for ddl in DDL:
+        await conn.execute(text(ddl))
@@ -0,0 +1,74 @@
+# db/migrations/r0010_payment_totals_corrections.py
+"""
+Исправление и удаление уже свернутых оплат в дневных итогах payment_daily_totals:
+триггер на client_payments вычитает старый вклад строки и прибавляет новый.
+Итоги пересчитываются заново — правки оплат до этой ревизии могли их исказить.
+"""
+
+from sqlalchemy import text
+
+revision = 10
+description = "Триггер поправок дневных итогов оплат при изменении и удалении оплат"
+
+DDL = [
+    # Прибавляет вклад оплат к строке итогов; строки без оплат удаляются
+    """
+    CREATE OR REPLACE FUNCTION payment_daily_totals_apply(
+        p_day date, p_method varchar, p_type varchar, p_amount numeric, p_count integer
+    ) RETURNS void AS $$
+    DECLARE
+        v_payments_count integer;
+    BEGIN
+        INSERT INTO payment_daily_totals AS t (day, payment_method, payment_type, total, payments_count)
+        VALUES (p_day, coalesce(p_method, ''), coalesce(p_type, ''), p_amount, p_count)
+        ON CONFLICT (day, payment_method, payment_type) DO UPDATE
+            SET total = t.total + EXCLUDED.total,
+                payments_count = t.payments_count + EXCLUDED.payments_count
+        RETURNING payments_count INTO v_payments_count;
+        IF v_payments_count = 0 THEN
+            DELETE FROM payment_daily_totals
+            WHERE day = p_day AND payment_method = coalesce(p_method, '') AND payment_type = coalesce(p_type, '');
+        END IF;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    # Срабатывает только для уже свернутых строк (OLD.rolled_up). Сама свертка (false -> true)
+    # сюда не попадает: ее вклад добавляет roll_up_payments. Снятие отметки (true -> false)
+    # вычитает вклад — следующая свертка добавит его снова.
+    """
+    CREATE OR REPLACE FUNCTION client_payments_totals_trg() RETURNS trigger AS $$
+    BEGIN
+        PERFORM payment_daily_totals_apply(
+            OLD.payment_date::date, OLD.payment_method, OLD.payment_type, -OLD.amount, -1
+        );
+        IF TG_OP = 'UPDATE' AND NEW.rolled_up THEN
+            PERFORM payment_daily_totals_apply(
+                NEW.payment_date::date, NEW.payment_method, NEW.payment_type, NEW.amount, 1
+            );
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS client_payments_totals ON client_payments",
+    """
+    CREATE TRIGGER client_payments_totals
+    AFTER DELETE OR UPDATE OF payment_date, payment_method, payment_type, amount, rolled_up
+    ON client_payments FOR EACH ROW WHEN (OLD.rolled_up) EXECUTE FUNCTION client_payments_totals_trg()
+    """,
+    # Пересчет итогов. CREATE TRIGGER удерживает блокировку client_payments до конца транзакции,
+    # поэтому параллельная свертка или правка оплат не попадет между удалением и заполнением.
+    "DELETE FROM payment_daily_totals",
+    """
+    INSERT INTO payment_daily_totals (day, payment_method, payment_type, total, payments_count)
+    SELECT payment_date::date, coalesce(payment_method, ''), coalesce(payment_type, ''), sum(amount), count(*)
+    FROM client_payments
+    WHERE rolled_up
+    GROUP BY 1, 2, 3
+    """,
+]
+
+
+async def upgrade(conn):
+    for ddl in DDL:
+        await conn.execute(text(ddl))
@@ -0,0 +1,69 @@
+# db/migrations/r0011_cash_flow_balance_trigger.py
+"""
+Нарастающий остаток кассы считает сама база: триггер BEFORE INSERT на cash_flow заполняет
+current_balance для любой вставленной операции, а не только записанной через
+services/cash_ledger.record_cash_transaction. Остатки пересчитываются заново, после чего
+current_balance становится NOT NULL.
+"""
+
+from sqlalchemy import text
+
+revision = 11
+description = "Триггер нарастающего остатка кассы на cash_flow"
+
+# Тот же ключ advisory-блокировки, что CASH_LEDGER_LOCK_KEY в services/cash_ledger.py
+CASH_LEDGER_LOCK_KEY = 7_201_900_001
+
+DDL = [
+    # Вставки ждут конца миграции: иначе пересчет ниже не увидит операции, добавленные параллельно
+    "LOCK TABLE cash_flow IN SHARE ROW EXCLUSIVE MODE",
+    # Операции записываются строго по одной. Номер операции выдается заново уже под блокировкой:
+    # значение по умолчанию вычисляется до триггера, и без этого порядок номеров мог бы
+    # разойтись с порядком, в котором считался остаток.
+    f"""
+    CREATE OR REPLACE FUNCTION cash_flow_balance_trg() RETURNS trigger AS $$
+    DECLARE
+        v_previous numeric(12, 2);
+    BEGIN
+        PERFORM pg_advisory_xact_lock({CASH_LEDGER_LOCK_KEY});
+        NEW.transaction_id := nextval(pg_get_serial_sequence('cash_flow', 'transaction_id'));
+        SELECT current_balance INTO v_previous FROM cash_flow ORDER BY transaction_id DESC LIMIT 1;
+        NEW.current_balance := coalesce(v_previous, 0)
+            + CASE WHEN NEW.transaction_type = 'expense' THEN -NEW.amount ELSE NEW.amount END;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS cash_flow_balance ON cash_flow",
+    """
+    CREATE TRIGGER cash_flow_balance
+    BEFORE INSERT ON cash_flow FOR EACH ROW EXECUTE FUNCTION cash_flow_balance_trg()
+    """,
+    # Операции, записанные после ревизии 4 в обход record_cash_transaction, остались без остатка
+    """
+    UPDATE cash_flow AS c
+    SET current_balance = s.balance
+    FROM (
+        SELECT transaction_id,
+               sum(CASE WHEN transaction_type = 'expense' THEN -amount ELSE amount END)
+                   OVER (ORDER BY transaction_id) AS balance
+        FROM cash_flow
+    ) AS s
+    WHERE c.transaction_id = s.transaction_id
+      AND c.current_balance IS DISTINCT FROM s.balance
+    """,
+    # Снимки сохраняют остаток своей операции — приводим их к пересчитанным значениям
+    """
+    UPDATE cash_balance_snapshots AS s
+    SET balance = c.current_balance
+    FROM cash_flow AS c
+    WHERE c.transaction_id = s.transaction_id
+      AND s.balance <> c.current_balance
+    """,
+    "ALTER TABLE cash_flow ALTER COLUMN current_balance SET NOT NULL",
+]
+
+
+async def upgrade(conn):
+    for ddl in DDL:
+        await conn.execute(text(ddl))
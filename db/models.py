@@ -1,6 +1,8 @@
 # db/models.py
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Index, BigInteger
+from sqlalchemy import Column, Integer, String, Float, DateTime, Date, ForeignKey, Boolean, Index, BigInteger
 from sqlalchemy import Computed, Numeric # Добавлено Numeric и Computed
+from sqlalchemy import FetchedValue
+from sqlalchemy import text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -70,6 +72,13 @@ class Product(Base):
     inventory_movements = relationship("InventoryMovement", back_populates="product")
     stock_item = relationship("Stock", uselist=False, back_populates="product")
 
+    __table_args__ = (
+        # Отчет /inventory_report: keyset-пагинация по (name, product_id)
+        Index('idx_products_name_id', 'name', 'product_id'),
+        # Сопоставление названий без учета регистра (инвентаризация /adjust_inventory)
+        Index('idx_products_name_lower', text('lower(name)')),
+    )
+
 class Stock(Base):
     __tablename__ = 'stock'
     product_id = Column(Integer, ForeignKey('products.product_id'), primary_key=True)
@@ -113,6 +122,20 @@ class InventoryMovement(Base):
         Index('idx_inventory_movement_product_date', 'product_id', 'movement_date'),
     )
 
+# Остатки товаров на начало дня snapshot_date (services/stock_history.py). Хранятся только
+# ненулевые остатки; дата попадает в stock_snapshot_runs, когда снимок построен целиком.
+class StockSnapshot(Base):
+    __tablename__ = 'stock_snapshots'
+    snapshot_date = Column(Date, primary_key=True)
+    product_id = Column(Integer, ForeignKey('products.product_id'), primary_key=True)
+    quantity = Column(Numeric(12, 2), nullable=False)
+
+class StockSnapshotRun(Base):
+    __tablename__ = 'stock_snapshot_runs'
+    snapshot_date = Column(Date, primary_key=True)
+    products = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
 class Order(Base):
     __tablename__ = 'orders'
     order_id = Column(Integer, primary_key=True)
@@ -140,6 +163,8 @@ class Order(Base):
 
     __table_args__ = (
         Index('idx_order_client_status', 'client_id', 'status'),
+        # Список /my_orders: заказы сотрудника в статусе, от новых к старым
+        Index('idx_order_employee_status_date', 'employee_id', 'status', text('order_date DESC')),
     )
 
 class OrderLine(Base):
@@ -168,10 +193,35 @@ class ClientPayment(Base):
     payment_method = Column(String, index=True)
     description = Column(String)
     payment_type = Column(String, index=True)
+    # Учтена ли оплата в дневных итогах payment_daily_totals (services/payment_totals.py)
+    rolled_up = Column(Boolean, nullable=False, default=False, server_default=text('false'))
 
     client = relationship("Client", back_populates="client_payments")
     order = relationship("Order", back_populates="client_payments")
 
+    __table_args__ = (
+        # Еще не учтенные в дневных итогах оплаты (обычно единицы строк)
+        Index('idx_client_payments_not_rolled_up', 'payment_id', postgresql_where=text('NOT rolled_up')),
+    )
+
+# Дневные итоги оплат клиентов по способу и типу оплаты (пустая строка — не указан)
+class PaymentDailyTotal(Base):
+    __tablename__ = 'payment_daily_totals'
+    day = Column(Date, primary_key=True)
+    payment_method = Column(String, primary_key=True)
+    payment_type = Column(String, primary_key=True)
+    total = Column(Numeric(14, 2), nullable=False, default=Decimal('0.00'))
+    payments_count = Column(Integer, nullable=False, default=0)
+
+# Сводка дебиторской задолженности: остаток к оплате по клиенту и сроку оплаты.
+# Ведется триггерами на orders (db/migrations/r0003_client_receivables.py), вручную не изменяется.
+class ClientReceivable(Base):
+    __tablename__ = 'client_receivables'
+    client_id = Column(Integer, ForeignKey('clients.client_id'), primary_key=True)
+    due_date = Column(Date, primary_key=True) # Срок оплаты (если не задан — дата заказа)
+    outstanding = Column(Numeric(12, 2), nullable=False, default=Decimal('0.00'))
+    open_orders = Column(Integer, nullable=False, default=0)
+
 class SupplierInvoice(Base):
     __tablename__ = 'supplier_invoices'
     supplier_invoice_id = Column(Integer, primary_key=True)
@@ -215,8 +265,17 @@ class CashFlow(Base):
     description = Column(String)
     source_type = Column(String, index=True)
     source_id = Column(Integer, index=True)
-    current_balance = Column(Numeric(12, 2))
+    # Остаток после операции заполняет триггер cash_flow_balance (db/migrations/r0011)
+    current_balance = Column(Numeric(12, 2), nullable=False, server_default=FetchedValue())
 
     __table_args__ = (
         Index('idx_cash_flow_source', 'source_type', 'source_id'),
-    )
\ No newline at end of file
+    )
+
+# Периодические снимки остатка кассы (services/cash_ledger.py): остаток после операции transaction_id
+class CashBalanceSnapshot(Base):
+    __tablename__ = 'cash_balance_snapshots'
+    snapshot_id = Column(Integer, primary_key=True)
+    taken_at = Column(DateTime, nullable=False, default=datetime.now)
+    transaction_id = Column(Integer, ForeignKey('cash_flow.transaction_id'), nullable=False, unique=True)
+    balance = Column(Numeric(12, 2), nullable=False)
\ No newline at end of file
@@ -1,13 +1,59 @@
+import logging
+import random
+import time
+
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from config import settings # Предполагаем, что settings содержит данные из .env
 
 DATABASE_URL = (
     f"postgresql+asyncpg://{settings.DB_USER}:{settings.DB_PASSWORD}@"
     f"{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
+    # Кэш подготовленных выражений диалекта asyncpg (0 — отключить, например за pgbouncer)
+    f"?prepared_statement_cache_size={settings.DB_PREPARED_STATEMENT_CACHE_SIZE}"
 )
 
-engine = create_async_engine(DATABASE_URL, echo=True) # echo=True для логирования SQL-запросов
+sql_logger = logging.getLogger("db.sql")
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, который дополнительно считает время ожидания свободного соединения.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+
+
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=settings.DB_ECHO, # Полное логирование SQL — только для отладки
+    poolclass=InstrumentedQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    connect_args={
+        "statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE,
+        "command_timeout": settings.DB_COMMAND_TIMEOUT,
+    },
+)
 AsyncSessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
@@ -16,6 +62,38 @@ AsyncSessionLocal = sessionmaker(
     expire_on_commit=False
 )
 
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _sample_sql_log(conn, cursor, statement, parameters, context, executemany):
+    """
+    Выборочно логирует SQL-запросы (доля задается DB_SQL_LOG_SAMPLE_RATE),
+    чтобы под нагрузкой не писать каждый запрос в лог.
+    """
+    rate = settings.DB_SQL_LOG_SAMPLE_RATE
+    if rate > 0 and random.random() < rate:
+        sql_logger.info("%s | params=%r", statement, parameters)
+
+
+def get_pool_stats() -> dict:
+    """
+    Возвращает текущую статистику пула соединений для подбора его размера под реальную нагрузку.
+    """
+    pool = engine.sync_engine.pool
+    checkouts = getattr(pool, "checkouts", 0)
+    wait_time_total = getattr(pool, "wait_time_total", 0.0)
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0), # До заполнения пула overflow отрицательный
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "checkouts": checkouts,
+        "wait_time_total": wait_time_total,
+        "wait_time_avg": wait_time_total / checkouts if checkouts else 0.0,
+        "wait_time_max": getattr(pool, "wait_time_max", 0.0),
+    }
+
+
 async def get_db_session():
     async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
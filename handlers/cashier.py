@@ -1,8 +1,16 @@
 # handlers/cashier.py
+import datetime
+
 from aiogram import Router, F
 from aiogram.types import Message
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
+from config import settings
+from db.setup import get_db_session
 from middlewares.role_middleware import RoleMiddleware
+from services.cash_ledger import get_cash_balance
+from services.payment_totals import get_payment_totals
+from services.receivables_service import AGING_BUCKETS, get_receivables_report
+from utils.text_formatter import escape_markdown_v2
 
 router = Router()
 
@@ -19,26 +27,112 @@ async def cmd_payments(message: Message, user_role: str):
     await message.answer(f"Вы {user_role}. Запуск модуля приема оплат клиентов...")
     # Здесь будет FSM для приема оплат
 
+
+def format_payment_report(title: str, totals) -> str:
+    """
+    Текст отчета об оплатах: итоги по способу и типу оплаты и общая сумма.
+    """
+    if not totals:
+        return f"{title}\nОплат нет."
+    lines = [title]
+    for item in totals:
+        method = item.payment_method or "способ не указан"
+        payment_type = f" ({item.payment_type})" if item.payment_type else ""
+        lines.append(f"• {method}{payment_type}: {item.total:.2f} грн — {item.payments_count} опл.")
+    total = sum(item.total for item in totals)
+    count = sum(item.payments_count for item in totals)
+    lines.append(f"Итого: {total:.2f} грн ({count} опл.)")
+    return "\n".join(lines)
+
+
 @router.message(Command("financial_report_today"))
 async def cmd_financial_report_today(message: Message, user_role: str):
     """
     Обработчик команды /financial_report_today.
+    Оплаты клиентов за сегодня из дневных итогов (плюс еще не свернутые оплаты).
     """
-    await message.answer(f"Вы {user_role}. Формирую отчет об оплатах за сегодня...")
-    # Здесь будет логика для отчета
+    today = datetime.date.today()
+    async for session in get_db_session():
+        totals = await get_payment_totals(session, today, today)
+    await message.answer(format_payment_report(f"💰 Оплаты за {today.strftime('%d.%m.%Y')}", totals))
+
+
+@router.message(Command("financial_report"))
+async def cmd_financial_report(message: Message, command: CommandObject, user_role: str):
+    """
+    Обработчик команды /financial_report ДД.ММ.ГГГГ [ДД.ММ.ГГГГ].
+    Оплаты клиентов за период (по умолчанию — с начала текущего месяца по сегодня).
+    """
+    today = datetime.date.today()
+    date_from, date_to = today.replace(day=1), today
+    if command.args:
+        try:
+            dates = [datetime.datetime.strptime(arg, '%d.%m.%Y').date() for arg in command.args.split()[:2]]
+        except ValueError:
+            await message.answer("Укажите период в формате: /financial_report 01.10.2025 15.10.2025")
+            return
+        date_from = dates[0]
+        date_to = dates[1] if len(dates) > 1 else today
+    if date_from > date_to:
+        date_from, date_to = date_to, date_from
+
+    async for session in get_db_session():
+        totals = await get_payment_totals(session, date_from, date_to)
+    title = f"🗓️ Оплаты с {date_from.strftime('%d.%m.%Y')} по {date_to.strftime('%d.%m.%Y')}"
+    await message.answer(format_payment_report(title, totals))
 
 @router.message(Command("cash_balance"))
 async def cmd_cash_balance(message: Message, user_role: str):
     """
     Обработчик команды /cash_balance.
+    Остаток хранится в последней операции журнала кассы — один запрос по первичному ключу.
     """
-    await message.answer(f"Вы {user_role}. Показываю остаток по кассе...")
-    # Здесь будет логика для остатка по кассе
+    async for session in get_db_session():
+        cash = await get_cash_balance(session)
+
+    if cash.transaction_id is None:
+        await message.answer("💲 Операций по кассе еще не было. Остаток: 0.00 грн")
+        return
+    await message.answer(
+        f"💲 Остаток по кассе: {cash.balance:.2f} грн\n"
+        f"Последняя операция: {cash.transaction_date.strftime('%d.%m.%Y %H:%M')}"
+    )
 
 @router.message(Command("accounts_receivable"))
 async def cmd_accounts_receivable(message: Message, user_role: str):
     """
     Обработчик команды /accounts_receivable.
+    Задолженность клиентов по неоплаченным заказам с разбивкой по срокам просрочки.
     """
-    await message.answer(f"Вы {user_role}. Формирую отчет по дебиторской задолженности...")
-    # Здесь будет логика для отчета по дебиторке
\ No newline at end of file
+    async for session in get_db_session():
+        report = await get_receivables_report(session)
+
+    if not report.clients:
+        await message.answer("✅ Дебиторской задолженности нет.")
+        return
+
+    def money(value) -> str:
+        return escape_markdown_v2(f"{value:.2f}")
+
+    lines = [
+        f"*📊 Дебиторская задолженность: {money(report.total)} грн*",
+        f"Клиентов с долгом: {len(report.clients)}",
+        "",
+    ]
+    for (label, _, _), amount in zip(AGING_BUCKETS, report.buckets):
+        lines.append(f"{escape_markdown_v2(label)}: {money(amount)} грн")
+    lines.append("")
+
+    for client in report.clients[:settings.RECEIVABLES_REPORT_LIMIT]:
+        overdue = sum(client.buckets[1:])
+        line = (
+            f"• *{escape_markdown_v2(client.client_name)}*: {money(client.total)} грн "
+            f"\\({client.open_orders} зак\\.\\)"
+        )
+        if overdue:
+            line += f", просрочено {money(overdue)} грн с {escape_markdown_v2(client.oldest_due_date.strftime('%d.%m.%Y'))}"
+        lines.append(line)
+    if len(report.clients) > settings.RECEIVABLES_REPORT_LIMIT:
+        lines.append(escape_markdown_v2(f"… и еще {len(report.clients) - settings.RECEIVABLES_REPORT_LIMIT} клиентов"))
+
+    await message.answer("\n".join(lines), parse_mode="MarkdownV2")
@@ -0,0 +1,59 @@
+# handlers/exports.py
+import datetime
+import logging
+import os
+
+from aiogram import Router
+from aiogram.types import Message, FSInputFile
+from aiogram.filters import Command, CommandObject
+
+from middlewares.role_middleware import RoleMiddleware
+from services.exports import EXPORT_KINDS, export_to_csv
+
+router = Router()
+
+# Выгрузки содержат данные по всем клиентам и кассе — только для руководства
+router.message.middleware(RoleMiddleware(required_roles=['admin', 'manager']))
+
+# Бот не может отправить документ больше 50 МБ через api.telegram.org
+TELEGRAM_MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+
+
+@router.message(Command(*EXPORT_KINDS))
+async def cmd_export(message: Message, command: CommandObject, user_role: str):
+    """
+    Обработчики команд /export_orders, /export_movements, /export_cash ДД.ММ.ГГГГ [ДД.ММ.ГГГГ].
+    CSV за период (по умолчанию — с начала текущего месяца по сегодня) отправляется документом.
+    """
+    kind = EXPORT_KINDS[command.command]
+    today = datetime.date.today()
+    date_from, date_to = today.replace(day=1), today
+    if command.args:
+        try:
+            dates = [datetime.datetime.strptime(arg, '%d.%m.%Y').date() for arg in command.args.split()[:2]]
+        except ValueError:
+            await message.answer(f"Укажите период в формате: /{command.command} 01.01.2025 31.12.2025")
+            return
+        date_from = dates[0]
+        date_to = dates[1] if len(dates) > 1 else today
+    if date_from > date_to:
+        date_from, date_to = date_to, date_from
+
+    period = f"{date_from.strftime('%d.%m.%Y')}–{date_to.strftime('%d.%m.%Y')}"
+    await message.answer(f"⏳ Готовлю выгрузку «{kind.title}» за {period}...")
+    try:
+        path, rows = await export_to_csv(kind, date_from, date_to)
+    except Exception as e:
+        logging.error("Выгрузка %s: ошибка при чтении данных: %s", command.command, e, exc_info=True)
+        await message.answer("❌ Не удалось подготовить выгрузку. Попробуйте позже.")
+        return
+
+    try:
+        if os.path.getsize(path) > TELEGRAM_MAX_UPLOAD_SIZE:
+            await message.answer("Файл выгрузки больше 50 МБ — укажите период короче.")
+            return
+        filename = f"{kind.filename}_{date_from.isoformat()}_{date_to.isoformat()}.csv"
+        await message.answer_document(FSInputFile(path, filename=filename),
+                                      caption=f"{kind.title} за {period}: {rows} строк")
+    finally:
+        os.remove(path)
@@ -0,0 +1,146 @@
+# handlers/inline_search.py
+
+import re
+import time
+from collections import OrderedDict
+
+from aiogram import Router, F, Bot
+from aiogram.types import (Message, InlineQuery, InlineQueryResultArticle, InputTextMessageContent,
+                           InlineKeyboardMarkup, InlineKeyboardButton)
+from aiogram.fsm.context import FSMContext
+
+from config import settings
+from middlewares.role_middleware import RoleMiddleware
+from services.client_search import search_clients
+from services.product_search import search_products
+from states.order_states import OrderCreationStates
+from states.inventory_states import InventoryReceiptStates
+from utils.trigram_index import normalize
+
+router = Router()
+
+# Инлайн-режим (@bot запрос) должен быть включен у бота через @BotFather (/setinline)
+router.inline_query.middleware(RoleMiddleware(required_roles=['admin', 'manager', 'warehouse']))
+router.message.middleware(RoleMiddleware(required_roles=['admin', 'manager', 'warehouse']))
+
+# Текст, который отправляется в чат при выборе результата; по нему бот узнает выбранную запись
+CLIENT_RESULT_RE = re.compile(r"^👤 Клиент #(\d+)")
+PRODUCT_RESULT_RE = re.compile(r"^📦 Товар #(\d+)")
+
+
+def _sent_via_this_bot(message: Message, bot: Bot) -> bool:
+    return message.via_bot is not None and message.via_bot.id == bot.id
+
+
+RESULTS_PER_KIND = 25 # Telegram принимает не более 50 результатов на запрос
+
+
+class InlineSearchCache:
+    """
+    Кэш результатов инлайн-поиска по точному нормализованному запросу.
+    Результаты для более длинного запроса не выводятся из префикса: поиск нечеткий
+    (триграммы), и у более длинного запроса могут быть совпадения и порядок, которых
+    нет в результате префикса.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict() # query -> (clients, products, истекает в)
+
+    def get(self, query: str):
+        entry = self._entries.get(query)
+        if entry is None:
+            return None
+        if entry[2] <= time.monotonic():
+            del self._entries[query]
+            return None
+        self._entries.move_to_end(query)
+        return entry[0], entry[1]
+
+    def put(self, query: str, clients: list, products: list):
+        self._entries[query] = (clients, products, time.monotonic() + self.ttl)
+        self._entries.move_to_end(query)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+inline_cache = InlineSearchCache(ttl=settings.INLINE_CACHE_TIME)
+
+
+@router.inline_query()
+async def inline_search(inline_query: InlineQuery):
+    """
+    Инлайн-поиск клиентов и товаров: @bot <часть названия>.
+    """
+    query = normalize(inline_query.query)
+    if not query:
+        await inline_query.answer([], cache_time=settings.INLINE_CACHE_TIME, is_personal=True)
+        return
+
+    cached = inline_cache.get(query)
+    if cached is None:
+        clients = await search_clients(query, limit=RESULTS_PER_KIND)
+        products = await search_products(query, limit=RESULTS_PER_KIND)
+        inline_cache.put(query, clients, products)
+    else:
+        clients, products = cached
+
+    results = []
+    for client_id, client_name in clients:
+        results.append(InlineQueryResultArticle(
+            id=f"client_{client_id}",
+            title=f"👤 {client_name}",
+            description="Клиент — создать заказ",
+            input_message_content=InputTextMessageContent(message_text=f"👤 Клиент #{client_id}: {client_name}"),
+        ))
+    for product_id, product_name, price in products:
+        results.append(InlineQueryResultArticle(
+            id=f"product_{product_id}",
+            title=f"📦 {product_name}",
+            description=f"Товар — {price} грн",
+            input_message_content=InputTextMessageContent(message_text=f"📦 Товар #{product_id}: {product_name}"),
+        ))
+
+    # is_personal: результаты кэшируются Telegram только для этого сотрудника
+    await inline_query.answer(results, cache_time=settings.INLINE_CACHE_TIME, is_personal=True)
+
+
+@router.message(_sent_via_this_bot, F.text.regexp(CLIENT_RESULT_RE))
+async def process_inline_client(message: Message, state: FSMContext, bot: Bot):
+    """
+    Сотрудник выбрал клиента в инлайн-поиске: предлагаем начать заказ для него.
+    Кнопка передает выбор в обычный хэндлер process_client_selection.
+    """
+    client_id = int(CLIENT_RESULT_RE.match(message.text).group(1))
+
+    await state.clear()
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="📝 Создать заказ для клиента", callback_data=f"select_client_{client_id}")],
+        [InlineKeyboardButton(text="❌ Отменить", callback_data="cancel_order_creation")]
+    ])
+    await message.answer("Клиент выбран. Начать оформление заказа?", reply_markup=keyboard)
+    await state.set_state(OrderCreationStates.waiting_for_client_selection)
+
+
+@router.message(_sent_via_this_bot, F.text.regexp(PRODUCT_RESULT_RE))
+async def process_inline_product(message: Message, state: FSMContext, bot: Bot):
+    """
+    Сотрудник выбрал товар в инлайн-поиске: если идет выбор товара в заказе или поступлении,
+    передаем выбор в соответствующий хэндлер.
+    """
+    product_id = int(PRODUCT_RESULT_RE.match(message.text).group(1))
+
+    current_state = await state.get_state()
+    if current_state == OrderCreationStates.waiting_for_product_selection.state:
+        callback_data = f"select_product_order_{product_id}"
+    elif current_state == InventoryReceiptStates.waiting_for_product_selection.state:
+        callback_data = f"select_product_add_{product_id}"
+    else:
+        await message.answer("Товар можно выбрать при оформлении заказа (/new_order) или поступления (/add_delivery).")
+        return
+
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="✅ Выбрать этот товар", callback_data=callback_data)]
+    ])
+    await message.answer("Товар найден. Подтвердите выбор:", reply_markup=keyboard)
@@ -1,13 +1,17 @@
+import asyncio
 import datetime
-from aiogram import Router, F
+import logging
+from decimal import Decimal
+from aiogram import Bot, Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 
+from config import settings
 from middlewares.role_middleware import RoleMiddleware
 from states.inventory_states import InventoryReceiptStates
 from db.setup import get_db_session
-from db.models import Supplier, Product, IncomingDelivery, InventoryMovement, Stock, SupplierInvoice, Employee # Импортируем Employee
+from db.models import Supplier, Product, SupplierInvoice, Employee # Импортируем Employee
 from sqlalchemy.future import select
 from sqlalchemy import insert, update, exc as sa_exc # Добавляем sa_exc для обработки ошибок SQLAlchemy
 
@@ -15,6 +19,11 @@ from sqlalchemy import insert, update, exc as sa_exc # Добавляем sa_exc
 from utils.text_formatter import escape_markdown_v2 # Для общего экранирования
 from aiogram.utils.markdown import bold, italic # Для жирного и курсива
 from aiogram.utils.formatting import Spoiler # Для спойлера, если он нужен
+from utils.documents import download_document
+from utils.keyboards import receipt_product_picker
+from services.inventory_service import post_receipt, to_decimal
+from services.receipt_import import InvoiceFileError, match_invoice_lines, parse_invoice_file
+from services.stock_report import bump_stock_version
 
 router = Router()
 
@@ -132,26 +141,93 @@ async def process_invoice_number(message: Message, state: FSMContext):
                          "Теперь, пожалуйста, выберите товар для добавления:",
                          parse_mode="MarkdownV2")
 
+    keyboard = await receipt_product_picker.build_keyboard()
+    if keyboard is None:
+        await message.answer("В системе пока нет зарегистрированных товаров. Пожалуйста, добавьте их сначала.")
+        await state.clear()
+        return
+
+    await message.answer("Список товаров (для выбора):", reply_markup=keyboard)
+    await message.answer("Или отправьте файл накладной (.csv или .xlsx) с колонками: товар, количество, цена за единицу. "
+                         "Товар — точное название или #номер.")
+    await state.set_state(InventoryReceiptStates.waiting_for_product_selection)
+
+
+@router.callback_query(InventoryReceiptStates.waiting_for_product_selection, F.data.startswith(f"{receipt_product_picker.page_prefix}:"))
+async def process_product_page(callback: CallbackQuery, state: FSMContext):
+    """
+    Листает страницы списка товаров.
+    """
+    direction, anchor_id = receipt_product_picker.parse_page_callback(callback.data)
+    keyboard = await receipt_product_picker.build_keyboard(direction, anchor_id)
+    if keyboard is None:
+        await callback.message.edit_text("В системе пока нет зарегистрированных товаров. Пожалуйста, добавьте их сначала.")
+        await state.clear()
+    else:
+        await callback.message.edit_reply_markup(reply_markup=keyboard)
+    await callback.answer()
+
+
+@router.message(InventoryReceiptStates.waiting_for_product_selection, F.document)
+async def process_invoice_file(message: Message, state: FSMContext, bot: Bot):
+    """
+    Загрузка накладной файлом: все строки разбираются и проверяются, товары сопоставляются
+    одним запросом, затем показывается сводка и ожидается подтверждение (confirm_save_receipt).
+    """
+    if (message.document.file_size or 0) > settings.RECEIPT_IMPORT_MAX_FILE_SIZE:
+        await message.answer("Файл слишком большой. Разбейте накладную на несколько файлов.")
+        return
+
+    content = await download_document(bot, message.document)
+    try:
+        lines, errors = await asyncio.to_thread(parse_invoice_file, content, message.document.file_name or '')
+    except InvoiceFileError as e:
+        await message.answer(f"❌ {e}")
+        return
+    except Exception as e:
+        logging.error("Накладная: ошибка при чтении файла: %s", e, exc_info=True)
+        await message.answer("❌ Не удалось прочитать файл. Проверьте формат и отправьте еще раз.")
+        return
+
     async for session in get_db_session():
-        products_stmt = select(Product)
-        products_result = await session.execute(products_stmt)
-        products = products_result.scalars().all()
+        invoice = await match_invoice_lines(session, lines)
+    errors += invoice.errors
+    if errors:
+        shown = errors[:settings.RECEIPT_IMPORT_PREVIEW_LIMIT]
+        if len(errors) > len(shown):
+            shown.append(f"… и еще {len(errors) - len(shown)} ошибок")
+        await message.answer("❌ Накладная не загружена, исправьте строки и отправьте файл еще раз:\n" + "\n".join(shown))
+        return
+    if not invoice.items:
+        await message.answer("В файле нет позиций накладной.")
+        return
 
-        if not products:
-            await message.answer("В системе пока нет зарегистрированных товаров. Пожалуйста, добавьте их сначала.")
-            await state.clear()
-            return
+    data = await state.get_data()
+    receipt_items = data.get('receipt_items', []) + invoice.items
+    await state.update_data(receipt_items=receipt_items)
 
-        buttons = []
-        for product in products:
-            # ✅ КЛЮЧЕВОЕ ИСПРАВЛЕНИЕ: Экранируем ВСЮ строку текста кнопки.
-            button_text = escape_markdown_v2(f"{product.name} ({product.price} грн)")
-            buttons.append([InlineKeyboardButton(text=button_text, callback_data=f"select_product_add_{product.product_id}")])
+    total_receipt_amount = sum((to_decimal(item['quantity']) * to_decimal(item['unit_cost']) for item in receipt_items),
+                               start=Decimal('0')).quantize(Decimal('0.01'))
+    summary_lines = [
+        "Сводка поступления из файла:",
+        f"Поставщик: {data.get('supplier_name')}",
+        f"Дата накладной: {data.get('invoice_date').strftime('%d.%m.%Y')}",
+        f"Номер накладной: {data.get('invoice_number')}",
+        f"Позиций: {len(receipt_items)}, общая сумма: {total_receipt_amount} грн",
+        "",
+    ]
+    limit = settings.RECEIPT_IMPORT_PREVIEW_LIMIT
+    for i, item in enumerate(receipt_items[:limit], start=1):
+        summary_lines.append(f"{i}. {item['product_name']}: {item['quantity']} x {item['unit_cost']} грн")
+    if len(receipt_items) > limit:
+        summary_lines.append(f"… и еще {len(receipt_items) - limit} позиций")
 
-        keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
-        # ✅ Для этого сообщения parse_mode="MarkdownV2" должен быть установлен
-        await message.answer("Список товаров (для выбора):", reply_markup=keyboard)
-        await state.set_state(InventoryReceiptStates.waiting_for_product_selection)
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="✅ Подтвердить и сохранить", callback_data="confirm_save_receipt")],
+        [InlineKeyboardButton(text="❌ Отменить поступление", callback_data="cancel_receipt")]
+    ])
+    await message.answer("\n".join(summary_lines), reply_markup=keyboard)
+    await state.set_state(InventoryReceiptStates.confirming_receipt)
 
 
 @router.callback_query(InventoryReceiptStates.waiting_for_product_selection, F.data.startswith("select_product_add_"))
@@ -176,17 +252,8 @@ async def process_product_selection(callback: CallbackQuery, state: FSMContext):
         else:
             await callback.answer("Ошибка: Товар не найден. Пожалуйста, попробуйте еще раз.", show_alert=True)
             # Возвращаемся к выбору товара
-            await callback.message.edit_text("Пожалуйста, выберите товар для добавления:")
-            async for s_session in get_db_session(): # Используем новую сессию для надежности
-                products_stmt = select(Product)
-                products_result = await s_session.execute(products_stmt)
-                products = products_result.scalars().all()
-                buttons = []
-                for p in products:
-                    button_text = escape_markdown_v2(f"{p.name} ({p.price} грн)")
-                    buttons.append([InlineKeyboardButton(text=button_text, callback_data=f"select_product_add_{p.product_id}")])
-                keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
-                await callback.message.edit_reply_markup(reply_markup=keyboard) # Обновляем только клавиатуру
+            keyboard = await receipt_product_picker.build_keyboard()
+            await callback.message.edit_text("Пожалуйста, выберите товар для добавления:", reply_markup=keyboard)
             await state.set_state(InventoryReceiptStates.waiting_for_product_selection)
     await callback.answer()
 
@@ -274,21 +341,8 @@ async def add_another_product(callback: CallbackQuery, state: FSMContext):
     Пользователь решил добавить еще один товар в текущую накладную.
     Возвращаемся к выбору товара.
     """
-    await callback.message.edit_text("Пожалуйста, выберите следующий товар для добавления:")
-    async for session in get_db_session():
-        products_stmt = select(Product)
-        products_result = await session.execute(products_stmt)
-        products = products_result.scalars().all()
-
-        buttons = []
-        for product in products:
-            # ✅ КЛЮЧЕВОЕ ИСПРАВЛЕНИЕ: Экранируем ВСЮ строку текста кнопки.
-            button_text = escape_markdown_v2(f"{product.name} ({product.price} грн)")
-            buttons.append([InlineKeyboardButton(text=button_text, callback_data=f"select_product_add_{product.product_id}")])
-
-        keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
-        # Обратите внимание, что здесь edit_reply_markup, а не edit_text, чтобы обновить только клавиатуру
-        await callback.message.edit_reply_markup(reply_markup=keyboard)
+    keyboard = await receipt_product_picker.build_keyboard()
+    await callback.message.edit_text("Пожалуйста, выберите следующий товар для добавления:", reply_markup=keyboard)
     await state.set_state(InventoryReceiptStates.waiting_for_product_selection)
     await callback.answer()
 
@@ -356,7 +410,9 @@ async def confirm_save_receipt(callback: CallbackQuery, state: FSMContext):
     receipt_items = data.get('receipt_items', [])
     user_telegram_id = callback.from_user.id # ID сотрудника
 
-    total_receipt_amount = sum(item['line_total'] for item in receipt_items)
+    # Суммы в состоянии хранятся как float; в БД (Numeric) считаем в Decimal
+    total_receipt_amount = sum((to_decimal(item['quantity']) * to_decimal(item['unit_cost']) for item in receipt_items),
+                               start=Decimal('0')).quantize(Decimal('0.01'))
 
     async for session in get_db_session():
         try:
@@ -377,63 +433,25 @@ async def confirm_save_receipt(callback: CallbackQuery, state: FSMContext):
                     invoice_number=invoice_number,
                     invoice_date=invoice_date,
                     total_amount=total_receipt_amount,
-                    amount_paid=0.0,
+                    amount_paid=Decimal('0.00'),
                     payment_status='unpaid',
                     created_at=datetime.datetime.now()
                 )
                 session.add(supplier_invoice)
             await session.flush() # Получаем supplier_invoice_id
 
-            # 2. Обновляем остатки на складе и создаем движения товара
-            for item in receipt_items:
-                product_id = item['product_id']
-                quantity = item['quantity']
-                unit_cost = item['unit_cost']
-                line_total = item['line_total']
-
-                # Создаем запись о входящей поставке для каждой позиции
-                item_delivery = IncomingDelivery(
-                    supplier_id=supplier_id,
-                    delivery_date=invoice_date,
-                    product_id=product_id,
-                    quantity=quantity,
-                    unit_cost=unit_cost,
-                    total_cost=line_total,
-                    supplier_invoice_id=supplier_invoice.supplier_invoice_id # ИСПРАВЛЕНО: использование supplier_invoice_id
-                )
-                session.add(item_delivery)
-                await session.flush()
-
-                # Обновляем Stock
-                stock_entry_stmt = select(Stock).where(Stock.product_id == product_id)
-                stock_entry_result = await session.execute(stock_entry_stmt)
-                stock_entry = stock_entry_result.scalar_one_or_none()
-
-                if stock_entry:
-                    stock_entry.quantity += quantity
-
-                else:
-                    new_stock_entry = Stock(
-                        product_id=product_id,
-                        quantity=quantity,
-
-                    )
-                    session.add(new_stock_entry)
-
-                # Создаем InventoryMovement
-                new_movement = InventoryMovement(
-                    product_id=product_id,
-                    quantity_change=quantity,
-                    movement_type='incoming',
-                    movement_date=datetime.datetime.now(),
-                    unit_cost=unit_cost,
-                    source_document_type='delivery',
-                    source_document_id=item_delivery.delivery_id,
-                    description=f"Поступление от поставщика {escape_markdown_v2(supplier_name)}, накладная {escape_markdown_v2(invoice_number)}" # Экранируем имена в описании
-                )
-                session.add(new_movement)
+            # 2. Поставки, движения товара и остатки — постоянное число запросов на всю накладную
+            await post_receipt(
+                session,
+                supplier_id=supplier_id,
+                supplier_invoice_id=supplier_invoice.supplier_invoice_id,
+                delivery_date=invoice_date,
+                items=receipt_items,
+                description=f"Поступление от поставщика {escape_markdown_v2(supplier_name)}, накладная {escape_markdown_v2(invoice_number)}" # Экранируем имена в описании
+            )
 
             await session.commit()
+            bump_stock_version() # Остатки изменились — кэш отчета /inventory_report устарел
 
             # ✅ ИСПРАВЛЕНИЕ: Удаляем parse_mode="MarkdownV2" из сообщения об успехе
             invoice_date_str_escaped = escape_markdown_v2(invoice_date.strftime('%d.%m.%Y'))
@@ -0,0 +1,169 @@
+# handlers/inventory_adjust.py
+import csv
+import io
+import logging
+from decimal import Decimal
+
+from aiogram import Bot, Router, F
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, BufferedInputFile
+from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
+
+from config import settings
+from db.setup import get_db_session
+from middlewares.role_middleware import RoleMiddleware
+from services.exports import csv_cell
+from services.stock_report import bump_stock_version
+from services.stocktake import StocktakeLine, compare_with_stock, post_stocktake, read_stocktake_list
+from states.inventory_states import StocktakeStates
+from utils.documents import decode_text_file, download_document
+
+router = Router()
+
+# Применяем RoleMiddleware для команд склада
+router.message.middleware(RoleMiddleware(required_roles=['admin', 'manager', 'warehouse']))
+router.callback_query.middleware(RoleMiddleware(required_roles=['admin', 'manager', 'warehouse']))
+
+STOCKTAKE_HELP = (
+    "📋 Инвентаризация.\n"
+    "Отправьте фактические остатки — по товару в строке: «название количество» "
+    "(или «#номер количество»), либо файл .txt/.csv с колонками «товар;количество».\n"
+    "Товары, которых нет в списке, не изменяются.\n"
+    "Отмена: /cancel"
+)
+
+
+def render_differences(title: str, lines: list[StocktakeLine], limit: int) -> str:
+    """
+    Текст отчета о расхождениях: итоги излишков и недостач и первые limit строк.
+    """
+    surplus = sum((line.difference for line in lines if line.difference > 0), start=Decimal('0.00'))
+    shortage = sum((-line.difference for line in lines if line.difference < 0), start=Decimal('0.00'))
+    text_lines = [
+        title,
+        f"Расхождений: {len(lines)}, излишки: +{surplus:.2f}, недостачи: -{shortage:.2f}",
+        "",
+    ]
+    for line in lines[:limit]:
+        text_lines.append(f"• {line.name}: {line.book:.2f} → {line.counted:.2f} ({line.difference:+.2f})")
+    if len(lines) > limit:
+        text_lines.append(f"… и еще {len(lines) - limit} позиций (полный список — в файле)")
+    return "\n".join(text_lines)
+
+
+def differences_csv(lines: list[StocktakeLine]) -> BufferedInputFile:
+    output = io.StringIO()
+    writer = csv.writer(output, delimiter=';')
+    writer.writerow(["product_id", "товар", "по учету", "факт", "разница"])
+    for line in lines:
+        writer.writerow([line.product_id, csv_cell(line.name), f"{line.book:.2f}", f"{line.counted:.2f}",
+                         f"{line.difference:+.2f}"])
+    return BufferedInputFile(output.getvalue().encode('utf-8-sig'), filename="stocktake_differences.csv")
+
+
+@router.message(Command("adjust_inventory"))
+async def cmd_adjust_inventory(message: Message, state: FSMContext, user_role: str):
+    """
+    Обработчик команды /adjust_inventory: запускает инвентаризацию списком.
+    """
+    await state.clear()
+    await state.set_state(StocktakeStates.waiting_for_counts)
+    await message.answer(STOCKTAKE_HELP)
+
+
+@router.message(StocktakeStates.waiting_for_counts, Command("cancel"))
+async def cancel_stocktake_input(message: Message, state: FSMContext):
+    await state.clear()
+    await message.answer("❌ Инвентаризация отменена.")
+
+
+@router.message(StocktakeStates.waiting_for_counts, (F.text & ~F.text.startswith('/')) | F.document)
+async def process_stocktake_counts(message: Message, state: FSMContext, bot: Bot):
+    """
+    Принимает список фактических остатков (текст или файл), сопоставляет товары и
+    показывает расхождения с учетом до проведения.
+    """
+    if message.document:
+        if (message.document.file_size or 0) > settings.STOCKTAKE_MAX_FILE_SIZE:
+            await message.answer("Файл слишком большой. Разбейте список на несколько частей.")
+            return
+        text = decode_text_file(await download_document(bot, message.document))
+    else:
+        text = message.text
+
+    async for session in get_db_session():
+        stocktake = await read_stocktake_list(session, text)
+        lines = await compare_with_stock(session, stocktake.counts, stocktake.names)
+
+    if stocktake.errors:
+        errors = stocktake.errors[:settings.STOCKTAKE_PREVIEW_LIMIT]
+        if len(stocktake.errors) > len(errors):
+            errors.append(f"… и еще {len(stocktake.errors) - len(errors)} строк")
+        await message.answer("⚠️ Строки пропущены:\n" + "\n".join(errors))
+    if not lines:
+        await message.answer("Не найдено ни одного товара. Исправьте список и отправьте еще раз.")
+        return
+
+    differences = [line for line in lines if line.difference != 0]
+    if not differences:
+        await state.clear()
+        await message.answer(f"✅ Посчитано товаров: {len(lines)}. Расхождений с учетом нет.")
+        return
+
+    # Количества в состоянии FSM — строками, чтобы не терять точность Decimal
+    await state.update_data(
+        stocktake_counts={str(product_id): str(quantity) for product_id, quantity in stocktake.counts.items()},
+        stocktake_names={str(product_id): name for product_id, name in stocktake.names.items()},
+    )
+    await state.set_state(StocktakeStates.confirming_stocktake)
+
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="✅ Провести", callback_data="stocktake_confirm")],
+        [InlineKeyboardButton(text="❌ Отменить", callback_data="stocktake_cancel")],
+    ])
+    title = f"📋 Посчитано товаров: {len(lines)}. Провести расхождения?"
+    await message.answer(render_differences(title, differences, settings.STOCKTAKE_PREVIEW_LIMIT), reply_markup=keyboard)
+    if len(differences) > settings.STOCKTAKE_PREVIEW_LIMIT:
+        await message.answer_document(differences_csv(differences))
+
+
+@router.callback_query(StocktakeStates.confirming_stocktake, F.data == "stocktake_confirm")
+async def confirm_stocktake(callback: CallbackQuery, state: FSMContext):
+    """
+    Проводит инвентаризацию одной транзакцией: движения 'adjustment' и остатки всех товаров списка.
+    """
+    data = await state.get_data()
+    counts = {int(product_id): Decimal(quantity) for product_id, quantity in data.get('stocktake_counts', {}).items()}
+    names = {int(product_id): name for product_id, name in data.get('stocktake_names', {}).items()}
+    description = f"Инвентаризация, сотрудник {callback.from_user.id}"
+
+    async for session in get_db_session():
+        try:
+            posted = await post_stocktake(session, counts, names, description)
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            logging.error("Инвентаризация: ошибка при проведении: %s", e, exc_info=True)
+            # Предпросмотр с кнопками остается — можно повторить проведение
+            await callback.message.answer(f"❌ Ошибка при проведении инвентаризации: {e}\nПопробуйте еще раз.")
+            await callback.answer()
+            return
+
+    await state.clear()
+    if posted:
+        bump_stock_version() # Остатки изменились — кэш отчета /inventory_report устарел
+        await callback.message.edit_text(
+            render_differences("✅ Инвентаризация проведена.", posted, settings.STOCKTAKE_PREVIEW_LIMIT)
+        )
+        if len(posted) > settings.STOCKTAKE_PREVIEW_LIMIT:
+            await callback.message.answer_document(differences_csv(posted))
+    else:
+        await callback.message.edit_text("✅ Остатки уже совпадают с фактом — проводить нечего.")
+    await callback.answer()
+
+
+@router.callback_query(StocktakeStates.confirming_stocktake, F.data == "stocktake_cancel")
+async def cancel_stocktake(callback: CallbackQuery, state: FSMContext):
+    await state.clear()
+    await callback.message.edit_text("❌ Инвентаризация отменена.")
+    await callback.answer()
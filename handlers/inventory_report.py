@@ -0,0 +1,130 @@
+# handlers/inventory_report.py
+import datetime
+
+from aiogram import Router, F
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.filters import Command, CommandObject
+from sqlalchemy.future import select
+
+from config import settings
+from db.models import Product
+from db.setup import get_db_session
+from middlewares.role_middleware import RoleMiddleware
+from services.stock_history import get_stock_as_of
+from services.stock_report import STOCK_FILTERS, StockPage, StockTotals, get_stock_page, get_stock_totals
+
+router = Router()
+
+# Применяем RoleMiddleware для команд склада
+router.message.middleware(RoleMiddleware(required_roles=['admin', 'manager', 'warehouse']))
+router.callback_query.middleware(RoleMiddleware(required_roles=['admin', 'manager', 'warehouse']))
+
+
+def render_stock_page(stock_filter: str, page: StockPage, totals: StockTotals) -> str:
+    filter_title = STOCK_FILTERS[stock_filter]
+    if stock_filter == "low":
+        filter_title += f" (≤ {settings.STOCK_LOW_THRESHOLD})"
+    lines = [
+        f"🔍 Остатки товаров: {filter_title}",
+        f"Позиций: {totals.products}, стоимость по себестоимости: {totals.value:.2f} грн",
+        "",
+    ]
+    if not page.items:
+        lines.append("Нет товаров.")
+    for item in page.items:
+        category = f" [{item.category_name}]" if item.category_name else ""
+        lines.append(
+            f"• {item.name}{category}: {item.quantity:.2f} × {item.cost_per_unit:.2f} = {item.value:.2f} грн"
+        )
+    return "\n".join(lines)
+
+
+def build_stock_keyboard(stock_filter: str, page: StockPage) -> InlineKeyboardMarkup:
+    filter_row = [
+        InlineKeyboardButton(
+            text=("✅ " if key == stock_filter else "") + title.capitalize(),
+            callback_data=f"inv_report:{key}:next:0",
+        )
+        for key, title in STOCK_FILTERS.items()
+    ]
+    buttons = [filter_row]
+    nav_row = []
+    if page.has_prev and page.items:
+        nav_row.append(InlineKeyboardButton(
+            text="◀️ Назад", callback_data=f"inv_report:{stock_filter}:prev:{page.items[0].product_id}"))
+    if page.has_next and page.items:
+        nav_row.append(InlineKeyboardButton(
+            text="Вперед ▶️", callback_data=f"inv_report:{stock_filter}:next:{page.items[-1].product_id}"))
+    if nav_row:
+        buttons.append(nav_row)
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+@router.message(Command("inventory_report"))
+async def cmd_inventory_report(message: Message, user_role: str):
+    """
+    Обработчик команды /inventory_report: постраничный отчет о текущих остатках.
+    """
+    page = await get_stock_page()
+    totals = await get_stock_totals()
+    await message.answer(render_stock_page("all", page, totals), reply_markup=build_stock_keyboard("all", page))
+
+
+@router.callback_query(F.data.startswith("inv_report:"))
+async def process_inventory_report_page(callback: CallbackQuery):
+    """
+    Листание отчета и смена фильтра (anchor 0 — первая страница).
+    """
+    _, stock_filter, direction, anchor_id = callback.data.split(":")
+    if stock_filter not in STOCK_FILTERS:
+        await callback.answer()
+        return
+    page = await get_stock_page(stock_filter, direction, int(anchor_id) or None)
+    if not page.items and int(anchor_id):
+        # Товары на границе страницы могли быть удалены — показываем первую страницу
+        page = await get_stock_page(stock_filter)
+    totals = await get_stock_totals(stock_filter)
+    text = render_stock_page(stock_filter, page, totals)
+    if text != callback.message.text:
+        await callback.message.edit_text(text, reply_markup=build_stock_keyboard(stock_filter, page))
+    await callback.answer()
+
+
+@router.message(Command("stock_as_of"))
+async def cmd_stock_as_of(message: Message, command: CommandObject):
+    """
+    Обработчик команды /stock_as_of ДД.ММ.ГГГГ: остатки на конец указанного дня
+    (снимок на начало месяца + движения после него).
+    """
+    try:
+        day = datetime.datetime.strptime((command.args or "").strip(), '%d.%m.%Y').date()
+    except ValueError:
+        await message.answer("Укажите дату в формате: /stock_as_of 31.12.2024")
+        return
+
+    as_of = datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time.min)
+    async for session in get_db_session():
+        stock = await get_stock_as_of(session, as_of)
+        products = (await session.execute(
+            select(Product.product_id, Product.name, Product.cost_per_unit)
+            .where(Product.product_id.in_(list(stock)))
+            .order_by(Product.name, Product.product_id)
+        )).all() if stock else []
+
+    title = f"📅 Остатки на конец дня {day.strftime('%d.%m.%Y')}"
+    if not products:
+        await message.answer(f"{title}\nТоваров на складе не было.")
+        return
+
+    total_value = sum(stock[product.product_id] * product.cost_per_unit for product in products)
+    lines = [
+        title,
+        f"Позиций: {len(products)}, стоимость по текущей себестоимости: {total_value:.2f} грн",
+        "",
+    ]
+    limit = settings.STOCK_REPORT_PAGE_SIZE * 2
+    for product in products[:limit]:
+        lines.append(f"• {product.name}: {stock[product.product_id]:.2f}")
+    if len(products) > limit:
+        lines.append(f"… и еще {len(products) - limit} позиций")
+    await message.answer("\n".join(lines))
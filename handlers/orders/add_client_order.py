@@ -10,6 +10,7 @@ from db.setup import get_db_session
 from db.models import Client
 from sqlalchemy.future import select
 from utils.text_formatter import escape_markdown_v2, bold, italic
+from services.client_search import search_clients
 
 router = Router()
 
@@ -60,26 +61,23 @@ async def process_client_name_search(message: Message, state: FSMContext):
         await message.answer("Запрос не может быть пустым. Пожалуйста, введите имя клиента:")
         return
 
-    async for session in get_db_session():
-        clients_stmt = select(Client).where(Client.name.ilike(f"%{search_query}%")).limit(15)
-        clients_result = await session.execute(clients_stmt)
-        clients = clients_result.scalars().all()
+    clients = await search_clients(search_query, limit=15)
 
-        if not clients:
-            await message.answer(f"Клиенты по запросу '{escape_markdown_v2(search_query)}' не найдены. Попробуйте другой запрос или /new_order для начала.",
-                                 parse_mode="MarkdownV2")
-            return
+    if not clients:
+        await message.answer(f"Клиенты по запросу '{escape_markdown_v2(search_query)}' не найдены. Попробуйте другой запрос или /new_order для начала.",
+                             parse_mode="MarkdownV2")
+        return
 
-        buttons = []
-        for client in clients:
-            button_text = escape_markdown_v2(client.name)
-            buttons.append([InlineKeyboardButton(text=button_text, callback_data=f"select_client_{client.client_id}")])
+    buttons = []
+    for client_id, client_name in clients:
+        button_text = escape_markdown_v2(client_name)
+        buttons.append([InlineKeyboardButton(text=button_text, callback_data=f"select_client_{client_id}")])
 
-        buttons.append([InlineKeyboardButton(text="❌ Отменить", callback_data="cancel_order_creation")])
+    buttons.append([InlineKeyboardButton(text="❌ Отменить", callback_data="cancel_order_creation")])
 
-        keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
-        # Для этого сообщения parse_mode="MarkdownV2" не указываем.
-        await message.answer("Найденные клиенты. Выберите одного:", reply_markup=keyboard)
+    keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+    # Для этого сообщения parse_mode="MarkdownV2" не указываем.
+    await message.answer("Найденные клиенты. Выберите одного:", reply_markup=keyboard)
 
 
 @router.callback_query(OrderCreationStates.waiting_for_client_selection, F.data.startswith("select_client_"))
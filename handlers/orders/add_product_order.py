@@ -8,10 +8,13 @@ from aiogram.fsm.context import FSMContext
 from middlewares.role_middleware import RoleMiddleware
 from states.order_states import OrderCreationStates
 from db.setup import get_db_session
-from db.models import Product,Order, OrderLine, Employee
+from db.models import Product, Employee
 from sqlalchemy.future import select
-from sqlalchemy import exc as sa_exc, insert
+from sqlalchemy import exc as sa_exc
 from utils.text_formatter import escape_markdown_v2, bold, italic
+from utils.keyboards import order_product_picker
+from services.order_service import create_order_with_lines, add_order_lines
+from services.order_editing_service import invalidate_order_summary
 import logging
 from decimal import Decimal
 from handlers.orders.edit_order import process_my_order_selection, return_to_order_menu
@@ -21,40 +24,48 @@ router = Router()
 router.message.middleware(RoleMiddleware(required_roles=['admin', 'manager']))
 router.callback_query.middleware(RoleMiddleware(required_roles=['admin', 'manager']))
 
+# Дополнительные кнопки под списком товаров
+ORDER_PRODUCT_EXTRA_ROWS = [
+    [InlineKeyboardButton(text="↩️ Назад к выбору адреса", callback_data="back_to_address_selection")],
+    [InlineKeyboardButton(text="❌ Отменить", callback_data="cancel_order_creation")],
+]
+
 async def send_product_options(update_obj: Message | CallbackQuery, state: FSMContext, bot: Bot):
     """
-    Отправляет список товаров для добавления в заказ.
+    Отправляет первую страницу списка товаров для добавления в заказ.
     """
-    async for session in get_db_session():
-        products_stmt = select(Product)
-        products_result = await session.execute(products_stmt)
-        products = products_result.scalars().all()
-
-        if not products:
-            if isinstance(update_obj, Message):
-                await update_obj.answer("В системе пока нет зарегистрированных товаров. Пожалуйста, добавьте их сначала.")
-            else:
-                await update_obj.message.edit_text("В системе пока нет зарегистрированных товаров. Пожалуйста, добавьте их сначала.")
-            await state.clear()
-            return
+    keyboard = await order_product_picker.build_keyboard(extra_rows=ORDER_PRODUCT_EXTRA_ROWS)
 
-        buttons = []
-        for product in products:
-            button_text = f"{product.name} ({product.price} грн)"
-            buttons.append([InlineKeyboardButton(text=button_text, callback_data=f"select_product_order_{product.product_id}")])
+    if keyboard is None:
+        if isinstance(update_obj, Message):
+            await update_obj.answer("В системе пока нет зарегистрированных товаров. Пожалуйста, добавьте их сначала.")
+        else:
+            await update_obj.message.edit_text("В системе пока нет зарегистрированных товаров. Пожалуйста, добавьте их сначала.")
+        await state.clear()
+        return
 
-        buttons.append([InlineKeyboardButton(text="↩️ Назад к выбору адреса", callback_data="back_to_address_selection")])
-        buttons.append([InlineKeyboardButton(text="❌ Отменить", callback_data="cancel_order_creation")])
+    message_text = "Выберите товар для добавления в заказ:"
+    if isinstance(update_obj, Message):
+        await update_obj.answer(message_text, reply_markup=keyboard)
+    else: # CallbackQuery
+        await update_obj.message.edit_text(message_text, reply_markup=keyboard)
 
-        keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+    await state.set_state(OrderCreationStates.waiting_for_product_selection)
 
-        message_text = "Выберите товар для добавления в заказ:"
-        if isinstance(update_obj, Message):
-            await update_obj.answer(message_text, reply_markup=keyboard)
-        else: # CallbackQuery
-            await update_obj.message.edit_text(message_text, reply_markup=keyboard)
 
-        await state.set_state(OrderCreationStates.waiting_for_product_selection)
+@router.callback_query(OrderCreationStates.waiting_for_product_selection, F.data.startswith(f"{order_product_picker.page_prefix}:"))
+async def process_product_page_order(callback: CallbackQuery, state: FSMContext, bot: Bot):
+    """
+    Листает страницы списка товаров (и при создании заказа, и при добавлении товара в существующий заказ).
+    """
+    direction, anchor_id = order_product_picker.parse_page_callback(callback.data)
+    keyboard = await order_product_picker.build_keyboard(direction, anchor_id, extra_rows=ORDER_PRODUCT_EXTRA_ROWS)
+    if keyboard is None:
+        await callback.message.edit_text("В системе пока нет зарегистрированных товаров. Пожалуйста, добавьте их сначала.")
+        await state.clear()
+    else:
+        await callback.message.edit_reply_markup(reply_markup=keyboard)
+    await callback.answer()
 
 
 @router.callback_query(OrderCreationStates.waiting_for_product_selection, F.data.startswith("select_product_order_"))
@@ -132,34 +143,27 @@ async def process_product_quantity_order(message: Message, state: FSMContext, bo
     if adding_to_existing_order:
         async for session in get_db_session():
             try:
-                order_stmt = select(Order).where(Order.order_id == order_id)
-                order_result = await session.execute(order_stmt)
-                order = order_result.scalar_one_or_none()
-
-                if not order:
+                # Вставка позиции и пересчет суммы заказа — один запрос
+                added = await add_order_lines(session, order_id, [{
+                    'product_id': current_product_id,
+                    'quantity': new_quantity,
+                    'unit_price': unit_price,
+                }])
+
+                if added is None:
                     await message.answer("Ошибка: Основной заказ не найден для добавления товара. Пожалуйста, начните /my_orders снова.")
                     await state.clear()
-                    logging.error(f"process_product_quantity_order: Order {order_id} не найден при добавлении товара.")
+                    logging.error("process_product_quantity_order: Order %s не найден при добавлении товара.", order_id)
                     return
 
-                insert_stmt_order_line = insert(OrderLine).values(
-                    order_id=order_id,
-                    product_id=current_product_id,
-                    quantity=new_quantity,
-                    unit_price=unit_price,
-                )
-                await session.execute(insert_stmt_order_line)
-                logging.info(f"Новая OrderLine для product_id {current_product_id} добавлена в заказ {order_id}.")
-
-                order.total_amount += line_total
-                logging.info(f"Общая сумма заказа {order_id} увеличена на {line_total}.")
-
+                _, new_total_amount = added
                 await session.commit()
-                logging.info("Транзакция успешно закоммичена: новый товар добавлен в заказ и сумма обновлена.")
+                invalidate_order_summary(order_id)
+                logging.info("В заказ %s добавлен товар %s, сумма заказа: %s.", order_id, current_product_id, new_total_amount)
 
                 await message.answer(
                     f"✅ Товар '{escape_markdown_v2(current_product_name)}' ({new_quantity} шт.) добавлен в заказ №{order_id}.\n"
-                    f"Текущая сумма заказа: {escape_markdown_v2(str(round(order.total_amount, 2)))} грн."
+                    f"Текущая сумма заказа: {escape_markdown_v2(str(round(new_total_amount, 2)))} грн."
                 )
                 
                 await state.update_data(adding_to_existing_order=False)
@@ -178,7 +182,7 @@ async def process_product_quantity_order(message: Message, state: FSMContext, bo
             except Exception as e:
                 await session.rollback()
                 await message.answer(f"❌ Произошла ошибка при добавлении товара в заказ: {str(e)}\n")
-                logging.error(f"process_product_quantity_order: Ошибка при добавлении товара в заказ {order_id}: {e}", exc_info=True)
+                logging.error("process_product_quantity_order: Ошибка при добавлении товара в заказ %s: %s", order_id, e, exc_info=True)
                 await state.clear()
                 return
 
@@ -265,7 +269,7 @@ async def confirm_and_save_order(callback: CallbackQuery, state: FSMContext, bot
     """
     Сохраняет заказ и его позиции в базу данных.
     """
-    logging.info("Начинаем сохранение заказа в БД.")
+    logging.debug("Начинаем сохранение заказа в БД.")
     data = await state.get_data()
     client_id = data.get('client_id')
     address_id = data.get('address_id')
@@ -282,46 +286,26 @@ async def confirm_and_save_order(callback: CallbackQuery, state: FSMContext, bot
         return
 
     total_order_amount = sum(item['line_total'] for item in order_items)
-    logging.info(f"Получены данные заказа: Клиент ID={client_id}, Адрес ID={address_id}, Дата доставки={delivery_date}, Всего позиций={len(order_items)}, Общая сумма={total_order_amount}")
+    logging.debug("Получены данные заказа: Клиент ID=%s, Адрес ID=%s, Дата доставки=%s, Всего позиций=%s, Общая сумма=%s", client_id, address_id, delivery_date, len(order_items), total_order_amount)
 
     async for session in get_db_session(): # НАЧАЛО КОНТЕКСТА СЕССИИ
         try:
-            logging.info("Сессия БД получена. Подготовка INSERT для Order.")
-            # 1. Создаем запись в таблице orders, используя insert() для прямого получения ID
-            insert_stmt_order = insert(Order).values(
-                invoice_number=None, # Присваивается позже
-                order_date=datetime.datetime.now(),
-                delivery_date=delivery_date,
-                employee_id=employee_id,
-                client_id=client_id,
-                address_id=address_id,
-                total_amount=total_order_amount,
-                status='draft', # Используем 'draft'
-                payment_status='unpaid',
-                amount_paid=0.0,
-                due_date=delivery_date + datetime.timedelta(days=7) # Срок оплаты через 7 дней
-            ).returning(Order.order_id) # Запрашиваем возврат order_id
-
-            order_insert_result = await session.execute(insert_stmt_order) # Выполняем INSERT
-            new_order_id = order_insert_result.scalar_one() # Получаем order_id напрямую
-            logging.info(f"Order вставлен с ID: {new_order_id}")
-
-            # 2. Создаем записи в таблице order_lines
-            for i, item in enumerate(order_items):
-                logging.info(f"Добавляем позицию заказа {i+1}: Product ID {item['product_id']}")
-                insert_stmt_order_line = insert(OrderLine).values(
-                    order_id=new_order_id, # Используем полученный ID заказа
-                    product_id=item['product_id'],
-                    quantity=item['quantity'],
-                    unit_price=item['unit_price'],
-                    # line_total не передаем, т.к. это генерируемый столбец
-                )
-                await session.execute(insert_stmt_order_line) # Выполняем INSERT для каждой позиции
-                logging.info(f"OrderLine {i+1} добавлен в сессию.")
-
-            logging.info("Все OrderLine добавлены в сессию. Выполняем commit.")
-            await session.commit() # КОММИТ ТРАНЗАКЦИИ
-            logging.info("Транзакция успешно закоммичена.")
+            # Заказ и все позиции сохраняются одним запросом (line_total — генерируемый столбец)
+            new_order_id, line_ids = await create_order_with_lines(session, {
+                'invoice_number': None, # Присваивается позже
+                'order_date': datetime.datetime.now(),
+                'delivery_date': delivery_date,
+                'employee_id': employee_id,
+                'client_id': client_id,
+                'address_id': address_id,
+                'total_amount': total_order_amount,
+                'status': 'draft', # Используем 'draft'
+                'payment_status': 'unpaid',
+                'amount_paid': Decimal('0.00'),
+                'due_date': delivery_date + datetime.timedelta(days=7) # Срок оплаты через 7 дней
+            }, order_items)
+            await session.commit()
+            logging.info("Заказ %s сохранен: %s позиций.", new_order_id, len(line_ids))
 
             # Формирование подробной сводки заказа
             order_id_escaped = escape_markdown_v2(str(new_order_id))
@@ -355,27 +339,27 @@ async def confirm_and_save_order(callback: CallbackQuery, state: FSMContext, bot
             final_success_message = "".join(summary_parts)
 
             await callback.message.edit_text(final_success_message, parse_mode="MarkdownV2")
-            logging.info("Сообщение об успехе отправлено.")
+            logging.debug("Сообщение об успехе отправлено.")
             await state.clear()
-            logging.info("Состояние FSM очищено.")
+            logging.debug("Состояние FSM очищено.")
         except sa_exc.IntegrityError as e:
-            logging.error(f"IntegrityError при сохранении заказа: {e}", exc_info=True)
+            logging.error("IntegrityError при сохранении заказа: %s", e, exc_info=True)
             await session.rollback() # Откат транзакции
             error_message = f"❌ Ошибка целостности данных при создании заказа: {escape_markdown_v2(str(e))}\n" \
                             "Пожалуйста, проверьте данные или обратитесь к администратору."
             await callback.message.edit_text(error_message, parse_mode="MarkdownV2")
-            logging.info("Сообщение об ошибке целостности данных отправлено. FSM очищено.")
+            logging.debug("Сообщение об ошибке целостности данных отправлено. FSM очищено.")
             await state.clear()
         except Exception as e:
-            logging.error(f"Непредвиденная ошибка при сохранении заказа: {e}", exc_info=True)
+            logging.error("Непредвиденная ошибка при сохранении заказа: %s", e, exc_info=True)
             await session.rollback() # Откат транзакции
             error_message = f"❌ Произошла непредвиденная ошибка при сохранении заказа: {escape_markdown_v2(str(e))}\n" \
                             "Пожалуйста, попробуйте еще раз или обратитесь к администратору."
             await callback.message.edit_text(error_message, parse_mode="MarkdownV2")
-            logging.info("Сообщение о непредвиденной ошибке отправлено. FSM очищено.")
+            logging.debug("Сообщение о непредвиденной ошибке отправлено. FSM очищено.")
             await state.clear()
     await callback.answer() # Всегда отвечаем на callback_query
-    logging.info("Функция confirm_and_save_order завершена.")
+    logging.debug("Функция confirm_and_save_order завершена.")
 
 @router.callback_query(F.data == "back_to_address_selection")
 async def back_to_address_selection(callback: CallbackQuery, state: FSMContext, bot: Bot):
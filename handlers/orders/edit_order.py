@@ -9,10 +9,11 @@ from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKe
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from middlewares.role_middleware import RoleMiddleware
+from config import settings
 from db.setup import get_db_session
 from db.models import Order, Client, Employee, Address, OrderLine, Product # Убедитесь, что все эти модели импортированы
 from sqlalchemy.future import select
-from sqlalchemy import delete
+from sqlalchemy import delete, literal, tuple_
 from sqlalchemy.orm import selectinload
 from utils.text_formatter import escape_markdown_v2, bold, italic
 from states.order_states import OrderEditingStates
@@ -41,6 +42,69 @@ router.include_router(delete_product.router)
 router.include_router(delete_order.router)
 
 
+MY_ORDERS_STATUSES = ['draft', 'pending']
+
+
+async def build_my_orders_keyboard(employee_id: int, direction: str = "next",
+                                   anchor_id: int | None = None) -> InlineKeyboardMarkup | None:
+    """
+    Страница списка /my_orders: заказы сотрудника от новых к старым, после (direction='next')
+    или перед (direction='prev') заказом anchor_id. Один запрос с JOIN клиента,
+    keyset-пагинация по (order_date, order_id) по индексу idx_order_employee_status_date.
+    Возвращает None, если на странице нет заказов.
+    """
+    page_size = settings.MY_ORDERS_PAGE_SIZE
+    stmt = select(
+        Order.order_id, Order.order_date, Order.total_amount, Order.status, Client.name.label('client_name')
+    ).outerjoin(Client, Client.client_id == Order.client_id).where(
+        Order.employee_id == employee_id,
+        Order.status.in_(MY_ORDERS_STATUSES)
+    )
+    if anchor_id is not None:
+        anchor_date = select(Order.order_date).where(Order.order_id == anchor_id).scalar_subquery()
+        anchor = tuple_(anchor_date, literal(anchor_id))
+        key = tuple_(Order.order_date, Order.order_id)
+        stmt = stmt.where(key > anchor if direction == "prev" else key < anchor)
+    if direction == "prev":
+        stmt = stmt.order_by(Order.order_date, Order.order_id)
+    else:
+        stmt = stmt.order_by(Order.order_date.desc(), Order.order_id.desc())
+    stmt = stmt.limit(page_size + 1) # Лишняя строка показывает, есть ли еще страница
+
+    async for session in get_db_session():
+        result = await session.execute(stmt)
+        orders = result.all()
+
+    has_more = len(orders) > page_size
+    orders = orders[:page_size]
+    if not orders:
+        return None
+    if direction == "prev":
+        orders.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = anchor_id is not None, has_more
+
+    buttons = []
+    for order in orders:
+        client_name = order.client_name or "Неизвестный клиент"
+        button_text = escape_markdown_v2(
+            f"№{order.order_id} | {client_name} | {order.order_date.strftime('%d.%m.%Y')} | {round(order.total_amount, 2)} грн | {order.status}"
+        )
+        buttons.append([InlineKeyboardButton(text=button_text, callback_data=f"edit_order_select_{order.order_id}")])
+
+    nav_row = []
+    if has_prev:
+        nav_row.append(InlineKeyboardButton(text="◀️ Назад", callback_data=f"my_orders:prev:{orders[0].order_id}"))
+    if has_next:
+        nav_row.append(InlineKeyboardButton(text="Вперед ▶️", callback_data=f"my_orders:next:{orders[-1].order_id}"))
+    if nav_row:
+        buttons.append(nav_row)
+    buttons.append([InlineKeyboardButton(text="❌ Отменить", callback_data="cancel_order_editing")])
+
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
 @router.message(Command("my_orders"))
 async def cmd_my_orders(message: Message, state: FSMContext, user_role: str, db_user: Employee):
     """
@@ -48,40 +112,32 @@ async def cmd_my_orders(message: Message, state: FSMContext, user_role: str, db_
     """
     await message.answer(f"Вы {user_role}. Загружаю ваши неподтвержденные заказы.")
 
-    async for session in get_db_session():
-        orders_stmt = select(Order).where(
-            Order.employee_id == db_user.employee_id,
-            Order.status.in_(['draft', 'pending'])
-        ).order_by(Order.order_date.desc())
-
-        orders_result = await session.execute(orders_stmt)
-        orders = orders_result.scalars().all()
-
-        if not orders:
-            await message.answer("У вас нет активных (черновиков или ожидающих) заказов для редактирования.")
-            await state.clear()
-            return
-
-        buttons = []
-        for order in orders:
-            client_name = "Неизвестный клиент"
-            if order.client_id:
-                client_stmt = select(Client).where(Client.client_id == order.client_id)
-                client_result = await session.execute(client_stmt)
-                client = client_result.scalar_one_or_none()
-                if client:
-                    client_name = client.name
-
-            button_text = escape_markdown_v2(
-                f"№{order.order_id} | {client_name} | {order.order_date.strftime('%d.%m.%Y')} | {round(order.total_amount, 2)} грн | {order.status}"
-            )
-            buttons.append([InlineKeyboardButton(text=button_text, callback_data=f"edit_order_select_{order.order_id}")])
-
-        buttons.append([InlineKeyboardButton(text="❌ Отменить", callback_data="cancel_order_editing")])
-
-        keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
-        await message.answer("Выберите заказ для редактирования:", reply_markup=keyboard, parse_mode="MarkdownV2")
-        await state.set_state(OrderEditingStates.waiting_for_my_order_selection)
+    keyboard = await build_my_orders_keyboard(db_user.employee_id)
+    if keyboard is None:
+        await message.answer("У вас нет активных (черновиков или ожидающих) заказов для редактирования.")
+        await state.clear()
+        return
+
+    await message.answer("Выберите заказ для редактирования:", reply_markup=keyboard, parse_mode="MarkdownV2")
+    await state.set_state(OrderEditingStates.waiting_for_my_order_selection)
+
+
+@router.callback_query(OrderEditingStates.waiting_for_my_order_selection, F.data.startswith("my_orders:"))
+async def process_my_orders_page(callback: CallbackQuery, state: FSMContext, bot: Bot, db_user: Employee):
+    """
+    Листание списка /my_orders.
+    """
+    _, direction, anchor_id = callback.data.split(":")
+    keyboard = await build_my_orders_keyboard(db_user.employee_id, direction, int(anchor_id))
+    if keyboard is None:
+        # Заказы на странице могли быть подтверждены или удалены — показываем первую страницу
+        keyboard = await build_my_orders_keyboard(db_user.employee_id)
+    if keyboard is None:
+        await callback.message.edit_text("У вас нет активных (черновиков или ожидающих) заказов для редактирования.")
+        await state.clear()
+    else:
+        await callback.message.edit_reply_markup(reply_markup=keyboard)
+    await callback.answer()
 
 
 # ✅ НОВЫЙ ХЭНДЛЕР: Обработка выбора заказа (для решения Проблемы 2)
@@ -10,10 +10,12 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from middlewares.role_middleware import RoleMiddleware
 from db.setup import get_db_session
-from db.models import Order, OrderLine, Product # Убедитесь, что все эти модели импортированы
+from db.models import Product
 from sqlalchemy.future import select
-from sqlalchemy import insert # Добавляем insert
 from utils.text_formatter import escape_markdown_v2, bold, italic
+from utils.keyboards import order_product_picker
+from services.order_service import add_order_lines
+from services.order_editing_service import invalidate_order_summary
 from states.order_states import OrderEditingStates, OrderCreationStates # Нужен OrderCreationStates для wait_for_product_quantity
 
 # Импортируем функцию для возврата в меню редактирования из главного файла edit_order.py
@@ -36,43 +38,34 @@ async def add_product_to_order_start(callback: CallbackQuery, state: FSMContext,
     await state.update_data(editing_order_id=order_id, adding_to_existing_order=True) # Устанавливаем флаг
     
     await send_product_options(callback, state, bot) # Вызываем функцию выбора товара
-    logging.debug(f"add_product_to_order_start: Состояние установлено на {OrderCreationStates.waiting_for_product_selection}")
+    logging.debug("add_product_to_order_start: Состояние установлено на %s", OrderCreationStates.waiting_for_product_selection)
 
 # Обязательно убедитесь, что функция send_product_options принимает 'bot'
 async def send_product_options(update_obj: Message | CallbackQuery, state: FSMContext, bot: Bot):
     """
-    Отправляет список товаров для добавления в заказ.
+    Отправляет первую страницу списка товаров для добавления в заказ.
+    Листание страниц обрабатывает process_product_page_order в add_product_order.py.
     """
-    async for session in get_db_session():
-        products_stmt = select(Product)
-        products_result = await session.execute(products_stmt)
-        products = products_result.scalars().all()
-
-        if not products:
-            if isinstance(update_obj, Message):
-                await update_obj.answer("В системе пока нет зарегистрированных товаров. Пожалуйста, добавьте их сначала.")
-            else:
-                await update_obj.message.edit_text("В системе пока нет зарегистрированных товаров. Пожалуйста, добавьте их сначала.")
-            await state.clear()
-            return
-
-        buttons = []
-        for product in products:
-            button_text = f"{product.name} ({product.price} грн)" # Без parse_mode, поэтому без экранирования внутри f-строки
-            buttons.append([InlineKeyboardButton(text=button_text, callback_data=f"select_product_order_{product.product_id}")])
-
-        buttons.append([InlineKeyboardButton(text="↩️ Назад к выбору адреса", callback_data="back_to_address_selection")])
-        buttons.append([InlineKeyboardButton(text="❌ Отменить", callback_data="cancel_order_creation")])
-
-        keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+    keyboard = await order_product_picker.build_keyboard(extra_rows=[
+        [InlineKeyboardButton(text="↩️ Назад к выбору адреса", callback_data="back_to_address_selection")],
+        [InlineKeyboardButton(text="❌ Отменить", callback_data="cancel_order_creation")],
+    ])
 
-        message_text = "Выберите товар для добавления в заказ:"
+    if keyboard is None:
         if isinstance(update_obj, Message):
-            await update_obj.answer(message_text, reply_markup=keyboard) # Убрали parse_mode
-        else: # CallbackQuery
-            await update_obj.message.edit_text(message_text, reply_markup=keyboard) # Убрали parse_mode
+            await update_obj.answer("В системе пока нет зарегистрированных товаров. Пожалуйста, добавьте их сначала.")
+        else:
+            await update_obj.message.edit_text("В системе пока нет зарегистрированных товаров. Пожалуйста, добавьте их сначала.")
+        await state.clear()
+        return
+
+    message_text = "Выберите товар для добавления в заказ:"
+    if isinstance(update_obj, Message):
+        await update_obj.answer(message_text, reply_markup=keyboard) # Убрали parse_mode
+    else: # CallbackQuery
+        await update_obj.message.edit_text(message_text, reply_markup=keyboard) # Убрали parse_mode
 
-        await state.set_state(OrderCreationStates.waiting_for_product_selection)
+    await state.set_state(OrderCreationStates.waiting_for_product_selection)
 
 
 @router.callback_query(OrderCreationStates.waiting_for_product_selection, F.data.startswith("select_product_order_"))
@@ -150,34 +143,27 @@ async def process_product_quantity_order(message: Message, state: FSMContext, bo
     if adding_to_existing_order:
         async for session in get_db_session():
             try:
-                order_stmt = select(Order).where(Order.order_id == order_id)
-                order_result = await session.execute(order_stmt)
-                order = order_result.scalar_one_or_none()
-
-                if not order:
+                # Вставка позиции и пересчет суммы заказа — один запрос
+                added = await add_order_lines(session, order_id, [{
+                    'product_id': current_product_id,
+                    'quantity': new_quantity,
+                    'unit_price': unit_price,
+                }])
+
+                if added is None:
                     await message.answer("Ошибка: Основной заказ не найден для добавления товара. Пожалуйста, начните /my_orders снова.")
                     await state.clear()
-                    logging.error(f"process_product_quantity_order: Order {order_id} не найден при добавлении товара.")
+                    logging.error("process_product_quantity_order: Order %s не найден при добавлении товара.", order_id)
                     return
 
-                insert_stmt_order_line = insert(OrderLine).values(
-                    order_id=order_id,
-                    product_id=current_product_id,
-                    quantity=new_quantity,
-                    unit_price=unit_price,
-                )
-                await session.execute(insert_stmt_order_line)
-                logging.info(f"Новая OrderLine для product_id {current_product_id} добавлена в заказ {order_id}.")
-
-                order.total_amount += line_total
-                logging.info(f"Общая сумма заказа {order_id} увеличена на {line_total}.")
-
+                _, new_total_amount = added
                 await session.commit()
-                logging.info("Транзакция успешно закоммичена: новый товар добавлен в заказ и сумма обновлена.")
+                invalidate_order_summary(order_id)
+                logging.info("В заказ %s добавлен товар %s, сумма заказа: %s.", order_id, current_product_id, new_total_amount)
 
                 await message.answer(
                     f"✅ Товар '{escape_markdown_v2(current_product_name)}' ({new_quantity} шт.) добавлен в заказ №{order_id}.\n"
-                    f"Текущая сумма заказа: {escape_markdown_v2(str(round(order.total_amount, 2)))} грн."
+                    f"Текущая сумма заказа: {escape_markdown_v2(str(round(new_total_amount, 2)))} грн."
                 )
                 
                 await state.update_data(adding_to_existing_order=False)
@@ -196,7 +182,7 @@ async def process_product_quantity_order(message: Message, state: FSMContext, bo
             except Exception as e:
                 await session.rollback()
                 await message.answer(f"❌ Произошла ошибка при добавлении товара в заказ: {str(e)}\n")
-                logging.error(f"process_product_quantity_order: Ошибка при добавлении товара в заказ {order_id}: {e}", exc_info=True)
+                logging.error("process_product_quantity_order: Ошибка при добавлении товара в заказ %s: %s", order_id, e, exc_info=True)
                 await state.clear()
                 return
 
@@ -15,7 +15,7 @@ from utils.text_formatter import escape_markdown_v2, bold, italic
 from states.order_states import OrderEditingStates
 
 # Импортируем функцию для возврата в меню редактирования из общего сервисного файла
-from services.order_editing_service import process_my_order_selection, return_to_order_menu
+from services.order_editing_service import process_my_order_selection, return_to_order_menu, invalidate_order_summary
 
 router = Router()
 
@@ -85,6 +85,7 @@ async def process_new_delivery_date_selection(callback: CallbackQuery, state: FS
             if order:
                 order.delivery_date = new_delivery_date
                 await session.commit()
+                invalidate_order_summary(order_id)
                 # ✅ ИСПРАВЛЕНИЕ ЗДЕСЬ: УДАЛЯЕМ bold() И parse_mode="MarkdownV2"
                 await bot(callback.message.edit_text(f"✅ Дата доставки для заказа №{order_id} успешно обновлена на: {new_delivery_date.strftime('%d.%m.%Y')}!")) # <--- УДАЛЕНО: parse_mode="MarkdownV2"
                 await return_to_order_menu(callback, state, bot)
@@ -96,7 +97,7 @@ async def process_new_delivery_date_selection(callback: CallbackQuery, state: FS
             await session.rollback()
             # ✅ ИСПРАВЛЕНИЕ ЗДЕСЬ: УДАЛЯЕМ bold() И parse_mode="MarkdownV2"
             await bot(callback.message.edit_text(f"❌ Произошла ошибка при обновлении даты доставки: {str(e)}\n")) # <--- УДАЛЕНО: parse_mode="MarkdownV2"
-            logging.error(f"Ошибка при обновлении даты доставки для заказа {order_id}: {e}", exc_info=True)
+            logging.error("Ошибка при обновлении даты доставки для заказа %s: %s", order_id, e, exc_info=True)
             await state.clear()
         # finally: # callback.answer() уже в начале
         #     await bot(callback.answer())
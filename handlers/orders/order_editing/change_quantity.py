@@ -15,7 +15,7 @@ from sqlalchemy.orm import selectinload
 from utils.text_formatter import escape_markdown_v2, bold, italic
 from states.order_states import OrderEditingStates
 
-from services.order_editing_service import process_my_order_selection, return_to_order_menu
+from services.order_editing_service import process_my_order_selection, return_to_order_menu, invalidate_order_summary
 
 router = Router()
 
@@ -35,7 +35,7 @@ async def edit_item_quantity_start(callback: CallbackQuery, state: FSMContext, b
     current_data = await state.get_data()
     if 'editing_order_id' not in current_data or current_data['editing_order_id'] != order_id:
         await state.update_data(editing_order_id=order_id)
-        logging.debug(f"edit_item_quantity_start: Состояние 'editing_order_id' установлено на {order_id}")
+        logging.debug("edit_item_quantity_start: Состояние 'editing_order_id' установлено на %s", order_id)
 
 
     async for session in get_db_session():
@@ -63,12 +63,12 @@ async def edit_item_quantity_start(callback: CallbackQuery, state: FSMContext, b
             keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
             await bot(callback.message.edit_text("Выберите товар, количество которого хотите изменить:", reply_markup=keyboard, parse_mode="MarkdownV2"))
             await state.set_state(OrderEditingStates.waiting_for_item_to_edit_quantity)
-            logging.debug(f"edit_item_quantity_start: Состояние установлено на {OrderEditingStates.waiting_for_item_to_edit_quantity}")
+            logging.debug("edit_item_quantity_start: Состояние установлено на %s", OrderEditingStates.waiting_for_item_to_edit_quantity)
 
         except Exception as e:
             await session.rollback()
             await bot(callback.message.edit_text(f"{bold('❌ Произошла ошибка при загрузке позиций для изменения количества:')}\n{escape_markdown_v2(str(e))}", parse_mode="MarkdownV2"))
-            logging.error(f"Ошибка при загрузке позиций для изменения количества из заказа {order_id}: {e}", exc_info=True)
+            logging.error("Ошибка при загрузке позиций для изменения количества из заказа %s: %s", order_id, e, exc_info=True)
             await state.clear()
 
 
@@ -81,7 +81,7 @@ async def process_item_to_edit_quantity(callback: CallbackQuery, state: FSMConte
     await bot(callback.answer())
     
     current_state = await state.get_state()
-    logging.debug(f"process_item_to_edit_quantity: Текущее состояние бота: {current_state}")
+    logging.debug("process_item_to_edit_quantity: Текущее состояние бота: %s", current_state)
 
     order_line_id = int(callback.data.split("_")[-1])
     
@@ -95,7 +95,7 @@ async def process_item_to_edit_quantity(callback: CallbackQuery, state: FSMConte
         return
 
     await state.update_data(editing_order_line_id=order_line_id)
-    logging.debug(f"process_item_to_edit_quantity: editing_order_line_id установлен на {order_line_id}")
+    logging.debug("process_item_to_edit_quantity: editing_order_line_id установлен на %s", order_line_id)
 
 
     async for session in get_db_session():
@@ -114,7 +114,7 @@ async def process_item_to_edit_quantity(callback: CallbackQuery, state: FSMConte
                     data=f"edit_order_select_{order_id}"
                 )
                 await process_my_order_selection(temp_callback, state, bot)
-                logging.warning(f"process_item_to_edit_quantity: OrderLine с ID {order_line_id} не найден.")
+                logging.warning("process_item_to_edit_quantity: OrderLine с ID %s не найден.", order_line_id)
                 return
 
             product_name = escape_markdown_v2(order_line.product.name if order_line.product else "Неизвестный товар")
@@ -128,12 +128,12 @@ async def process_item_to_edit_quantity(callback: CallbackQuery, state: FSMConte
                 parse_mode="MarkdownV2"
             ))
             await state.set_state(OrderEditingStates.waiting_for_new_quantity)
-            logging.debug(f"process_item_to_edit_quantity: Состояние установлено на {OrderEditingStates.waiting_for_new_quantity}")
+            logging.debug("process_item_to_edit_quantity: Состояние установлено на %s", OrderEditingStates.waiting_for_new_quantity)
             
         except Exception as e:
             await session.rollback()
             await bot(callback.message.edit_text(f"{bold('❌ Произошла ошибка при подготовке к изменению количества:')}\n{escape_markdown_v2(str(e))}", parse_mode="MarkdownV2"))
-            logging.error(f"Ошибка при подготовке к изменению количества позиции {order_line_id} из заказа {order_id}: {e}", exc_info=True)
+            logging.error("Ошибка при подготовке к изменению количества позиции %s из заказа %s: %s", order_line_id, order_id, e, exc_info=True)
             await state.clear()
 
 
@@ -179,7 +179,7 @@ async def process_new_quantity(message: Message, state: FSMContext, bot: Bot):
                     data=f"edit_order_select_{order_id_from_state}"
                 )
                 await process_my_order_selection(temp_callback, state, bot) # Передаем bot
-                logging.warning(f"process_new_quantity: OrderLine с ID {order_line_id} не найден.")
+                logging.warning("process_new_quantity: OrderLine с ID %s не найден.", order_line_id)
                 return
 
             old_quantity = order_line.quantity
@@ -199,6 +199,7 @@ async def process_new_quantity(message: Message, state: FSMContext, bot: Bot):
                 order.total_amount = order.total_amount - old_line_total + new_line_total
                 
                 await session.commit() # ЕДИНСТВЕННЫЙ COMMIT В КОНЦЕ УСПЕШНОЙ ЛОГИКИ
+                invalidate_order_summary(order_id_from_state)
                 logging.info("Транзакция успешно закоммичена: количество позиции и общая сумма заказа обновлены.")
 
                 # ✅ ИСПРАВЛЕНИЕ ЗДЕСЬ: УДАЛЯЕМ parse_mode="MarkdownV2" И bold/escape_markdown_v2
@@ -230,7 +231,7 @@ async def process_new_quantity(message: Message, state: FSMContext, bot: Bot):
             else:
                 await message.answer("Ошибка: Заказ не найден для обновления общей суммы. Изменения отменены.")
                 await session.rollback()
-                logging.warning(f"process_new_quantity: Order с ID {order_id_from_state} не найден для обновления суммы.")
+                logging.warning("process_new_quantity: Order с ID %s не найден для обновления суммы.", order_id_from_state)
                 await state.clear()
 
 
@@ -240,7 +241,7 @@ async def process_new_quantity(message: Message, state: FSMContext, bot: Bot):
             # Сообщение об ошибке как ПЛЕЙН ТЕКСТ.
             await message.answer(f"❌ Произошла ошибка при обновлении количества: {str(e)}\n")
             print(f"Ошибка при обновлении количества: {e}")
-            logging.error(f"process_new_quantity: Непредвиденная ошибка: {e}", exc_info=True)
+            logging.error("process_new_quantity: Непредвиденная ошибка: %s", e, exc_info=True)
             await state.clear()
 
 
@@ -13,7 +13,7 @@ from sqlalchemy import delete
 from sqlalchemy.future import select
 from utils.text_formatter import bold, escape_markdown_v2 # bold и escape_markdown_v2 импортированы
 from states.order_states import OrderEditingStates
-from services.order_editing_service import process_my_order_selection
+from services.order_editing_service import process_my_order_selection, invalidate_order_summary
 
 router = Router()
 router.message.middleware(RoleMiddleware(required_roles=['admin', 'manager']))
@@ -64,7 +64,8 @@ async def confirm_delete_order_yes(callback: CallbackQuery, state: FSMContext, b
             await session.execute(delete(Order).where(Order.order_id == order_id))
             
             await session.commit()
-            logging.info(f"Транзакция успешно закоммичена: заказ {order_id} полностью удален.")
+            invalidate_order_summary(order_id)
+            logging.info("Транзакция успешно закоммичена: заказ %s полностью удален.", order_id)
 
             # ✅ ИСПРАВЛЕНИЕ ЗДЕСЬ: УДАЛЯЕМ bold() И parse_mode="MarkdownV2"
             await bot(callback.message.edit_text(f"✅ Заказ №{order_id} успешно удален.")) # Простой текст
@@ -75,7 +76,7 @@ async def confirm_delete_order_yes(callback: CallbackQuery, state: FSMContext, b
             await session.rollback()
             # ✅ ИСПРАВЛЕНИЕ ЗДЕСЬ: УДАЛЯЕМ bold() И parse_mode="MarkdownV2"
             await bot(callback.message.edit_text(f"❌ Произошла ошибка при удалении заказа: {str(e)}\n")) # Простой текст
-            logging.error(f"Ошибка при удалении заказа {order_id}: {e}", exc_info=True)
+            logging.error("Ошибка при удалении заказа %s: %s", order_id, e, exc_info=True)
             await state.clear()
 
 
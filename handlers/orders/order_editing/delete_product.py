@@ -17,7 +17,7 @@ from utils.text_formatter import escape_markdown_v2, bold, italic
 from states.order_states import OrderEditingStates # Убедитесь, что импортирован
 
 # Импортируем функцию для возврата в меню редактирования из общего сервисного файла
-from services.order_editing_service import process_my_order_selection, return_to_order_menu
+from services.order_editing_service import process_my_order_selection, return_to_order_menu, invalidate_order_summary
 
 router = Router()
 
@@ -38,7 +38,7 @@ async def delete_item_from_order_start(callback: CallbackQuery, state: FSMContex
     data = await state.get_data()
     if 'editing_order_id' not in data or data['editing_order_id'] != order_id:
         await state.update_data(editing_order_id=order_id)
-        logging.debug(f"delete_item_from_order_start: Состояние 'editing_order_id' установлено на {order_id}")
+        logging.debug("delete_item_from_order_start: Состояние 'editing_order_id' установлено на %s", order_id)
 
     async for session in get_db_session():
         try:
@@ -74,13 +74,13 @@ async def delete_item_from_order_start(callback: CallbackQuery, state: FSMContex
             keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
             await bot(callback.message.edit_text("Выберите товар, который хотите удалить:", reply_markup=keyboard, parse_mode="MarkdownV2"))
             await state.set_state(OrderEditingStates.waiting_for_item_to_delete)
-            logging.debug(f"delete_item_from_order_start: Состояние установлено на {OrderEditingStates.waiting_for_item_to_delete}")
+            logging.debug("delete_item_from_order_start: Состояние установлено на %s", OrderEditingStates.waiting_for_item_to_delete)
 
         except Exception as e:
             await session.rollback()
             # ✅ Важно: экранируем текст ошибки, если используем MarkdownV2
             await bot(callback.message.edit_text(f"{bold('❌ Произошла ошибка при загрузке позиций для удаления:')}\n{escape_markdown_v2(str(e))}", parse_mode="MarkdownV2"))
-            logging.error(f"Ошибка при загрузке позиций для удаления из заказа {order_id}: {e}", exc_info=True)
+            logging.error("Ошибка при загрузке позиций для удаления из заказа %s: %s", order_id, e, exc_info=True)
             await state.clear()
 
 
@@ -116,7 +116,7 @@ async def process_item_to_delete(callback: CallbackQuery, state: FSMContext, bot
                     data=f"edit_order_select_{order_id}"
                 )
                 await process_my_order_selection(temp_callback, state, bot)
-                logging.warning(f"process_item_to_delete: OrderLine с ID {order_line_id} не найден.")
+                logging.warning("process_item_to_delete: OrderLine с ID %s не найден.", order_line_id)
                 return
 
             # ✅ ИСПРАВЛЕНИЕ: Получаем quantity и line_total из order_line здесь
@@ -137,12 +137,12 @@ async def process_item_to_delete(callback: CallbackQuery, state: FSMContext, bot
                 parse_mode="MarkdownV2"
             ))
             await state.set_state(OrderEditingStates.waiting_for_line_delete_confirmation)
-            logging.debug(f"process_item_to_delete: Состояние установлено на {OrderEditingStates.waiting_for_line_delete_confirmation}")
+            logging.debug("process_item_to_delete: Состояние установлено на %s", OrderEditingStates.waiting_for_line_delete_confirmation)
 
         except Exception as e:
             await session.rollback()
             await bot(callback.message.edit_text(f"{bold('❌ Произошла ошибка при подготовке к удалению:')}\n{escape_markdown_v2(str(e))}", parse_mode="MarkdownV2"))
-            logging.error(f"Ошибка при подготовке к удалению позиции {order_line_id} из заказа {order_id}: {e}", exc_info=True)
+            logging.error("Ошибка при подготовке к удалению позиции %s из заказа %s: %s", order_line_id, order_id, e, exc_info=True)
             await state.clear()
 
 
@@ -180,13 +180,13 @@ async def confirm_delete_line_yes(callback: CallbackQuery, state: FSMContext, bo
                     data=f"edit_order_select_{order_id_from_state}"
                 )
                 await process_my_order_selection(temp_callback, state, bot)
-                logging.warning(f"confirm_delete_line_yes: OrderLine с ID {order_line_id} не найден.")
+                logging.warning("confirm_delete_line_yes: OrderLine с ID %s не найден.", order_line_id)
                 return
 
             deleted_line_total = order_line_to_delete.line_total
 
             await session.execute(delete(OrderLine).where(OrderLine.order_line_id == order_line_id))
-            logging.info(f"OrderLine {order_line_id} удален из заказа {order_id_from_state}.")
+            logging.info("OrderLine %s удален из заказа %s.", order_line_id, order_id_from_state)
 
             order_stmt = select(Order).where(Order.order_id == order_id_from_state)
             order_result = await session.execute(order_stmt)
@@ -196,6 +196,7 @@ async def confirm_delete_line_yes(callback: CallbackQuery, state: FSMContext, bo
                 order.total_amount = order.total_amount - deleted_line_total
                 
                 await session.commit()
+                invalidate_order_summary(order_id_from_state)
                 logging.info("Транзакция успешно закоммичена: позиция удалена и общая сумма заказа обновлена.")
 
                 await bot(callback.message.edit_text(f"{bold('✅ Позиция успешно удалена.')}\n"
@@ -214,13 +215,13 @@ async def confirm_delete_line_yes(callback: CallbackQuery, state: FSMContext, bo
             else:
                 await bot(callback.answer("Ошибка: Заказ не найден для обновления общей суммы. Изменения отменены.", show_alert=True))
                 await session.rollback()
-                logging.warning(f"confirm_delete_line_yes: Order с ID {order_id_from_state} не найден для обновления суммы.")
+                logging.warning("confirm_delete_line_yes: Order с ID %s не найден для обновления суммы.", order_id_from_state)
                 await state.clear()
 
         except Exception as e:
             await session.rollback()
             await bot(callback.message.edit_text(f"{bold('❌ Произошла ошибка при удалении позиции:')}\n{escape_markdown_v2(str(e))}", parse_mode="MarkdownV2"))
-            logging.error(f"Ошибка при удалении позиции {order_line_id} из заказа {order_id_from_state}: {e}", exc_info=True)
+            logging.error("Ошибка при удалении позиции %s из заказа %s: %s", order_line_id, order_id_from_state, e, exc_info=True)
             await state.clear()
 
 
@@ -1,30 +1,37 @@
 # main.py
 import asyncio
 import logging
+import signal
+from aiohttp import web
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.fsm.strategy import FSMStrategy
 from aiogram.types import BotCommand
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 
 
 from config import settings
-from db.setup import engine # Correct for engine
-from db.models import Base  # CORRECT for Base (Base is defined in models.py)
-from handlers import common, admin, manager, cashier, inventory_add
+from db.fsm_storage import create_fsm_storage
+from db.migrate import check_schema_version, upgrade as upgrade_schema
+from handlers import common, admin, manager, cashier, exports, inventory_add, inventory_adjust, inventory_report, inline_search
 from handlers.orders import add_client_order # Импортируем отдельные роутеры из handlers.orders
 from handlers.orders import add_addresses_order
 from handlers.orders import add_product_order
 from handlers.orders import add_datedeliveries_order
 from handlers.orders import edit_order
 from middlewares.role_middleware import RoleMiddleware
+from middlewares.send_queue import send_queue
+from middlewares.metrics import ApiCallMetricsMiddleware, HandlerLabelMiddleware, UpdateMetricsMiddleware
+from utils.keyboards import warm_up_product_pickers
+from utils.logging_setup import setup_logging
+from utils.metrics import start_metrics_server
+from services.cash_ledger import start_snapshot_job, stop_snapshot_job
+from services.client_search import warm_up_client_index
+from services.payment_totals import start_rollup_job, stop_rollup_job
+from services.stock_history import start_stock_snapshot_job, stop_stock_snapshot_job
+from services.product_search import warm_up_product_index
 
-logging.basicConfig(level=logging.DEBUG) # <--- ИЗМЕНЕНО: level=logging.DEBUG
-
-# Добавьте логирование для aiohttp.client и aiogram на уровень DEBUG
-logging.getLogger('aiohttp.client').setLevel(logging.DEBUG)
-logging.getLogger('aiogram').setLevel(logging.DEBUG)
-# SQLAlchemy можно оставить на INFO, если не нужно много SQL-логов
-logging.getLogger('sqlalchemy.engine').setLevel(logging.INFO)
 
 # Функция для установки команд главного меню
 async def set_main_menu_commands(bot: Bot):
@@ -40,50 +47,193 @@ async def set_main_menu_commands(bot: Bot):
 
         BotCommand(command="/payments", description="💳 Принять оплату"),       # Иконка кредитной карты
         BotCommand(command="/financial_report_today", description="💰 Отчет об оплатах за сегодня"), # Иконка мешка денег/монеток
+        BotCommand(command="/financial_report", description="🗓️ Отчет об оплатах за период"), # Иконка календаря
         BotCommand(command="/cash_balance", description="💲 Остаток по кассе"),   # Иконка доллара/денежного мешка
         BotCommand(command="/accounts_receivable", description="📊 Дебиторская задолженность"), # Иконка гистограммы
 
         BotCommand(command="/add_delivery", description="🚚 Добавить поступление товара"), # Иконка грузовика
         BotCommand(command="/adjust_inventory", description="🗄️ Корректировка по складу"), # Иконка картотеки/шкафа
         BotCommand(command="/inventory_report", description="🔍 Отчет об остатках товара"), # Иконка лупы/поиска
+        BotCommand(command="/stock_as_of", description="📅 Остатки на дату"), # Иконка календаря
+
+        BotCommand(command="/export_orders", description="📤 Выгрузка заказов (CSV)"), # Иконка исходящего лотка
+        BotCommand(command="/export_movements", description="📤 Выгрузка движений товара (CSV)"),
+        BotCommand(command="/export_cash", description="📤 Выгрузка движения денег (CSV)"),
     ]
     await bot.set_my_commands(commands)
 
-async def main():
-    # Настройка логирования
-    logging.basicConfig(level=logging.INFO)
-
-    # Инициализация бота и диспетчера
-    bot = Bot(token=settings.BOT_TOKEN)
-    dp = Dispatcher(storage=MemoryStorage(), fsm_strategy=FSMStrategy.CHAT)
+def create_bot() -> Bot:
+    """
+    Создает бота. Если задан TELEGRAM_API_SERVER, запросы идут на этот адрес
+    (локальный Bot API сервер или тестовая заглушка Telegram) вместо api.telegram.org.
+    """
+    session = None
+    if settings.TELEGRAM_API_SERVER:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(settings.TELEGRAM_API_SERVER))
+    bot = Bot(token=settings.BOT_TOKEN, session=session)
+    if settings.METRICS_ENABLED:
+        bot.session.middleware(ApiCallMetricsMiddleware())
+    if settings.SEND_QUEUE_ENABLED:
+        # Все запросы отправки/правки сообщений проходят через общую очередь с лимитами
+        bot.session.middleware(send_queue)
+    return bot
+
+
+def create_dispatcher(storage) -> Dispatcher:
+    """
+    Создает диспетчер с middlewares, роутерами и хуками запуска/остановки.
+    """
+    dp = Dispatcher(storage=storage, fsm_strategy=FSMStrategy.CHAT)
 
     # Регистрация middlewares
+    if settings.METRICS_ENABLED:
+        # Метрики: время, SQL-запросы и вызовы API на апдейт с метками хэндлера и состояния FSM
+        dp.update.outer_middleware(UpdateMetricsMiddleware())
+        dp.message.middleware(HandlerLabelMiddleware())
+        dp.callback_query.middleware(HandlerLabelMiddleware())
+        dp.inline_query.middleware(HandlerLabelMiddleware())
     dp.message.middleware(RoleMiddleware())
     dp.callback_query.middleware(RoleMiddleware())
+    dp.inline_query.middleware(RoleMiddleware())
 
     # Регистрация роутеров (хэндлеров)
     dp.include_router(common.router)
+    dp.include_router(inline_search.router) # До роутеров заказов: перехватывает сообщения, отправленные через инлайн-режим
     dp.include_router(admin.router)
     dp.include_router(manager.router)
     dp.include_router(cashier.router)
+    dp.include_router(exports.router)
     dp.include_router(inventory_add.router)
+    dp.include_router(inventory_adjust.router)
+    dp.include_router(inventory_report.router)
     dp.include_router(add_client_order.router)
     dp.include_router(add_addresses_order.router)
     dp.include_router(add_product_order.router)
     dp.include_router(add_datedeliveries_order.router)
     dp.include_router(edit_order.router)
 
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    return dp
+
+
+async def on_startup(bot: Bot, dispatcher: Dispatcher):
+    # Схема БД меняется командой python -m db.migrate; при старте только сверяем версию
+    if settings.DB_MIGRATE_ON_STARTUP:
+        await upgrade_schema()
+    await check_schema_version()
 
-    # Создание таблиц, если их нет (только для первого запуска или если вы меняете схемы)
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # Заранее строим первые страницы выбора товара
+    await warm_up_product_pickers()
+    if settings.CLIENT_SEARCH_IN_MEMORY:
+        await warm_up_client_index()
+    if settings.PRODUCT_SEARCH_IN_MEMORY:
+        await warm_up_product_index()
+
+    # Периодические снимки остатка кассы и остатков товаров, свертка оплат в дневные итоги
+    start_snapshot_job()
+    start_rollup_job()
+    start_stock_snapshot_job()
 
     # Установка команд главного меню
     await set_main_menu_commands(bot)
 
-    # Запуск бота
+    if settings.BOT_MODE == "webhook":
+        # Все экземпляры бота за балансировщиком регистрируют один и тот же адрес — вызов идемпотентен
+        webhook_url = settings.WEBHOOK_BASE_URL.rstrip("/") + settings.WEBHOOK_PATH
+        await bot.set_webhook(
+            url=webhook_url,
+            secret_token=settings.WEBHOOK_SECRET,
+            allowed_updates=dispatcher.resolve_used_update_types(),
+        )
+        logging.info("Вебхук установлен: %s", webhook_url)
+
+
+async def on_shutdown(bot: Bot):
+    await stop_snapshot_job()
+    await stop_rollup_job()
+    await stop_stock_snapshot_job()
+    # При нескольких экземплярах за балансировщиком отключите WEBHOOK_DELETE_ON_SHUTDOWN,
+    # иначе остановка одного экземпляра снимет вебхук для всех
+    if settings.BOT_MODE == "webhook" and settings.WEBHOOK_DELETE_ON_SHUTDOWN:
+        await bot.delete_webhook()
+        logging.info("Вебхук удален.")
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher):
+    """
+    Принимает апдейты через вебхук: aiohttp-сервер на WEBAPP_HOST:WEBAPP_PORT.
+    Запросы без правильного заголовка X-Telegram-Bot-Api-Secret-Token отклоняются.
+    """
+    if not settings.WEBHOOK_BASE_URL:
+        raise RuntimeError("Для BOT_MODE=webhook нужно задать WEBHOOK_BASE_URL")
+    if not settings.WEBHOOK_SECRET:
+        # Без секрета любой, кто знает адрес, может присылать боту поддельные апдейты
+        raise RuntimeError("Для BOT_MODE=webhook нужно задать WEBHOOK_SECRET")
+
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=settings.WEBHOOK_SECRET,
+    ).register(app, path=settings.WEBHOOK_PATH)
+    # Запуск и остановка диспетчера (on_startup/on_shutdown, закрытие хранилища FSM и сессии бота)
+    # выполняются вместе с приложением
+    setup_application(app, dp, bot=bot)
+
+    # Метрики — только на отдельном METRICS_HOST:METRICS_PORT, а не на публичном порту вебхука
+    metrics_runner = None
+    if settings.METRICS_ENABLED:
+        metrics_runner = await start_metrics_server(settings.METRICS_HOST, settings.METRICS_PORT)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=settings.WEBAPP_HOST, port=settings.WEBAPP_PORT)
+    await site.start()
+    print(f"Бот запущен (вебхук, {settings.WEBAPP_HOST}:{settings.WEBAPP_PORT}{settings.WEBHOOK_PATH})...")
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError: # Windows
+            pass
+    try:
+        await stop_event.wait()
+    finally:
+        await runner.cleanup()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+
+
+async def run_polling(bot: Bot, dp: Dispatcher):
+    metrics_runner = None
+    if settings.METRICS_ENABLED:
+        metrics_runner = await start_metrics_server(settings.METRICS_HOST, settings.METRICS_PORT)
     print("Бот запущен...")
-    await dp.start_polling(bot)
+    try:
+        await bot.delete_webhook() # Long polling не работает при установленном вебхуке
+        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+    finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+
+
+async def main():
+    # Логи пишутся фоновым потоком; уровни и формат задаются в config (LOG_LEVEL, LOG_LEVELS, LOG_FORMAT)
+    setup_logging()
+
+    # Состояния FSM хранятся в PostgreSQL и переживают перезапуск бота
+    storage = await create_fsm_storage()
+    bot = create_bot()
+    dp = create_dispatcher(storage)
+
+    if settings.BOT_MODE == "webhook":
+        await run_webhook(bot, dp)
+    else:
+        await run_polling(bot, dp)
+
 
 if __name__ == '__main__':
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
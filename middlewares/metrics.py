@@ -0,0 +1,140 @@
+# middlewares/metrics.py
+
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import TelegramObject, Update
+from sqlalchemy import event
+
+from db.setup import engine, get_pool_stats
+from middlewares.send_queue import get_send_queue_stats
+from utils.metrics import COUNT_BUCKETS, Counter, Histogram, gauge_lines, register_collector
+
+
+@dataclass
+class UpdateStats:
+    """
+    Счетчики одного апдейта; доступны хэндлеру и событиям SQLAlchemy через contextvar.
+    """
+    handler: str = "unhandled"
+    state: str = ""
+    sql_statements: int = 0
+    db_time: float = 0.0
+    api_calls: int = 0
+
+
+current_update_stats: ContextVar[UpdateStats | None] = ContextVar("current_update_stats", default=None)
+
+UPDATE_LABELS = ("handler", "state")
+
+update_duration = Histogram("bot_update_duration_seconds", "Время обработки апдейта", UPDATE_LABELS)
+updates_total = Counter("bot_updates_total", "Обработанные апдейты", UPDATE_LABELS + ("status",))
+update_sql_statements = Histogram("bot_update_sql_statements", "SQL-запросов на апдейт", UPDATE_LABELS, COUNT_BUCKETS)
+update_db_time = Histogram("bot_update_db_seconds", "Время SQL-запросов на апдейт", UPDATE_LABELS)
+update_api_calls = Histogram("bot_update_api_calls", "Запросов к Telegram API на апдейт", UPDATE_LABELS, COUNT_BUCKETS)
+sql_statements_total = Counter("bot_sql_statements_total", "SQL-запросы (включая выполненные вне апдейтов)")
+api_calls_total = Counter("bot_telegram_api_calls_total", "Запросы к Telegram API", ("method",))
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """
+    Внешний middleware апдейтов (dp.update.outer_middleware): замеряет время обработки
+    и записывает собранные за апдейт счетчики с метками хэндлера и состояния FSM.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        stats = UpdateStats()
+        token = current_update_stats.set(stats)
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            result = await handler(event, data)
+            if result is UNHANDLED:
+                status = "unhandled"
+            return result
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            current_update_stats.reset(token)
+            labels = (stats.handler, stats.state)
+            update_duration.observe(time.perf_counter() - started, labels)
+            updates_total.inc(labels + (status,))
+            update_sql_statements.observe(stats.sql_statements, labels)
+            update_db_time.observe(stats.db_time, labels)
+            update_api_calls.observe(stats.api_calls, labels)
+
+
+class HandlerLabelMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware диспетчера: к этому моменту хэндлер уже выбран,
+    запоминаем его имя (модуль.функция) и состояние FSM для меток метрик.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        stats = current_update_stats.get()
+        handler_object = data.get("handler")
+        if stats is not None and handler_object is not None:
+            callback = handler_object.callback
+            stats.handler = f"{callback.__module__}.{getattr(callback, '__qualname__', repr(callback))}"
+            stats.state = data.get("raw_state") or ""
+        return await handler(event, data)
+
+
+class ApiCallMetricsMiddleware(BaseRequestMiddleware):
+    """
+    Middleware сессии бота: считает запросы к Telegram API (всего по методам и на апдейт).
+    """
+
+    async def __call__(self, make_request, bot: Bot, method):
+        api_calls_total.inc((type(method).__name__,))
+        stats = current_update_stats.get()
+        if stats is not None:
+            stats.api_calls += 1
+        return await make_request(bot, method)
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _start_sql_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _record_sql(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["metrics_started"].pop()
+    sql_statements_total.inc()
+    stats = current_update_stats.get()
+    if stats is not None:
+        stats.sql_statements += 1
+        stats.db_time += time.perf_counter() - started
+
+
+@event.listens_for(engine.sync_engine, "handle_error")
+def _drop_sql_timer(exception_context):
+    # Для упавшего запроса after_cursor_execute не вызывается
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("metrics_started"):
+        connection.info["metrics_started"].pop()
+
+
+def _collect_runtime_stats():
+    yield from gauge_lines("bot_db_pool", "Состояние пула соединений с БД", get_pool_stats())
+    yield from gauge_lines("bot_send_queue", "Очередь исходящих сообщений", get_send_queue_stats())
+
+
+register_collector(_collect_runtime_stats)
@@ -1,11 +1,17 @@
 # middlewares/role_middleware.py
 
 from aiogram import BaseMiddleware
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, InlineQuery
 from typing import Callable, Dict, Any
-from db.setup import get_db_session
-from db.models import Employee # <-- ИЗМЕНЕНО: Импортируем Employee вместо User
-from sqlalchemy.future import select
+from services.user_service import employee_cache
+
+async def _deny(event: Message | CallbackQuery | InlineQuery, text: str):
+    if isinstance(event, InlineQuery):
+        # На инлайн-запрос нельзя ответить текстом — отдаем пустой список результатов
+        await event.answer([], cache_time=0, is_personal=True)
+    else:
+        await event.answer(text)
+
 
 class RoleMiddleware(BaseMiddleware):
     def __init__(self, required_roles: list = None):
@@ -15,27 +21,26 @@ class RoleMiddleware(BaseMiddleware):
     async def __call__(
         self,
         handler: Callable[[Message, Dict[str, Any]], Any],
-        event: Message | CallbackQuery,
+        event: Message | CallbackQuery | InlineQuery,
         data: Dict[str, Any]
     ) -> Any:
-        user_id = event.from_user.id
-        async for session in get_db_session():
-            # <--- Вот здесь должно быть Employee.id_telegram
-            stmt = select(Employee).where(Employee.id_telegram == user_id)
-            result = await session.execute(stmt)
-            user = result.scalar_one_or_none()
+        # Middleware зарегистрирован и на диспетчере, и на каждом роутере.
+        # Сотрудник ищется один раз за апдейт, вложенные middleware берут его из data.
+        user = data.get('db_user')
+        if user is None:
+            user = await employee_cache.get(event.from_user.id)
 
             if not user:
                 # Если пользователя нет в БД, возможно, это новый клиент
                 # Можно создать его с ролью 'client' или отказать в доступе
-                await event.answer("Вы не зарегистрированы в системе. Пожалуйста, обратитесь к администратору.")
+                await _deny(event, "Вы не зарегистрированы в системе. Пожалуйста, обратитесь к администратору.")
                 return
 
             data['user_role'] = user.role # Передаем роль в хэндлер
             data['db_user'] = user # Передаем объект пользователя в хэндлер
 
-            if self.required_roles and user.role not in self.required_roles:
-                await event.answer("У вас нет прав для выполнения этой операции.")
-                return
+        if self.required_roles and user.role not in self.required_roles:
+            await _deny(event, "У вас нет прав для выполнения этой операции.")
+            return
 
-        return await handler(event, data)
\ No newline at end of file
+        return await handler(event, data)
@@ -0,0 +1,209 @@
+# middlewares/send_queue.py
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import EditMessageReplyMarkup, EditMessageText, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Методы, на которые распространяются лимиты Telegram на отправку в чат
+_THROTTLED_PREFIXES = ("Send", "Edit", "Delete", "Copy", "Forward")
+
+
+class TokenBucket:
+    """
+    Ведро токенов: rate токенов в секунду, не более capacity подряд.
+    Ожидающие получают токены в порядке очереди (asyncio.Lock справедлив).
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def block(self, seconds: float):
+        """
+        Приостанавливает выдачу токенов (после ответа 429 с retry_after).
+        """
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    def is_idle(self, now: float) -> bool:
+        return not self.lock.locked() and now - self.updated > 60 and now >= self.blocked_until
+
+
+@dataclass
+class _PendingEdit:
+    method: TelegramMethod
+    future: asyncio.Future
+
+
+class SendQueueMiddleware(BaseRequestMiddleware):
+    """
+    Очередь исходящих запросов к Telegram (middleware сессии бота, действует на все
+    message.answer, edit_text, bot.send_message и т.д.):
+    - общий лимит бота и лимит на чат (ведра токенов), отдельный лимит для групп;
+    - при 429 ждет retry_after и повторяет запрос;
+    - правки одного и того же сообщения, ожидающие отправки, объединяются в одну.
+    """
+
+    def __init__(self, global_rate: float = settings.SEND_GLOBAL_RATE,
+                 chat_rate: float = settings.SEND_CHAT_RATE,
+                 chat_burst: float = settings.SEND_CHAT_BURST,
+                 group_rate: float = settings.SEND_GROUP_RATE,
+                 max_retries: int = settings.SEND_MAX_RETRIES):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self._chat_buckets: dict[int | str, TokenBucket] = {}
+        self._pending_edits: dict[tuple, _PendingEdit] = {}
+
+        # Метрики
+        self.queue_depth = 0      # Запросов, ожидающих токена
+        self.max_queue_depth = 0
+        self.sent = 0
+        self.coalesced = 0        # Правок, объединенных с более поздней правкой того же сообщения
+        self.retries = 0          # Повторов после 429
+
+    def _chat_bucket(self, chat_id: int | str) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 10000:
+                now = time.monotonic()
+                for key in [key for key, b in self._chat_buckets.items() if b.is_idle(now)]:
+                    del self._chat_buckets[key]
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            if is_group:
+                bucket = TokenBucket(self.group_rate, self.chat_burst)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    @staticmethod
+    def _merge_edit(queued: TelegramMethod, new: TelegramMethod) -> TelegramMethod | None:
+        """
+        Возвращает запрос, заменяющий обе правки, или None, если их нельзя объединить.
+        """
+        if type(new) is type(queued):
+            return new
+        if isinstance(queued, EditMessageText) and isinstance(new, EditMessageReplyMarkup):
+            return queued.model_copy(update={"reply_markup": new.reply_markup})
+        return None
+
+    async def __call__(self, make_request: NextRequestMiddlewareType[TelegramType], bot: Bot,
+                       method: TelegramMethod[TelegramType]):
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None or not type(method).__name__.startswith(_THROTTLED_PREFIXES):
+            return await make_request(bot, method)
+
+        edit_key = None
+        pending = None
+        if isinstance(method, (EditMessageText, EditMessageReplyMarkup)) and method.message_id is not None:
+            edit_key = (bot.id, chat_id, method.message_id)
+            queued = self._pending_edits.get(edit_key)
+            if queued is not None:
+                merged = self._merge_edit(queued.method, method)
+                if merged is not None:
+                    # Более ранняя правка еще не отправлена — отправится только итоговая
+                    queued.method = merged
+                    self.coalesced += 1
+                    return await asyncio.shield(queued.future)
+            pending = _PendingEdit(method=method, future=asyncio.get_running_loop().create_future())
+            self._pending_edits[edit_key] = pending
+
+        try:
+            chat_bucket = self._chat_bucket(chat_id)
+            self.queue_depth += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+            try:
+                await chat_bucket.acquire()
+                await self.global_bucket.acquire()
+            finally:
+                self.queue_depth -= 1
+
+            if pending is not None:
+                # Дальнейшие правки этого сообщения пойдут следующим запросом
+                if self._pending_edits.get(edit_key) is pending:
+                    del self._pending_edits[edit_key]
+                method = pending.method
+
+            result = await self._send(make_request, bot, method, chat_bucket)
+        except BaseException as e:
+            if pending is not None:
+                if self._pending_edits.get(edit_key) is pending:
+                    del self._pending_edits[edit_key]
+                if not pending.future.done():
+                    if isinstance(e, Exception):
+                        pending.future.set_exception(e)
+                        pending.future.exception() # Ошибку получит и этот вызов, не логировать "never retrieved"
+                    else:
+                        pending.future.cancel()
+            raise
+
+        if pending is not None:
+            pending.future.set_result(result)
+        return result
+
+    async def _send(self, make_request, bot: Bot, method: TelegramMethod, chat_bucket: TokenBucket):
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = await make_request(bot, method)
+                self.sent += 1
+                return result
+            except TelegramRetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                logger.warning("Лимит Telegram (%s), повтор через %s с", type(method).__name__, e.retry_after)
+                chat_bucket.block(e.retry_after)
+                await asyncio.sleep(e.retry_after)
+                await chat_bucket.acquire()
+                await self.global_bucket.acquire()
+
+    def get_stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "pending_edits": len(self._pending_edits),
+            "chats": len(self._chat_buckets),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+        }
+
+
+# Общая очередь для всех ботов процесса (регистрируется в main.create_bot)
+send_queue = SendQueueMiddleware()
+
+
+def get_send_queue_stats() -> dict:
+    return send_queue.get_stats()
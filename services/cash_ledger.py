@@ -0,0 +1,145 @@
+# services/cash_ledger.py
+
+import asyncio
+import datetime
+import logging
+from dataclasses import dataclass
+from decimal import Decimal
+
+from sqlalchemy import case, func, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from config import settings
+from db.models import CashBalanceSnapshot, CashFlow
+from db.setup import get_db_session
+
+# Касса — журнал только на добавление: каждая операция хранит остаток после себя
+# (current_balance, заполняет триггер cash_flow_balance), поэтому текущий остаток —
+# последняя строка, а не сумма по всей таблице.
+CASH_IN = 'income'
+CASH_OUT = 'expense'
+
+# Ключ транзакционной advisory-блокировки кассы: операции записываются строго по одной
+CASH_LEDGER_LOCK_KEY = 7_201_900_001
+
+_snapshot_task: asyncio.Task | None = None
+
+
+@dataclass
+class CashBalance:
+    balance: Decimal
+    transaction_id: int | None
+    transaction_date: datetime.datetime | None
+
+
+def _signed_amount():
+    return case((CashFlow.transaction_type == CASH_OUT, -CashFlow.amount), else_=CashFlow.amount)
+
+
+async def record_cash_transaction(session: AsyncSession, transaction_type: str, amount: Decimal,
+                                  description: str | None = None, source_type: str | None = None,
+                                  source_id: int | None = None,
+                                  transaction_date: datetime.datetime | None = None) -> CashBalance:
+    """
+    Записывает операцию по кассе (CASH_IN или CASH_OUT, amount > 0) и возвращает остаток после нее.
+    Остаток считает триггер cash_flow_balance (миграция r0011) под advisory-блокировкой
+    CASH_LEDGER_LOCK_KEY — так же заполняется любая строка cash_flow, вставленная в обход этой функции.
+    Коммит остается за вызывающим кодом (блокировка освобождается вместе с транзакцией).
+    """
+    if transaction_type not in (CASH_IN, CASH_OUT):
+        raise ValueError(f"Неизвестный тип операции по кассе: {transaction_type}")
+    if amount <= 0:
+        raise ValueError("Сумма операции по кассе должна быть положительной")
+
+    transaction_date = transaction_date or datetime.datetime.now()
+    row = (await session.execute(
+        insert(CashFlow)
+        .values(
+            transaction_date=transaction_date,
+            transaction_type=transaction_type,
+            amount=amount,
+            description=description,
+            source_type=source_type,
+            source_id=source_id,
+        )
+        .returning(CashFlow.transaction_id, CashFlow.current_balance)
+    )).one()
+    return CashBalance(balance=row.current_balance, transaction_id=row.transaction_id,
+                       transaction_date=transaction_date)
+
+
+async def get_cash_balance(session: AsyncSession) -> CashBalance:
+    """
+    Текущий остаток кассы: одна строка по первичному ключу (последняя операция).
+    """
+    row = (await session.execute(
+        select(CashFlow.transaction_id, CashFlow.transaction_date, CashFlow.current_balance)
+        .order_by(CashFlow.transaction_id.desc())
+        .limit(1)
+    )).first()
+    if row is None:
+        return CashBalance(balance=Decimal('0.00'), transaction_id=None, transaction_date=None)
+    return CashBalance(balance=row.current_balance, transaction_id=row.transaction_id,
+                       transaction_date=row.transaction_date)
+
+
+async def take_balance_snapshot(session: AsyncSession) -> CashBalanceSnapshot | None:
+    """
+    Сохраняет снимок остатка на последнюю операцию и сверяет нарастающий остаток:
+    предыдущий снимок плюс сумма операций после него должны совпасть с current_balance.
+    Возвращает None, если с прошлого снимка операций не было.
+    """
+    await session.execute(select(func.pg_advisory_xact_lock(CASH_LEDGER_LOCK_KEY)))
+    current = await get_cash_balance(session)
+    last = (await session.execute(
+        select(CashBalanceSnapshot).order_by(CashBalanceSnapshot.transaction_id.desc()).limit(1)
+    )).scalar_one_or_none()
+    if current.transaction_id is None or (last is not None and last.transaction_id == current.transaction_id):
+        return None
+
+    since_id = last.transaction_id if last is not None else 0
+    delta = (await session.execute(
+        select(func.coalesce(func.sum(_signed_amount()), 0))
+        .where(CashFlow.transaction_id > since_id, CashFlow.transaction_id <= current.transaction_id)
+    )).scalar_one()
+    expected = (last.balance if last is not None else Decimal('0.00')) + delta
+    if expected != current.balance:
+        logging.error(
+            "Касса: расхождение остатка на операции %s: записан %s, по журналу %s",
+            current.transaction_id, current.balance, expected,
+        )
+
+    snapshot = CashBalanceSnapshot(transaction_id=current.transaction_id, balance=current.balance)
+    session.add(snapshot)
+    await session.commit()
+    return snapshot
+
+
+async def _snapshot_loop():
+    while True:
+        await asyncio.sleep(settings.CASH_SNAPSHOT_INTERVAL)
+        try:
+            async for session in get_db_session():
+                snapshot = await take_balance_snapshot(session)
+                if snapshot is not None:
+                    logging.info("Касса: снимок остатка %s на операции %s", snapshot.balance, snapshot.transaction_id)
+        except Exception as e:
+            logging.error("Касса: ошибка при сохранении снимка остатка: %s", e, exc_info=True)
+
+
+def start_snapshot_job():
+    """
+    Запускает периодическое сохранение снимков остатка (вызывается при старте бота).
+    """
+    global _snapshot_task
+    if settings.CASH_SNAPSHOT_INTERVAL > 0 and _snapshot_task is None:
+        _snapshot_task = asyncio.create_task(_snapshot_loop())
+
+
+async def stop_snapshot_job():
+    global _snapshot_task
+    if _snapshot_task is not None:
+        _snapshot_task.cancel()
+        await asyncio.gather(_snapshot_task, return_exceptions=True)
+        _snapshot_task = None
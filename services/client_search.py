@@ -0,0 +1,63 @@
+# services/client_search.py
+
+from sqlalchemy import event, func, or_
+from sqlalchemy.future import select
+
+from config import settings
+from db.setup import get_db_session
+from db.models import Client
+from utils.trigram_index import RefreshingTrigramIndex
+
+
+async def _load_clients():
+    async for session in get_db_session():
+        result = await session.execute(select(Client.client_id, Client.name))
+        return [(client_id, name, None) for client_id, name in result.all()]
+
+
+# Индекс имен клиентов в памяти процесса (используется, если CLIENT_SEARCH_IN_MEMORY включен).
+# Раз в CLIENT_SEARCH_REFRESH_INTERVAL перезагружается в фоне — подтягивает клиентов,
+# добавленных другими процессами бота.
+client_index = RefreshingTrigramIndex("клиентов", _load_clients, settings.CLIENT_SEARCH_REFRESH_INTERVAL)
+
+
+async def warm_up_client_index():
+    """
+    Загружает имена всех клиентов в индекс в памяти (при старте бота).
+    """
+    await client_index.reload()
+
+
+async def search_clients(query: str, limit: int = 15) -> list[tuple[int, str]]:
+    """
+    Ищет клиентов по части имени. Возвращает пары (client_id, name):
+    сначала совпадения с начала имени, затем по подстроке, затем по сходству триграмм.
+    """
+    if settings.CLIENT_SEARCH_IN_MEMORY:
+        return [(client_id, name) for client_id, name, _ in await client_index.search(query, limit)]
+
+    # GIN-индекс idx_clients_name_trgm обслуживает и ILIKE '%...%', и оператор сходства %
+    similarity = func.similarity(Client.name, query)
+    stmt = select(Client.client_id, Client.name).where(
+        or_(Client.name.icontains(query, autoescape=True), Client.name.op("%")(query))
+    ).order_by(
+        Client.name.istartswith(query, autoescape=True).desc(),
+        similarity.desc(),
+        Client.name,
+    ).limit(limit)
+
+    async for session in get_db_session():
+        result = await session.execute(stmt)
+        return [(client_id, name) for client_id, name in result.all()]
+
+
+# Изменения клиентов через ORM сразу отражаются в индексе в памяти
+@event.listens_for(Client, "after_insert")
+@event.listens_for(Client, "after_update")
+def _index_client_on_change(mapper, connection, target: Client):
+    client_index.add(target.client_id, target.name)
+
+
+@event.listens_for(Client, "after_delete")
+def _unindex_client_on_delete(mapper, connection, target: Client):
+    client_index.remove(target.client_id)
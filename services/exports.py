@@ -0,0 +1,131 @@
+# services/exports.py
+
+import asyncio
+import csv
+import datetime
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Callable
+
+from sqlalchemy import Select
+from sqlalchemy.future import select
+
+from config import settings
+from db.models import CashFlow, Client, InventoryMovement, Order, OrderLine, Product
+from db.setup import get_db_session
+
+# Выгрузки в CSV за период. Строки читаются серверным курсором порциями по EXPORT_CHUNK_SIZE
+# (session.stream + yield_per) и сразу дописываются во временный файл, поэтому память
+# не зависит от объема выгрузки. Файл удаляет вызывающий код после отправки.
+
+# Текст, который Excel примет за формулу (имена клиентов, описания операций), экранируется апострофом
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def csv_cell(value):
+    """
+    Значение ячейки CSV: текст, начинающийся как формула, экранируется апострофом.
+    """
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _write_rows(writer, rows):
+    writer.writerows([csv_cell(value) for value in row] for row in rows)
+
+
+@dataclass
+class ExportKind:
+    title: str
+    filename: str
+    header: list[str]
+    build_query: Callable[[datetime.datetime, datetime.datetime], Select]
+
+
+def _orders_query(start: datetime.datetime, end: datetime.datetime) -> Select:
+    return (
+        select(Order.order_id, Order.invoice_number, Order.order_date, Order.delivery_date, Order.status,
+               Order.payment_status, Client.name, OrderLine.product_id, Product.name,
+               OrderLine.quantity, OrderLine.unit_price, OrderLine.line_total)
+        .join(OrderLine, OrderLine.order_id == Order.order_id)
+        .join(Product, Product.product_id == OrderLine.product_id)
+        .outerjoin(Client, Client.client_id == Order.client_id)
+        .where(Order.order_date >= start, Order.order_date < end)
+        .order_by(Order.order_date, Order.order_id, OrderLine.order_line_id)
+    )
+
+
+def _movements_query(start: datetime.datetime, end: datetime.datetime) -> Select:
+    return (
+        select(InventoryMovement.movement_id, InventoryMovement.movement_date, InventoryMovement.movement_type,
+               InventoryMovement.product_id, Product.name, InventoryMovement.quantity_change,
+               InventoryMovement.unit_cost, InventoryMovement.source_document_type,
+               InventoryMovement.source_document_id, InventoryMovement.description)
+        .outerjoin(Product, Product.product_id == InventoryMovement.product_id)
+        .where(InventoryMovement.movement_date >= start, InventoryMovement.movement_date < end)
+        .order_by(InventoryMovement.movement_date, InventoryMovement.movement_id)
+    )
+
+
+def _cash_flow_query(start: datetime.datetime, end: datetime.datetime) -> Select:
+    return (
+        select(CashFlow.transaction_id, CashFlow.transaction_date, CashFlow.transaction_type, CashFlow.amount,
+               CashFlow.current_balance, CashFlow.source_type, CashFlow.source_id, CashFlow.description)
+        .where(CashFlow.transaction_date >= start, CashFlow.transaction_date < end)
+        .order_by(CashFlow.transaction_id)
+    )
+
+
+# Команда выгрузки -> описание
+EXPORT_KINDS = {
+    "export_orders": ExportKind(
+        title="Заказы с позициями",
+        filename="orders",
+        header=["order_id", "invoice_number", "order_date", "delivery_date", "status", "payment_status",
+                "client", "product_id", "product", "quantity", "unit_price", "line_total"],
+        build_query=_orders_query,
+    ),
+    "export_movements": ExportKind(
+        title="Движения товаров",
+        filename="inventory_movements",
+        header=["movement_id", "movement_date", "movement_type", "product_id", "product", "quantity_change",
+                "unit_cost", "source_document_type", "source_document_id", "description"],
+        build_query=_movements_query,
+    ),
+    "export_cash": ExportKind(
+        title="Движение денежных средств",
+        filename="cash_flow",
+        header=["transaction_id", "transaction_date", "transaction_type", "amount", "current_balance",
+                "source_type", "source_id", "description"],
+        build_query=_cash_flow_query,
+    ),
+}
+
+
+async def export_to_csv(kind: ExportKind, date_from: datetime.date, date_to: datetime.date) -> tuple[str, int]:
+    """
+    Выгружает строки за период [date_from, date_to] во временный CSV-файл (UTF-8 с BOM, разделитель «;» —
+    открывается в Excel). Возвращает путь к файлу и число строк.
+    """
+    start = datetime.datetime.combine(date_from, datetime.time.min)
+    end = datetime.datetime.combine(date_to + datetime.timedelta(days=1), datetime.time.min)
+    stmt = kind.build_query(start, end).execution_options(yield_per=settings.EXPORT_CHUNK_SIZE)
+
+    fd, path = tempfile.mkstemp(prefix=f"{kind.filename}_", suffix=".csv")
+    rows_written = 0
+    try:
+        with open(fd, 'w', encoding='utf-8-sig', newline='') as file:
+            writer = csv.writer(file, delimiter=';')
+            writer.writerow(kind.header)
+            async for session in get_db_session():
+                result = await session.stream(stmt)
+                async for rows in result.partitions():
+                    # Запись порции на диск — в потоке, чтобы не блокировать цикл событий
+                    await asyncio.to_thread(_write_rows, writer, rows)
+                    rows_written += len(rows)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, rows_written
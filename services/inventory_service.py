@@ -0,0 +1,102 @@
+# services/inventory_service.py
+
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from sqlalchemy import DateTime, String, insert, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from db.models import IncomingDelivery, InventoryMovement, Stock
+
+
+def to_decimal(value) -> Decimal:
+    """
+    Переводит количество/цену из состояния FSM (float, int, str) в Decimal без ошибок двоичного представления.
+    """
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+async def post_receipt(session: AsyncSession, supplier_id: int, supplier_invoice_id: int | None,
+                       delivery_date: datetime.datetime, items: list[dict], description: str) -> list[int]:
+    """
+    Проводит поступление товаров за постоянное число запросов, независимо от количества позиций:
+    1. многострочный INSERT в incoming_deliveries с RETURNING, в том же запросе (CTE) —
+       INSERT движений 'incoming' в inventory_movements;
+    2. один INSERT ... ON CONFLICT DO UPDATE в stock с количеством, просуммированным по товару.
+    items — список словарей с ключами product_id, quantity, unit_cost.
+    Возвращает delivery_id созданных поставок. Коммит остается за вызывающим кодом.
+    """
+    if not items:
+        return []
+
+    rows = []
+    stock_delta: dict[int, Decimal] = defaultdict(Decimal)
+    for item in items:
+        quantity = to_decimal(item['quantity'])
+        unit_cost = to_decimal(item['unit_cost'])
+        rows.append({
+            'supplier_id': supplier_id,
+            'delivery_date': delivery_date,
+            'product_id': item['product_id'],
+            'quantity': quantity,
+            'unit_cost': unit_cost,
+            'total_cost': (quantity * unit_cost).quantize(Decimal('0.01')),
+            'supplier_invoice_id': supplier_invoice_id,
+        })
+        stock_delta[item['product_id']] += quantity
+
+    # 1. Поставки и движения — один запрос
+    deliveries = insert(IncomingDelivery).values(rows).returning(
+        IncomingDelivery.delivery_id,
+        IncomingDelivery.product_id,
+        IncomingDelivery.quantity,
+        IncomingDelivery.unit_cost,
+    ).cte('new_deliveries')
+
+    movements = insert(InventoryMovement).from_select(
+        ['product_id', 'movement_type', 'quantity_change', 'movement_date',
+         'source_document_type', 'source_document_id', 'description', 'unit_cost'],
+        select(
+            deliveries.c.product_id,
+            literal('incoming', String),
+            deliveries.c.quantity,
+            literal(datetime.datetime.now(), DateTime),
+            literal('delivery', String),
+            deliveries.c.delivery_id,
+            literal(description, String),
+            deliveries.c.unit_cost,
+        )
+    ).returning(InventoryMovement.source_document_id)
+
+    result = await session.execute(movements)
+    delivery_ids = sorted(result.scalars().all())
+
+    # 2. Остатки — один upsert. Строки упорядочены по product_id, чтобы параллельные
+    # проводки блокировали записи stock в одном порядке и не попадали во взаимоблокировку.
+    await upsert_stock(session, stock_delta)
+
+    return delivery_ids
+
+
+async def upsert_stock(session: AsyncSession, stock_delta: dict[int, Decimal]):
+    """
+    Прибавляет к остаткам stock изменения количества по товарам одним запросом
+    (отсутствующие записи создаются).
+    """
+    if not stock_delta:
+        return
+
+    stmt = pg_insert(Stock).values([
+        {'product_id': product_id, 'quantity': delta}
+        for product_id, delta in sorted(stock_delta.items())
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Stock.product_id],
+        set_={'quantity': Stock.quantity + stmt.excluded.quantity},
+    )
+    await session.execute(stmt)
@@ -2,12 +2,15 @@
 
 import datetime
 import logging
+import time
+from collections import OrderedDict
 from decimal import Decimal
 
 from aiogram import Router, F, Bot
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
+from config import settings
 from db.setup import get_db_session
 from db.models import Order, Client, Employee, Address, OrderLine, Product
 from sqlalchemy.future import select
@@ -16,6 +19,119 @@ from utils.text_formatter import escape_markdown_v2, bold, italic
 from states.order_states import OrderEditingStates
 
 
+# Кэш готового текста сводки для меню редактирования: order_id -> (состояние заказа, текст, истекает в).
+# Состояние — поля строки orders, которые меняют сводку (суммы, оплата, статус, дата доставки).
+# Показ из кэша проверяет их одним чтением по первичному ключу, поэтому оплаты, зачисленные
+# триггером, и правки из других процессов бота видны сразу. Правки позиций с той же суммой
+# заказа в этом процессе сбрасывают кэш через invalidate_order_summary, остальное ограничивает TTL.
+_summary_cache: OrderedDict = OrderedDict()
+# Счетчик сбросов: сводка, прочитанная до сброса, в кэш уже не попадает
+_invalidations = 0
+
+
+def _summary_state_columns():
+    return (Order.total_amount, Order.amount_paid, Order.payment_status, Order.status,
+            Order.delivery_date, Order.invoice_number)
+
+
+def _summary_state(order: Order) -> tuple:
+    return tuple(getattr(order, column.key) for column in _summary_state_columns())
+
+
+def invalidate_order_summary(order_id: int):
+    """
+    Отмечает, что заказ изменился: следующий показ меню редактирования перечитает его из БД.
+    """
+    global _invalidations
+    _invalidations += 1
+    _summary_cache.pop(order_id, None)
+
+
+def _render_order_summary(order: Order) -> str:
+    client_name = order.client.name if order.client else 'Неизвестно'
+    employee_name = order.employee.name if order.employee else 'Неизвестно'
+    address_text = order.address.address_text if order.address else 'Не указан'
+
+    summary_parts = [
+        f"Информация о заказе №{order.order_id} ({order.status})\n\n",
+
+        f"Клиент: {client_name}\n",
+        f"Сотрудник: {employee_name}\n",
+        f"Адрес: {address_text}\n",
+        f"Дата создания: {order.order_date.strftime('%d.%m.%Y %H:%M')}\n",
+        f"Дата доставки: {order.delivery_date.strftime('%d.%m.%Y') if order.delivery_date else 'Не указана'}\n",
+        f"Сумma: {round(order.total_amount, 2)} грн\n\n",
+    ]
+
+    if order.invoice_number:
+        summary_parts.append(f"Номер накладной: {order.invoice_number}\n")
+
+    summary_parts.append("\n--- Товары в заказе ---\n")
+
+    if order.order_lines:
+        sorted_order_lines = sorted(order.order_lines, key=lambda x: x.order_line_id)
+
+        for idx, line in enumerate(sorted_order_lines):
+            product_name = line.product.name if line.product else "Неизвестный товар"
+            quantity = str(line.quantity)
+            unit_price = str(round(line.unit_price, 2))
+            line_total = str(round(line.line_total, 2))
+
+            summary_parts.append(
+                f"{idx+1}. {product_name}\n"
+                f"   Кол-во: {quantity} шт. | Цена: {unit_price} грн | Сумма: {line_total} грн\n"
+            )
+    else:
+        summary_parts.append("В этом заказе нет товаров.\n")
+
+    summary_parts.append("\n--- Итого ---\n")
+    summary_parts.append(f"Общая сумма заказа: {round(order.total_amount, 2)} грн\n")
+    summary_parts.append(f"Оплачено: {round(order.amount_paid, 2)} грн\n")
+    remaining_amount = order.total_amount - order.amount_paid
+    summary_parts.append(f"Остаток к оплате: {round(remaining_amount, 2)} грн\n")
+
+    return "".join(summary_parts)
+
+
+async def get_order_summary(order_id: int) -> str | None:
+    """
+    Возвращает текст сводки заказа (из кэша, если состояние заказа в БД не изменилось, или из БД).
+    None, если заказ не найден.
+    """
+    invalidations = _invalidations
+    entry = _summary_cache.get(order_id)
+    async for session in get_db_session():
+        if entry is not None and entry[2] > time.monotonic():
+            state = (await session.execute(
+                select(*_summary_state_columns()).where(Order.order_id == order_id)
+            )).first()
+            if state is not None and tuple(state) == entry[0]:
+                _summary_cache.move_to_end(order_id)
+                return entry[1]
+
+        order_stmt = select(Order).where(Order.order_id == order_id).options(
+            selectinload(Order.client),
+            selectinload(Order.employee),
+            selectinload(Order.address),
+            selectinload(Order.order_lines).selectinload(OrderLine.product)
+        )
+        order_result = await session.execute(order_stmt)
+        order = order_result.scalar_one_or_none()
+        if not order:
+            _summary_cache.pop(order_id, None)
+            return None
+        state = _summary_state(order)
+        summary_text = _render_order_summary(order)
+
+    # Если заказ изменили в этом процессе, пока он читался, сводка устарела еще до сохранения
+    if _invalidations == invalidations:
+        _summary_cache[order_id] = (state, summary_text, time.monotonic() + settings.ORDER_SUMMARY_CACHE_TTL)
+        _summary_cache.move_to_end(order_id)
+        while len(_summary_cache) > settings.ORDER_SUMMARY_CACHE_SIZE:
+            _summary_cache.popitem(last=False)
+    return summary_text
+
+
 async def process_my_order_selection(callback: CallbackQuery, state: FSMContext, bot: Bot):
     """
     Обрабатывает выбор заказа для редактирования.
@@ -26,100 +142,43 @@ async def process_my_order_selection(callback: CallbackQuery, state: FSMContext,
     order_id = int(callback.data.split("_")[-1])
     await state.update_data(editing_order_id=order_id)
 
-    async for session in get_db_session():
-        try:
-            order_stmt = select(Order).where(Order.order_id == order_id).options(
-                selectinload(Order.client),
-                selectinload(Order.employee),
-                selectinload(Order.address),
-                selectinload(Order.order_lines).selectinload(OrderLine.product)
-            )
-            order_result = await session.execute(order_stmt)
-            order = order_result.scalar_one_or_none()
-
-            if not order:
-                await bot.send_message(callback.message.chat.id, bold("❌ Заказ не найден."))
-                await state.clear()
-                return
-
-            client_name = order.client.name if order.client else 'Неизвестно'
-            employee_name = order.employee.name if order.employee else 'Неизвестно'
-            address_text = order.address.address_text if order.address else 'Не указан'
-
-
-            summary_parts = [
-                f"Информация о заказе №{order.order_id} ({order.status})\n\n",
-
-                f"Клиент: {client_name}\n",
-                f"Сотрудник: {employee_name}\n",
-                f"Адрес: {address_text}\n",
-                f"Дата создания: {order.order_date.strftime('%d.%m.%Y %H:%M')}\n",
-                f"Дата доставки: {order.delivery_date.strftime('%d.%m.%Y') if order.delivery_date else 'Не указана'}\n",
-                f"Сумma: {round(order.total_amount, 2)} грн\n\n",
-            ]
-
-            if order.invoice_number:
-                summary_parts.append(f"Номер накладной: {order.invoice_number}\n")
-
-            summary_parts.append("\n--- Товары в заказе ---\n")
-
-            if order.order_lines:
-                sorted_order_lines = sorted(order.order_lines, key=lambda x: x.order_line_id)
-
-                for idx, line in enumerate(sorted_order_lines):
-                    product_name = line.product.name if line.product else "Неизвестный товар"
-                    quantity = str(line.quantity)
-                    unit_price = str(round(line.unit_price, 2))
-                    line_total = str(round(line.line_total, 2))
-
-                    summary_parts.append(
-                        f"{idx+1}. {product_name}\n"
-                        f"   Кол-во: {quantity} шт. | Цена: {unit_price} грн | Сумма: {line_total} грн\n"
-                    )
-            else:
-                summary_parts.append("В этом заказе нет товаров.\n")
-
-            summary_parts.append("\n--- Итого ---\n")
-            summary_parts.append(f"Общая сумма заказа: {round(order.total_amount, 2)} грн\n")
-            summary_parts.append(f"Оплачено: {round(order.amount_paid, 2)} грн\n")
-            remaining_amount = order.total_amount - order.amount_paid
-            summary_parts.append(f"Остаток к оплате: {round(remaining_amount, 2)} грн\n")
-
-
-            full_summary_text = "".join(summary_parts)
-
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="✏️ Изменить количество товара", callback_data=f"change_quantity_start_{order_id}")],
-                [InlineKeyboardButton(text="🗑️ Удалить товар из заказа", callback_data=f"delete_product_start_{order_id}")],
-                [InlineKeyboardButton(text="➕ Добавить товар в заказ", callback_data=f"add_product_start_{order_id}")],
-                [InlineKeyboardButton(text="📅 Изменить дату доставки", callback_data=f"change_date_start_{order_id}")],
-                [InlineKeyboardButton(text="🗑️ Удалить заказ полностью", callback_data=f"delete_order_start_{order_id}")],
-                [InlineKeyboardButton(text="✅ Готово (вернуться в меню)", callback_data="done_editing_order")],
-                [InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_order_editing")]
-            ])
-
-            await bot.send_message( # <--- Отправляем НОВОЕ сообщение
-                chat_id=callback.message.chat.id,
-                text=full_summary_text,
-                reply_markup=keyboard
-            )
-            # Если нужно удалить старое сообщение, используйте delete_message
-            if callback.message: # Проверяем, существует ли сообщение для удаления
-                try:
-                    await bot.delete_message(chat_id=callback.message.chat.id, message_id=callback.message.message_id)
-                except Exception as del_e:
-                    logging.warning(f"Не удалось удалить старое сообщение: {del_e}")
-
+    try:
+        full_summary_text = await get_order_summary(order_id)
 
-            await state.set_state(OrderEditingStates.my_order_menu)
-
-        except Exception as e:
-            await session.rollback()
-            await bot.send_message(callback.message.chat.id, f"❌ Произошла ошибка при загрузке заказа: {str(e)}\n")
-            logging.error(f"Ошибка при загрузке заказа {order_id}: {e}", exc_info=True)
+        if full_summary_text is None:
+            await bot.send_message(callback.message.chat.id, bold("❌ Заказ не найден."))
             await state.clear()
-        # finally: # <--- УДАЛИТЬ: callback.answer() должен быть вызван вызывающим хэндлером
-        #     await bot(callback.answer())
+            return
+
+        keyboard = InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text="✏️ Изменить количество товара", callback_data=f"change_quantity_start_{order_id}")],
+            [InlineKeyboardButton(text="🗑️ Удалить товар из заказа", callback_data=f"delete_product_start_{order_id}")],
+            [InlineKeyboardButton(text="➕ Добавить товар в заказ", callback_data=f"add_product_start_{order_id}")],
+            [InlineKeyboardButton(text="📅 Изменить дату доставки", callback_data=f"change_date_start_{order_id}")],
+            [InlineKeyboardButton(text="🗑️ Удалить заказ полностью", callback_data=f"delete_order_start_{order_id}")],
+            [InlineKeyboardButton(text="✅ Готово (вернуться в меню)", callback_data="done_editing_order")],
+            [InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_order_editing")]
+        ])
+
+        await bot.send_message( # <--- Отправляем НОВОЕ сообщение
+            chat_id=callback.message.chat.id,
+            text=full_summary_text,
+            reply_markup=keyboard
+        )
+        # Если нужно удалить старое сообщение, используйте delete_message
+        if callback.message: # Проверяем, существует ли сообщение для удаления
+            try:
+                await bot.delete_message(chat_id=callback.message.chat.id, message_id=callback.message.message_id)
+            except Exception as del_e:
+                logging.warning("Не удалось удалить старое сообщение: %s", del_e)
+
+
+        await state.set_state(OrderEditingStates.my_order_menu)
+
+    except Exception as e:
+        await bot.send_message(callback.message.chat.id, f"❌ Произошла ошибка при загрузке заказа: {str(e)}\n")
+        logging.error("Ошибка при загрузке заказа %s: %s", order_id, e, exc_info=True)
+        await state.clear()
 
 
 async def return_to_order_menu(callback: CallbackQuery, state: FSMContext, bot: Bot):
@@ -0,0 +1,90 @@
+# services/order_service.py
+
+from decimal import Decimal
+
+from sqlalchemy import Integer, Numeric, column, func, insert, true, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from db.models import Order, OrderLine
+
+
+def _lines_values(lines: list[dict]):
+    """
+    Позиции заказа в виде VALUES (product_id, quantity, unit_price) для вставки одним запросом.
+    """
+    return values(
+        column('line_no', Integer),
+        column('product_id', Integer),
+        column('quantity', Numeric(10, 2)),
+        column('unit_price', Numeric(10, 2)),
+        name='new_lines',
+    ).data([
+        (i, item['product_id'], Decimal(str(item['quantity'])), Decimal(str(item['unit_price'])))
+        for i, item in enumerate(lines)
+    ])
+
+
+async def create_order_with_lines(session: AsyncSession, order_values: dict, lines: list[dict]) -> tuple[int, list[int]]:
+    """
+    Создает заказ и все его позиции одним запросом (INSERT заказа в CTE + многострочный INSERT позиций).
+    lines — список словарей с ключами product_id, quantity, unit_price.
+    Возвращает (order_id, [order_line_id, ...]) в порядке lines. Коммит остается за вызывающим кодом.
+    """
+    if not lines:
+        raise ValueError("Заказ должен содержать хотя бы одну позицию")
+
+    new_order = insert(Order).values(**order_values).returning(Order.order_id).cte('new_order')
+    new_lines = _lines_values(lines)
+
+    stmt = insert(OrderLine).from_select(
+        ['order_id', 'product_id', 'quantity', 'unit_price'],
+        select(new_order.c.order_id, new_lines.c.product_id, new_lines.c.quantity, new_lines.c.unit_price)
+        .select_from(new_order)
+        .join(new_lines, true()) # Одна строка заказа × позиции — соединение без условия намеренно
+        .order_by(new_lines.c.line_no)
+    ).returning(OrderLine.order_line_id, OrderLine.order_id)
+
+    rows = (await session.execute(stmt)).all()
+    # Идентификаторы из последовательности выдаются в порядке вставки строк
+    line_ids = sorted(row.order_line_id for row in rows)
+    return rows[0].order_id, line_ids
+
+
+async def add_order_lines(session: AsyncSession, order_id: int, lines: list[dict]) -> tuple[list[int], Decimal] | None:
+    """
+    Добавляет позиции в существующий заказ и пересчитывает его сумму одним запросом.
+    Возвращает ([order_line_id, ...], новая сумма заказа) или None, если заказ не найден.
+    Коммит остается за вызывающим кодом.
+    """
+    if not lines:
+        raise ValueError("Нет позиций для добавления")
+
+    new_lines = _lines_values(lines)
+
+    # Позиции вставляются только если заказ существует (соединение с orders)
+    inserted = insert(OrderLine).from_select(
+        ['order_id', 'product_id', 'quantity', 'unit_price'],
+        select(Order.order_id, new_lines.c.product_id, new_lines.c.quantity, new_lines.c.unit_price)
+        .select_from(Order)
+        .join(new_lines, true())
+        .where(Order.order_id == order_id)
+        .order_by(new_lines.c.line_no)
+    ).returning(OrderLine.order_line_id, OrderLine.line_total).cte('inserted_lines')
+
+    added_total = select(func.coalesce(func.sum(inserted.c.line_total), 0)).scalar_subquery()
+    line_ids = select(func.array_agg(inserted.c.order_line_id)).scalar_subquery()
+
+    stmt = (
+        update(Order)
+        .add_cte(inserted)
+        .where(Order.order_id == order_id)
+        .values(total_amount=Order.total_amount + added_total)
+        .returning(Order.total_amount, line_ids)
+    )
+
+    row = (await session.execute(stmt)).one_or_none()
+    if row is None:
+        return None
+    new_total, ids = row
+    return sorted(ids or []), new_total
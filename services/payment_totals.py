@@ -0,0 +1,136 @@
+# services/payment_totals.py
+
+import asyncio
+import datetime
+import logging
+from dataclasses import dataclass
+from decimal import Decimal
+
+from sqlalchemy import Date, cast, func, literal, update, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from config import settings
+from db.models import ClientPayment, PaymentDailyTotal
+from db.setup import get_db_session
+
+# Оплаты клиентов сворачиваются в дневные итоги payment_daily_totals (день × способ × тип оплаты).
+# Еще не свернутые оплаты («хвост», rolled_up = false) отчеты досчитывают по частичному индексу,
+# поэтому итоги точны и между запусками свертки. Изменение или удаление уже свернутой оплаты
+# поправляет итоги триггером client_payments_totals (db/migrations/r0010_payment_totals_corrections.py).
+
+_rollup_task: asyncio.Task | None = None
+
+
+@dataclass
+class PaymentTotal:
+    day: datetime.date | None # None, если итоги не разбиты по дням
+    payment_method: str
+    payment_type: str
+    total: Decimal
+    payments_count: int
+
+
+async def roll_up_payments(session: AsyncSession) -> int:
+    """
+    Переносит несвернутые оплаты в дневные итоги одним запросом:
+    UPDATE client_payments SET rolled_up (CTE с RETURNING) + INSERT ... ON CONFLICT в итоги.
+    Параллельные вызовы безопасны: строку, уже отмеченную другим вызовом, UPDATE пропускает.
+    Возвращает число обновленных строк итогов. Вызывается после записи оплат и периодически.
+    """
+    moved = (
+        update(ClientPayment)
+        .where(~ClientPayment.rolled_up)
+        .values(rolled_up=True)
+        .returning(ClientPayment.payment_date, ClientPayment.payment_method,
+                   ClientPayment.payment_type, ClientPayment.amount)
+        .cte("moved")
+    )
+    day = cast(moved.c.payment_date, Date)
+    method = func.coalesce(moved.c.payment_method, '')
+    payment_type = func.coalesce(moved.c.payment_type, '')
+    totals = select(day, method, payment_type, func.sum(moved.c.amount), func.count()).group_by(day, method, payment_type)
+
+    stmt = pg_insert(PaymentDailyTotal).from_select(
+        ['day', 'payment_method', 'payment_type', 'total', 'payments_count'], totals
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PaymentDailyTotal.day, PaymentDailyTotal.payment_method, PaymentDailyTotal.payment_type],
+        set_={
+            'total': PaymentDailyTotal.total + stmt.excluded.total,
+            'payments_count': PaymentDailyTotal.payments_count + stmt.excluded.payments_count,
+        },
+    ).add_cte(moved)
+    result = await session.execute(stmt)
+    await session.commit()
+    return result.rowcount
+
+
+async def get_payment_totals(session: AsyncSession, date_from: datetime.date, date_to: datetime.date,
+                             by_day: bool = False) -> list[PaymentTotal]:
+    """
+    Итоги оплат за период [date_from, date_to] по способу и типу оплаты (и по дням, если by_day).
+    Один запрос: строки дневных итогов за период + несвернутый хвост client_payments.
+    """
+    rolled = (
+        select(PaymentDailyTotal.day, PaymentDailyTotal.payment_method, PaymentDailyTotal.payment_type,
+               PaymentDailyTotal.total, PaymentDailyTotal.payments_count)
+        .where(PaymentDailyTotal.day.between(date_from, date_to))
+    )
+    tail_day = cast(ClientPayment.payment_date, Date)
+    tail_method = func.coalesce(ClientPayment.payment_method, '')
+    tail_type = func.coalesce(ClientPayment.payment_type, '')
+    tail = (
+        select(tail_day, tail_method, tail_type, func.sum(ClientPayment.amount), func.count())
+        .where(
+            ~ClientPayment.rolled_up,
+            ClientPayment.payment_date >= datetime.datetime.combine(date_from, datetime.time.min),
+            ClientPayment.payment_date < datetime.datetime.combine(date_to + datetime.timedelta(days=1),
+                                                                    datetime.time.min),
+        )
+        .group_by(tail_day, tail_method, tail_type)
+    )
+    combined = union_all(rolled, tail).subquery()
+    day_column = combined.c.day if by_day else literal(None, Date).label('day')
+    group_columns = [combined.c.payment_method, combined.c.payment_type]
+    if by_day:
+        group_columns.insert(0, combined.c.day)
+
+    stmt = (
+        select(day_column, combined.c.payment_method, combined.c.payment_type,
+               func.sum(combined.c.total), func.sum(combined.c.payments_count))
+        .group_by(*group_columns)
+        .order_by(*group_columns)
+    )
+    return [
+        PaymentTotal(day=row[0], payment_method=row[1], payment_type=row[2], total=row[3], payments_count=int(row[4]))
+        for row in (await session.execute(stmt)).all()
+    ]
+
+
+async def _rollup_loop():
+    while True:
+        await asyncio.sleep(settings.PAYMENT_ROLLUP_INTERVAL)
+        try:
+            async for session in get_db_session():
+                await roll_up_payments(session)
+        except Exception as e:
+            logging.error("Итоги оплат: ошибка при свертке оплат: %s", e, exc_info=True)
+
+
+def start_rollup_job():
+    """
+    Запускает периодическую свертку оплат в дневные итоги (вызывается при старте бота).
+    """
+    global _rollup_task
+    if settings.PAYMENT_ROLLUP_INTERVAL > 0 and _rollup_task is None:
+        _rollup_task = asyncio.create_task(_rollup_loop())
+
+
+async def stop_rollup_job():
+    global _rollup_task
+    if _rollup_task is not None:
+        _rollup_task.cancel()
+        await asyncio.gather(_rollup_task, return_exceptions=True)
+        _rollup_task = None
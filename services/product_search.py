@@ -0,0 +1,110 @@
+# services/product_search.py
+
+import re
+from decimal import Decimal
+
+from sqlalchemy import event, func, or_
+from sqlalchemy.future import select
+
+from config import settings
+from db.setup import get_db_session
+from db.models import Product
+from utils.trigram_index import RefreshingTrigramIndex
+
+# Ссылка на товар по номеру в списках и файлах: #product_id
+_PRODUCT_REF_ID = re.compile(r'#(\d+)')
+
+
+async def _load_products():
+    async for session in get_db_session():
+        result = await session.execute(select(Product.product_id, Product.name, Product.price))
+        return result.all()
+
+
+# Индекс названий товаров (с ценами) в памяти процесса — используется, если PRODUCT_SEARCH_IN_MEMORY включен
+product_index = RefreshingTrigramIndex("товаров", _load_products, settings.PRODUCT_SEARCH_REFRESH_INTERVAL)
+
+
+async def warm_up_product_index():
+    """
+    Загружает названия и цены всех товаров в индекс в памяти (при старте бота).
+    """
+    await product_index.reload()
+
+
+async def search_products(query: str, limit: int = 15) -> list[tuple[int, str, Decimal]]:
+    """
+    Ищет товары по части названия. Возвращает тройки (product_id, name, price) в порядке релевантности.
+    """
+    if settings.PRODUCT_SEARCH_IN_MEMORY:
+        return await product_index.search(query, limit)
+
+    # Запрос обслуживается GIN-индексом idx_products_name_trgm
+    stmt = select(Product.product_id, Product.name, Product.price).where(
+        or_(Product.name.icontains(query, autoescape=True), Product.name.op("%")(query))
+    ).order_by(
+        Product.name.istartswith(query, autoescape=True).desc(),
+        func.similarity(Product.name, query).desc(),
+        Product.name,
+    ).limit(limit)
+
+    async for session in get_db_session():
+        result = await session.execute(stmt)
+        return [(product_id, name, price) for product_id, name, price in result.all()]
+
+
+@event.listens_for(Product, "after_insert")
+@event.listens_for(Product, "after_update")
+def _index_product_on_change(mapper, connection, target: Product):
+    product_index.add(target.product_id, target.name, target.price)
+
+
+@event.listens_for(Product, "after_delete")
+def _unindex_product_on_delete(mapper, connection, target: Product):
+    product_index.remove(target.product_id)
+
+
+def product_ref_key(ref: str) -> str:
+    """
+    Ключ ссылки на товар из списков и файлов: название без учета регистра или #product_id.
+    """
+    return ref.strip().lower()
+
+
+async def resolve_products(session, refs: list[str]) -> dict[str, list[tuple[int, str]]]:
+    """
+    Сопоставляет ссылки на товары (точное название без учета регистра или #product_id) одним запросом
+    (индекс idx_products_name_lower). Возвращает {product_ref_key(ссылка): [(product_id, name), ...]};
+    ссылки без совпадений в результат не попадают, несколько товаров под ключом — неоднозначное название.
+    """
+    keys = {product_ref_key(ref) for ref in refs if ref.strip()}
+    if not keys:
+        return {}
+    ids = {int(key[1:]) for key in keys if _PRODUCT_REF_ID.fullmatch(key)}
+    names = sorted(keys - {f"#{product_id}" for product_id in ids})
+    result = await session.execute(
+        select(Product.product_id, Product.name)
+        .where(or_(func.lower(Product.name).in_(names), Product.product_id.in_(ids)))
+        .order_by(Product.product_id)
+    )
+    matches: dict[str, list[tuple[int, str]]] = {}
+    for product_id, name in result.all():
+        if product_id in ids:
+            matches[f"#{product_id}"] = [(product_id, name)]
+        if name.lower() in keys:
+            matches.setdefault(name.lower(), []).append((product_id, name))
+    return matches
+
+
+def pick_product(matches: dict[str, list[tuple[int, str]]], ref: str) -> tuple[int, str]:
+    """
+    Товар по ссылке из результата resolve_products. ValueError с текстом для пользователя,
+    если товар не найден или название неоднозначно.
+    """
+    candidates = matches.get(product_ref_key(ref), [])
+    if not candidates:
+        raise ValueError(f"не найден товар «{ref}»")
+    if len(candidates) > 1:
+        ids_text = ", ".join(f"#{product_id}" for product_id, _ in candidates)
+        raise ValueError(f"несколько товаров «{ref}» ({ids_text}), укажите номер")
+    return candidates[0]
@@ -0,0 +1,175 @@
+# services/receipt_import.py
+
+import csv
+import io
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Iterator
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.product_search import pick_product, resolve_products
+from utils.documents import decode_text_file
+
+try:
+    from openpyxl import load_workbook
+except ImportError: # openpyxl нужен только для накладных .xlsx
+    load_workbook = None
+
+# Накладная поставщика файлом: строки «товар, количество, цена за единицу».
+# Товар — точное название (без учета регистра) или #product_id. Порядок колонок берется
+# из строки заголовка, если она есть, иначе колонки идут в указанном порядке.
+_COLUMN_TITLES = {
+    'product': {'товар', 'наименование', 'название', 'product', 'name'},
+    'quantity': {'количество', 'кол-во', 'кол.', 'qty', 'quantity'},
+    'unit_cost': {'цена', 'себестоимость', 'цена за ед.', 'unit_cost', 'cost', 'price'},
+}
+_DEFAULT_COLUMNS = {'product': 0, 'quantity': 1, 'unit_cost': 2}
+
+
+class InvoiceFileError(ValueError):
+    """
+    Файл накладной нельзя прочитать (формат не поддерживается или не установлен openpyxl).
+    """
+
+
+@dataclass
+class InvoiceLine:
+    row_no: int
+    product: str
+    quantity: Decimal
+    unit_cost: Decimal
+
+
+@dataclass
+class InvoiceImport:
+    items: list[dict] = field(default_factory=list) # Позиции в формате receipt_items из FSM
+    errors: list[str] = field(default_factory=list)
+
+    @property
+    def total(self) -> Decimal:
+        return sum((Decimal(str(item['quantity'])) * Decimal(str(item['unit_cost'])) for item in self.items),
+                   start=Decimal('0')).quantize(Decimal('0.01'))
+
+
+def _guess_delimiter(text: str) -> str:
+    # csv.Sniffer принимает запятую в «10,50» за разделитель колонок, поэтому разделитель берется
+    # из первой непустой строки: «;» (CSV из Excel с русской локалью) или табуляция, иначе запятая
+    first_line = next((line for line in text.splitlines() if line.strip()), '')
+    semicolons, tabs = first_line.count(';'), first_line.count('\t')
+    if semicolons or tabs:
+        return ';' if semicolons >= tabs else '\t'
+    return ','
+
+
+def iter_invoice_rows(content: bytes, filename: str) -> Iterator[tuple[int, list]]:
+    """
+    Построчно читает таблицу из файла .csv/.txt (разделитель определяется автоматически)
+    или .xlsx (первый лист, режим read_only без загрузки листа целиком).
+    Возвращает пары (номер строки, значения ячеек).
+    """
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension == 'xlsx':
+        if load_workbook is None:
+            raise InvoiceFileError("Загрузка .xlsx недоступна (не установлен openpyxl). Сохраните накладную в CSV.")
+        workbook = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+        try:
+            for row_no, row in enumerate(workbook.active.iter_rows(values_only=True), start=1):
+                yield row_no, list(row)
+        finally:
+            workbook.close()
+    elif extension in ('csv', 'txt'):
+        text = decode_text_file(content)
+        reader = csv.reader(io.StringIO(text), delimiter=_guess_delimiter(text))
+        for row_no, row in enumerate(reader, start=1):
+            yield row_no, row
+    else:
+        raise InvoiceFileError("Поддерживаются файлы .csv, .txt и .xlsx.")
+
+
+def _cell_text(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value) # Номер товара из числовой ячейки Excel
+    return str(value).strip()
+
+
+def _cell_decimal(value) -> Decimal | None:
+    text = _cell_text(value).replace('\xa0', '').replace(' ', '').replace(',', '.')
+    try:
+        number = Decimal(text)
+    except InvalidOperation:
+        return None
+    return number.quantize(Decimal('0.01')) if number.is_finite() else None
+
+
+def _header_columns(row: list) -> dict[str, int] | None:
+    titles = [_cell_text(value).lower() for value in row]
+    columns = {}
+    for column, aliases in _COLUMN_TITLES.items():
+        for index, title in enumerate(titles):
+            if title in aliases:
+                columns[column] = index
+                break
+    return columns if len(columns) == len(_COLUMN_TITLES) else None
+
+
+def parse_invoice_file(content: bytes, filename: str) -> tuple[list[InvoiceLine], list[str]]:
+    """
+    Разбирает и проверяет все строки файла накладной: количество больше нуля, цена не меньше нуля.
+    Возвращает строки накладной и список ошибок. Товары не сопоставляются — см. match_invoice_lines.
+    Синхронная функция: вызывается через asyncio.to_thread, чтобы разбор не блокировал цикл событий.
+    """
+    lines = []
+    errors = []
+    columns = None
+    for row_no, row in iter_invoice_rows(content, filename):
+        if not any(_cell_text(value) for value in row):
+            continue
+        if columns is None:
+            columns = _header_columns(row)
+            if columns is not None:
+                continue
+            columns = _DEFAULT_COLUMNS
+
+        def cell(column):
+            index = columns[column]
+            return row[index] if index < len(row) else None
+
+        product = _cell_text(cell('product'))
+        quantity = _cell_decimal(cell('quantity'))
+        unit_cost = _cell_decimal(cell('unit_cost'))
+        if not product:
+            errors.append(f"строка {row_no}: не указан товар")
+        elif quantity is None or quantity <= 0:
+            errors.append(f"строка {row_no}: количество должно быть положительным числом")
+        elif unit_cost is None or unit_cost < 0:
+            errors.append(f"строка {row_no}: цена должна быть числом не меньше нуля")
+        else:
+            lines.append(InvoiceLine(row_no=row_no, product=product, quantity=quantity, unit_cost=unit_cost))
+    return lines, errors
+
+
+async def match_invoice_lines(session: AsyncSession, lines: list[InvoiceLine]) -> InvoiceImport:
+    """
+    Сопоставляет товары всех строк накладной одним запросом (resolve_products) и возвращает
+    позиции в формате receipt_items для confirm_save_receipt.
+    """
+    invoice = InvoiceImport()
+    matches = await resolve_products(session, [line.product for line in lines])
+    for line in lines:
+        try:
+            product_id, name = pick_product(matches, line.product)
+        except ValueError as e:
+            invoice.errors.append(f"строка {line.row_no}: {e}")
+            continue
+        # Как и при вводе вручную, количество и цена в состоянии FSM хранятся как float
+        invoice.items.append({
+            'product_id': product_id,
+            'product_name': name,
+            'quantity': float(line.quantity),
+            'unit_cost': float(line.unit_cost),
+            'line_total': float(line.quantity * line.unit_cost),
+        })
+    return invoice
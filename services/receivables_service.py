@@ -0,0 +1,87 @@
+# services/receivables_service.py
+
+import datetime
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from db.models import Client, ClientReceivable
+
+# Корзины просрочки: (подпись, минимум дней просрочки, максимум дней включительно или None)
+AGING_BUCKETS = [
+    ("Не просрочено", None, 0),
+    ("1–30 дн.", 1, 30),
+    ("31–60 дн.", 31, 60),
+    ("61–90 дн.", 61, 90),
+    ("Более 90 дн.", 91, None),
+]
+
+
+@dataclass
+class ClientReceivables:
+    client_id: int
+    client_name: str
+    total: Decimal
+    open_orders: int
+    buckets: list[Decimal]
+    oldest_due_date: datetime.date
+
+
+@dataclass
+class ReceivablesReport:
+    clients: list[ClientReceivables] = field(default_factory=list)
+    total: Decimal = Decimal('0.00')
+    buckets: list[Decimal] = field(default_factory=lambda: [Decimal('0.00')] * len(AGING_BUCKETS))
+
+
+async def get_receivables_report(session: AsyncSession) -> ReceivablesReport:
+    """
+    Дебиторская задолженность по клиентам с разбивкой по срокам просрочки.
+    Один сгруппированный запрос к сводке client_receivables (клиент × срок оплаты),
+    которую триггеры поддерживают в актуальном состоянии при изменении заказов и оплат.
+    Клиенты упорядочены по убыванию задолженности.
+    """
+    days_overdue = func.current_date() - ClientReceivable.due_date
+    bucket_columns = []
+    for _, min_days, max_days in AGING_BUCKETS:
+        condition = []
+        if min_days is not None:
+            condition.append(days_overdue >= min_days)
+        if max_days is not None:
+            condition.append(days_overdue <= max_days)
+        bucket_columns.append(
+            func.coalesce(func.sum(ClientReceivable.outstanding).filter(*condition), 0)
+        )
+
+    total = func.sum(ClientReceivable.outstanding)
+    stmt = (
+        select(
+            ClientReceivable.client_id,
+            Client.name,
+            total.label("total"),
+            func.sum(ClientReceivable.open_orders).label("open_orders"),
+            func.min(ClientReceivable.due_date).label("oldest_due_date"),
+            *bucket_columns,
+        )
+        .join(Client, Client.client_id == ClientReceivable.client_id)
+        .group_by(ClientReceivable.client_id, Client.name)
+        .having(total != 0)
+        .order_by(total.desc())
+    )
+
+    report = ReceivablesReport()
+    for client_id, name, client_total, open_orders, oldest_due_date, *buckets in (await session.execute(stmt)).all():
+        report.clients.append(ClientReceivables(
+            client_id=client_id,
+            client_name=name,
+            total=client_total,
+            open_orders=open_orders,
+            buckets=list(buckets),
+            oldest_due_date=oldest_due_date,
+        ))
+        report.total += client_total
+        report.buckets = [acc + value for acc, value in zip(report.buckets, buckets)]
+    return report
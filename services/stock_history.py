@@ -0,0 +1,158 @@
+# services/stock_history.py
+
+import asyncio
+import datetime
+import logging
+from decimal import Decimal
+
+from sqlalchemy import Date, func, insert, literal, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from config import settings
+from db.models import InventoryMovement, StockSnapshot, StockSnapshotRun
+from db.setup import get_db_session
+
+# Остаток на дату = снимок на ближайшее начало месяца не позже даты + движения после снимка.
+# Снимки строятся по одному месяцу от предыдущего снимка, поэтому ни запрос, ни построение
+# не суммируют всю историю движений. Движения записываются текущим временем; если задним
+# числом провести движение раньше последнего снимка, снимки после этой даты нужно удалить
+# (stock_snapshot_runs и stock_snapshots) — задача построит их заново.
+
+# Ключ транзакционной advisory-блокировки: снимки строит один экземпляр бота за раз
+STOCK_SNAPSHOT_LOCK_KEY = 7_202_200_001
+
+_snapshot_task: asyncio.Task | None = None
+
+
+def _month_start(value: datetime.date) -> datetime.date:
+    return value.replace(day=1)
+
+
+def _next_month(value: datetime.date) -> datetime.date:
+    return (value.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+
+
+def _midnight(value: datetime.date) -> datetime.datetime:
+    return datetime.datetime.combine(value, datetime.time.min)
+
+
+async def get_stock_as_of(session: AsyncSession, as_of: datetime.datetime,
+                          product_ids: list[int] | None = None) -> dict[int, Decimal]:
+    """
+    Остатки товаров на момент as_of (учитываются движения с movement_date < as_of).
+    Возвращает {product_id: количество}; без product_ids — только товары с ненулевым остатком.
+    """
+    snapshot_date = (await session.execute(
+        select(func.max(StockSnapshotRun.snapshot_date)).where(StockSnapshotRun.snapshot_date <= as_of.date())
+    )).scalar()
+
+    movements = select(InventoryMovement.product_id, InventoryMovement.quantity_change.label('quantity')).where(
+        InventoryMovement.movement_date < as_of
+    )
+    parts = []
+    if snapshot_date is not None:
+        movements = movements.where(InventoryMovement.movement_date >= _midnight(snapshot_date))
+        parts.append(
+            select(StockSnapshot.product_id, StockSnapshot.quantity)
+            .where(StockSnapshot.snapshot_date == snapshot_date)
+        )
+    parts.append(movements)
+    if product_ids is not None:
+        parts = [part.where(part.selected_columns[0].in_(product_ids)) for part in parts]
+
+    combined = union_all(*parts).subquery()
+    total = func.sum(combined.c.quantity)
+    stmt = select(combined.c.product_id, total).group_by(combined.c.product_id)
+    if product_ids is None:
+        stmt = stmt.having(total != 0)
+    stock = {product_id: quantity for product_id, quantity in (await session.execute(stmt)).all()}
+    if product_ids is not None:
+        for product_id in product_ids:
+            stock.setdefault(product_id, Decimal('0.00'))
+    return stock
+
+
+async def build_next_snapshot(session: AsyncSession) -> datetime.date | None:
+    """
+    Строит один следующий месячный снимок (предыдущий снимок + движения за месяц) и коммитит его.
+    Возвращает дату снимка или None, если все снимки до начала текущего месяца уже построены.
+    """
+    await session.execute(select(func.pg_advisory_xact_lock(STOCK_SNAPSHOT_LOCK_KEY)))
+
+    previous = (await session.execute(select(func.max(StockSnapshotRun.snapshot_date)))).scalar()
+    if previous is None:
+        first_movement = (await session.execute(select(func.min(InventoryMovement.movement_date)))).scalar()
+        if first_movement is None:
+            await session.rollback()
+            return None
+        snapshot_date = _next_month(first_movement.date())
+    else:
+        snapshot_date = _next_month(previous)
+    if snapshot_date > _month_start(datetime.date.today()):
+        await session.rollback()
+        return None
+
+    movements = select(InventoryMovement.product_id, InventoryMovement.quantity_change.label('quantity')).where(
+        InventoryMovement.movement_date < _midnight(snapshot_date)
+    )
+    parts = []
+    if previous is not None:
+        movements = movements.where(InventoryMovement.movement_date >= _midnight(previous))
+        parts.append(
+            select(StockSnapshot.product_id, StockSnapshot.quantity).where(StockSnapshot.snapshot_date == previous)
+        )
+    parts.append(movements)
+    combined = union_all(*parts).subquery()
+    total = func.sum(combined.c.quantity)
+    rows = (
+        select(literal(snapshot_date, Date), combined.c.product_id, total)
+        .group_by(combined.c.product_id)
+        .having(total != 0)
+    )
+    result = await session.execute(
+        insert(StockSnapshot).from_select(['snapshot_date', 'product_id', 'quantity'], rows)
+    )
+    await session.execute(insert(StockSnapshotRun).values(snapshot_date=snapshot_date, products=result.rowcount))
+    await session.commit()
+    return snapshot_date
+
+
+async def build_stock_snapshots() -> list[datetime.date]:
+    """
+    Достраивает недостающие месячные снимки (каждый в своей транзакции).
+    """
+    built = []
+    while True:
+        async for session in get_db_session():
+            snapshot_date = await build_next_snapshot(session)
+        if snapshot_date is None:
+            return built
+        built.append(snapshot_date)
+        logging.info("Остатки: построен снимок на %s", snapshot_date.strftime('%d.%m.%Y'))
+
+
+async def _snapshot_loop():
+    while True:
+        try:
+            await build_stock_snapshots()
+        except Exception as e:
+            logging.error("Остатки: ошибка при построении снимков: %s", e, exc_info=True)
+        await asyncio.sleep(settings.STOCK_SNAPSHOT_INTERVAL)
+
+
+def start_stock_snapshot_job():
+    """
+    Запускает построение снимков остатков: сразу при старте бота, затем периодически.
+    """
+    global _snapshot_task
+    if settings.STOCK_SNAPSHOT_INTERVAL > 0 and _snapshot_task is None:
+        _snapshot_task = asyncio.create_task(_snapshot_loop())
+
+
+async def stop_stock_snapshot_job():
+    global _snapshot_task
+    if _snapshot_task is not None:
+        _snapshot_task.cancel()
+        await asyncio.gather(_snapshot_task, return_exceptions=True)
+        _snapshot_task = None
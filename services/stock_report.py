@@ -0,0 +1,174 @@
+# services/stock_report.py
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from sqlalchemy import func, literal, tuple_
+from sqlalchemy.future import select
+
+from config import settings
+from db.models import Category, Product, Stock
+from db.setup import get_db_session
+
+# Фильтры отчета об остатках: ключ -> подпись
+STOCK_FILTERS = {
+    "all": "все товары",
+    "low": "мало на складе",
+    "out": "нет в наличии",
+}
+
+# Кэш страниц отчета до следующего изменения остатков. Версию повышают все, кто меняет stock,
+# после commit (bump_stock_version); TTL ограничивает устаревание при изменениях из других
+# процессов бота или напрямую в БД.
+_stock_version = 0
+_page_cache: OrderedDict = OrderedDict() # ключ с версией -> (значение, истекает в)
+
+
+@dataclass
+class StockItem:
+    product_id: int
+    name: str
+    category_name: str | None
+    quantity: Decimal
+    cost_per_unit: Decimal
+
+    @property
+    def value(self) -> Decimal:
+        return self.quantity * self.cost_per_unit
+
+
+@dataclass
+class StockPage:
+    items: list[StockItem] = field(default_factory=list)
+    has_prev: bool = False
+    has_next: bool = False
+
+
+@dataclass
+class StockTotals:
+    products: int
+    quantity: Decimal
+    value: Decimal
+
+
+def bump_stock_version():
+    """
+    Отмечает изменение остатков: закэшированные страницы отчета больше не используются.
+    """
+    global _stock_version
+    _stock_version += 1
+    _page_cache.clear()
+
+
+def _cache_get(key):
+    entry = _page_cache.get(key)
+    if entry is None:
+        return None
+    value, expires_at = entry
+    if expires_at < time.monotonic():
+        del _page_cache[key]
+        return None
+    _page_cache.move_to_end(key)
+    return value
+
+
+def _cache_put(key, value):
+    _page_cache[key] = (value, time.monotonic() + settings.STOCK_REPORT_CACHE_TTL)
+    while len(_page_cache) > settings.STOCK_REPORT_CACHE_SIZE:
+        _page_cache.popitem(last=False)
+
+
+def _stock_quantity():
+    # Товар без строки в stock считается отсутствующим на складе
+    return func.coalesce(Stock.quantity, 0)
+
+
+def _apply_filter(stmt, stock_filter: str):
+    if stock_filter == "low":
+        return stmt.where(_stock_quantity() <= Decimal(str(settings.STOCK_LOW_THRESHOLD)))
+    if stock_filter == "out":
+        return stmt.where(_stock_quantity() <= 0)
+    return stmt
+
+
+async def get_stock_page(stock_filter: str = "all", direction: str = "next",
+                         anchor_id: int | None = None) -> StockPage:
+    """
+    Страница отчета об остатках: товары по названию после (direction='next') или перед
+    (direction='prev') товаром anchor_id. Keyset-пагинация по (name, product_id) —
+    каждая страница читает только свои строки, каталог целиком не загружается.
+    """
+    version = _stock_version
+    cache_key = ("page", version, stock_filter, direction, anchor_id)
+    page = _cache_get(cache_key)
+    if page is not None:
+        return page
+
+    page_size = settings.STOCK_REPORT_PAGE_SIZE
+    stmt = (
+        select(Product.product_id, Product.name, Category.name.label('category_name'),
+               _stock_quantity().label('quantity'), Product.cost_per_unit)
+        .outerjoin(Stock, Stock.product_id == Product.product_id)
+        .outerjoin(Category, Category.category_id == Product.category_id)
+    )
+    stmt = _apply_filter(stmt, stock_filter)
+    if anchor_id is not None:
+        anchor_name = select(Product.name).where(Product.product_id == anchor_id).scalar_subquery()
+        anchor = tuple_(anchor_name, literal(anchor_id))
+        key = tuple_(Product.name, Product.product_id)
+        stmt = stmt.where(key < anchor if direction == "prev" else key > anchor)
+    if direction == "prev":
+        stmt = stmt.order_by(Product.name.desc(), Product.product_id.desc())
+    else:
+        stmt = stmt.order_by(Product.name, Product.product_id)
+    stmt = stmt.limit(page_size + 1) # Лишняя строка показывает, есть ли еще страница
+
+    async for session in get_db_session():
+        rows = (await session.execute(stmt)).all()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == "prev":
+        rows.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = anchor_id is not None, has_more
+
+    page = StockPage(
+        items=[StockItem(product_id=row.product_id, name=row.name, category_name=row.category_name,
+                         quantity=row.quantity, cost_per_unit=row.cost_per_unit) for row in rows],
+        has_prev=has_prev,
+        has_next=has_next,
+    )
+    if version == _stock_version: # Остатки не изменились, пока шел запрос
+        _cache_put(cache_key, page)
+    return page
+
+
+async def get_stock_totals(stock_filter: str = "all") -> StockTotals:
+    """
+    Число товаров, общее количество и стоимость остатков по себестоимости (cost_per_unit) для фильтра.
+    """
+    version = _stock_version
+    cache_key = ("totals", version, stock_filter)
+    totals = _cache_get(cache_key)
+    if totals is not None:
+        return totals
+
+    quantity = _stock_quantity()
+    stmt = (
+        select(func.count(), func.coalesce(func.sum(quantity), 0),
+               func.coalesce(func.sum(quantity * Product.cost_per_unit), 0))
+        .select_from(Product)
+        .outerjoin(Stock, Stock.product_id == Product.product_id)
+    )
+    stmt = _apply_filter(stmt, stock_filter)
+    async for session in get_db_session():
+        products, total_quantity, total_value = (await session.execute(stmt)).one()
+
+    totals = StockTotals(products=products, quantity=Decimal(total_quantity), value=Decimal(total_value))
+    if version == _stock_version:
+        _cache_put(cache_key, totals)
+    return totals
@@ -0,0 +1,182 @@
+# services/stocktake.py
+
+import datetime
+import re
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import DateTime, Integer, Numeric, String, column, insert, literal, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from db.models import InventoryMovement, Product, Stock
+from services.product_search import pick_product, resolve_products
+
+# Инвентаризация: список «товар количество» (текстом или файлом) сравнивается с stock,
+# расхождения проводятся одной транзакцией — движения 'adjustment' и изменение остатков.
+# Товар указывается точным названием (без учета регистра) или как #product_id.
+
+# Разделитель между товаром и количеством: табуляция или «;» (выгрузки из таблиц), иначе последний пробел
+_FIELD_SEPARATOR = re.compile(r'\s*[\t;]\s*')
+
+
+@dataclass
+class StocktakeLine:
+    product_id: int
+    name: str
+    book: Decimal    # Остаток по учету
+    counted: Decimal # Фактический остаток
+
+    @property
+    def difference(self) -> Decimal:
+        return self.counted - self.book
+
+
+@dataclass
+class StocktakeList:
+    counts: dict[int, Decimal] = field(default_factory=dict) # product_id -> фактический остаток
+    names: dict[int, str] = field(default_factory=dict)
+    errors: list[str] = field(default_factory=list)          # Нераспознанные, ненайденные и неоднозначные строки
+
+
+def _parse_quantity(value: str) -> Decimal | None:
+    try:
+        quantity = Decimal(value.replace(',', '.').replace(' ', ''))
+    except InvalidOperation:
+        return None
+    if not quantity.is_finite() or quantity < 0:
+        return None
+    return quantity.quantize(Decimal('0.01'))
+
+
+def parse_stocktake_lines(text: str) -> tuple[list[tuple[int, str, Decimal]], list[str]]:
+    """
+    Разбирает строки «товар количество» (разделитель — табуляция, «;» или пробел перед количеством).
+    Возвращает [(номер строки, товар, количество)] и список ошибок. Пустые строки пропускаются,
+    как и заголовок таблицы (первая непустая строка без цифр в колонке количества).
+    """
+    entries = []
+    errors = []
+    for line_no, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        parts = _FIELD_SEPARATOR.split(line)
+        if len(parts) >= 2:
+            product, quantity_text = parts[0], parts[1]
+        else:
+            product, _, quantity_text = line.rpartition(' ')
+        quantity = _parse_quantity(quantity_text)
+        if not product.strip() or quantity is None:
+            is_header = not entries and not errors and not any(char.isdigit() for char in quantity_text)
+            if not is_header:
+                errors.append(f"строка {line_no}: не распознано «{line[:60]}»")
+            continue
+        entries.append((line_no, product.strip(), quantity))
+    return entries, errors
+
+
+async def read_stocktake_list(session: AsyncSession, text: str) -> StocktakeList:
+    """
+    Разбирает список инвентаризации и сопоставляет товары одним запросом. Повторные строки
+    одного товара суммируются — товар мог лежать в нескольких местах склада.
+    """
+    entries, errors = parse_stocktake_lines(text)
+    stocktake = StocktakeList(errors=errors)
+    matches = await resolve_products(session, [product for _, product, _ in entries])
+
+    for line_no, product, quantity in entries:
+        try:
+            product_id, name = pick_product(matches, product)
+        except ValueError as e:
+            stocktake.errors.append(f"строка {line_no}: {e}")
+            continue
+        stocktake.counts[product_id] = stocktake.counts.get(product_id, Decimal('0.00')) + quantity
+        stocktake.names[product_id] = name
+    return stocktake
+
+
+async def compare_with_stock(session: AsyncSession, counts: dict[int, Decimal],
+                             names: dict[int, str]) -> list[StocktakeLine]:
+    """
+    Сравнивает фактические остатки с stock одним запросом. Возвращает все посчитанные товары
+    по названию; товар без строки в stock считается с нулевым остатком.
+    """
+    if not counts:
+        return []
+    result = await session.execute(select(Stock.product_id, Stock.quantity).where(Stock.product_id.in_(list(counts))))
+    book = dict(result.all())
+    lines = [
+        StocktakeLine(product_id=product_id, name=names.get(product_id, f"#{product_id}"),
+                      book=book.get(product_id, Decimal('0.00')), counted=counted)
+        for product_id, counted in counts.items()
+    ]
+    lines.sort(key=lambda line: (line.name, line.product_id))
+    return lines
+
+
+async def post_stocktake(session: AsyncSession, counts: dict[int, Decimal], names: dict[int, str],
+                         description: str) -> list[StocktakeLine]:
+    """
+    Проводит инвентаризацию за постоянное число запросов, независимо от количества товаров:
+    1. недостающие строки stock создаются с нулем, и все строки посчитанных товаров блокируются
+       SELECT ... FOR UPDATE (по product_id, как upsert_stock) — разница считается от остатков,
+       которые до коммита никто не изменит, в том числе приходом товара без строки в stock;
+    2. один INSERT движений 'adjustment' в inventory_movements (себестоимость из products);
+    3. один upsert в stock, записывающий фактический остаток.
+    Возвращает проведенные расхождения (только ненулевые). Коммит остается за вызывающим кодом.
+    Между предпросмотром и проведением остатки могли измениться — расхождения считаются заново.
+    """
+    if not counts:
+        return []
+
+    # FOR UPDATE блокирует только существующие строки: без этого приход мог бы создать строку
+    # после чтения остатков, и разница посчиталась бы от нуля
+    await session.execute(
+        pg_insert(Stock)
+        .values([{'product_id': product_id, 'quantity': Decimal('0.00')} for product_id in sorted(counts)])
+        .on_conflict_do_nothing(index_elements=[Stock.product_id])
+    )
+    result = await session.execute(
+        select(Stock.product_id, Stock.quantity)
+        .where(Stock.product_id.in_(list(counts)))
+        .order_by(Stock.product_id)
+        .with_for_update()
+    )
+    book = dict(result.all())
+    lines = [
+        StocktakeLine(product_id=product_id, name=names.get(product_id, f"#{product_id}"),
+                      book=book.get(product_id, Decimal('0.00')), counted=counted)
+        for product_id, counted in sorted(counts.items())
+    ]
+    lines = [line for line in lines if line.difference != 0]
+    if not lines:
+        return []
+
+    differences = values(
+        column('product_id', Integer), column('quantity_change', Numeric(10, 2)), name='differences'
+    ).data([(line.product_id, line.difference) for line in lines])
+    await session.execute(
+        insert(InventoryMovement).from_select(
+            ['product_id', 'movement_type', 'quantity_change', 'movement_date',
+             'source_document_type', 'description', 'unit_cost'],
+            select(
+                differences.c.product_id,
+                literal('adjustment', String),
+                differences.c.quantity_change,
+                literal(datetime.datetime.now(), DateTime),
+                literal('stocktake', String),
+                literal(description, String),
+                Product.cost_per_unit,
+            ).join(Product, Product.product_id == differences.c.product_id)
+        )
+    )
+    counted = pg_insert(Stock).values([{'product_id': line.product_id, 'quantity': line.counted} for line in lines])
+    await session.execute(counted.on_conflict_do_update(
+        index_elements=[Stock.product_id],
+        set_={'quantity': counted.excluded.quantity},
+    ))
+
+    lines.sort(key=lambda line: (line.name, line.product_id))
+    return lines
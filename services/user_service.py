@@ -0,0 +1,102 @@
+# services/user_service.py
+
+import asyncio
+import logging
+import time
+
+from sqlalchemy import event, inspect
+from sqlalchemy.future import select
+
+from config import settings
+from db.setup import get_db_session
+from db.models import Employee
+
+
+class EmployeeCache:
+    """
+    Общий для процесса кэш сотрудников по id_telegram.
+    Хранит найденных сотрудников (TTL) и отдельно — неизвестных пользователей
+    (негативный кэш с коротким TTL), чтобы не ходить в БД на каждый апдейт.
+    """
+
+    def __init__(self, ttl: float, negative_ttl: float):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: dict[int, tuple[Employee | None, float]] = {} # id_telegram -> (сотрудник или None, истекает в)
+        self._inflight: dict[int, asyncio.Future] = {} # Параллельные запросы одного и того же пользователя
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, id_telegram: int) -> Employee | None:
+        """
+        Возвращает сотрудника по id_telegram (или None, если он не зарегистрирован).
+        При промахе делает один запрос в БД; параллельные промахи по тому же id ждут его результат.
+        """
+        entry = self._entries.get(id_telegram)
+        if entry is not None and entry[1] > time.monotonic():
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        inflight = self._inflight.get(id_telegram)
+        if inflight is not None:
+            return await inflight
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[id_telegram] = future
+        try:
+            employee = await self._load(id_telegram)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception() # Помечаем исключение как обработанное, если никто не ждал
+            raise
+        else:
+            self._store(id_telegram, employee)
+            future.set_result(employee)
+            return employee
+        finally:
+            self._inflight.pop(id_telegram, None)
+
+    async def _load(self, id_telegram: int) -> Employee | None:
+        async for session in get_db_session():
+            result = await session.execute(select(Employee).where(Employee.id_telegram == id_telegram))
+            employee = result.scalar_one_or_none()
+            if employee is not None:
+                # Отвязываем объект от сессии: все колонки уже загружены, объект живет в кэше
+                session.expunge(employee)
+            return employee
+
+    def _store(self, id_telegram: int, employee: Employee | None):
+        ttl = self.ttl if employee is not None else self.negative_ttl
+        self._entries[id_telegram] = (employee, time.monotonic() + ttl)
+
+    def invalidate(self, id_telegram: int):
+        """
+        Сбрасывает запись о пользователе (например, после смены роли или регистрации).
+        """
+        self._entries.pop(id_telegram, None)
+        logging.debug("EmployeeCache: запись для %s сброшена", id_telegram)
+
+    def invalidate_all(self):
+        """
+        Полностью очищает кэш сотрудников.
+        """
+        self._entries.clear()
+        logging.debug("EmployeeCache: кэш полностью очищен")
+
+
+employee_cache = EmployeeCache(ttl=settings.EMPLOYEE_CACHE_TTL,
+                               negative_ttl=settings.EMPLOYEE_NEGATIVE_CACHE_TTL)
+
+
+# Любое изменение сотрудника через ORM сбрасывает его запись в кэше
+# (в том числе негативную — для только что зарегистрированного пользователя).
+@event.listens_for(Employee, "after_insert")
+@event.listens_for(Employee, "after_update")
+@event.listens_for(Employee, "after_delete")
+def _invalidate_employee_on_change(mapper, connection, target: Employee):
+    # Если id_telegram поменялся, сбрасываем и старое значение
+    history = inspect(target).attrs.id_telegram.history
+    for id_telegram in (*history.deleted, target.id_telegram):
+        if id_telegram is not None:
+            employee_cache.invalidate(id_telegram)
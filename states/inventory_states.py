@@ -13,4 +13,11 @@ class InventoryReceiptStates(StatesGroup):
     waiting_for_product_quantity = State()   # Ожидаем количество товара
     waiting_for_unit_cost = State()          # Ожидаем себестоимость за единицу
     confirming_line_item = State()           # Подтверждение позиции (добавить еще/завершить)
-    confirming_receipt = State()             # Окончательное подтверждение всей накладной
\ No newline at end of file
+    confirming_receipt = State()             # Окончательное подтверждение всей накладной
+
+class StocktakeStates(StatesGroup):
+    """
+    Состояния инвентаризации (/adjust_inventory).
+    """
+    waiting_for_counts = State()   # Ожидаем список "товар количество" или файл
+    confirming_stocktake = State() # Предпросмотр расхождений, ожидаем подтверждение
@@ -0,0 +1,34 @@
+# tests/test_receipt_import.py
+
+import unittest
+from decimal import Decimal
+
+from services.receipt_import import parse_invoice_file
+
+
+class ParseInvoiceFileTest(unittest.TestCase):
+
+    def test_semicolon_csv_with_decimal_commas_without_header(self):
+        # CSV из Excel с русской локалью: «;» между колонками, запятая в цене
+        lines, errors = parse_invoice_file("Молоко;2;10,50\nХлеб;3;5,25\n".encode(), "a.csv")
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            [(line.product, line.quantity, line.unit_cost) for line in lines],
+            [("Молоко", Decimal('2.00'), Decimal('10.50')), ("Хлеб", Decimal('3.00'), Decimal('5.25'))],
+        )
+
+    def test_comma_csv_with_header(self):
+        content = "quantity,product,price\n2,Молоко,10.50\n".encode()
+        lines, errors = parse_invoice_file(content, "a.csv")
+        self.assertEqual(errors, [])
+        self.assertEqual([(line.row_no, line.product, line.unit_cost) for line in lines],
+                         [(2, "Молоко", Decimal('10.50'))])
+
+    def test_tab_separated_cp1251(self):
+        lines, errors = parse_invoice_file("Сахар\t1,5\t30\n".encode('cp1251'), "a.txt")
+        self.assertEqual(errors, [])
+        self.assertEqual([(line.product, line.quantity) for line in lines], [("Сахар", Decimal('1.50'))])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+# utils/documents.py
+
+import io
+
+from aiogram import Bot
+from aiogram.types import Document
+
+
+async def download_document(bot: Bot, document: Document) -> bytes:
+    """
+    Скачивает присланный пользователем файл в память (размер проверяет вызывающий код).
+    """
+    content = io.BytesIO()
+    await bot.download(document, destination=content)
+    return content.getvalue()
+
+
+def decode_text_file(content: bytes) -> str:
+    """
+    Текст файла .txt/.csv: UTF-8 (с BOM или без), иначе cp1251 — так сохраняет CSV Excel под Windows.
+    """
+    try:
+        return content.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return content.decode('cp1251')
@@ -0,0 +1,160 @@
+# utils/keyboards.py
+
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from sqlalchemy import event, literal, tuple_
+from sqlalchemy.future import select
+
+from config import settings
+from db.setup import get_db_session
+from db.models import Product
+from utils.text_formatter import escape_markdown_v2
+
+
+@dataclass(frozen=True)
+class ProductPage:
+    """
+    Готовая страница выбора товара: ряды кнопок и данные для навигации.
+    """
+    rows: tuple
+    first_id: int
+    last_id: int
+    has_prev: bool
+    has_next: bool
+
+
+# Версия каталога товаров: меняется при любом изменении товаров, вместе с ней сбрасывается кэш страниц
+_catalog_version = 0
+_page_cache: OrderedDict = OrderedDict()
+_pickers: list = []
+
+
+def invalidate_product_catalog():
+    """
+    Сбрасывает кэш страниц выбора товара (вызывать после изменения товаров в обход ORM).
+    """
+    global _catalog_version
+    _catalog_version += 1
+    _page_cache.clear()
+
+
+@event.listens_for(Product, "after_insert")
+@event.listens_for(Product, "after_update")
+@event.listens_for(Product, "after_delete")
+def _invalidate_catalog_on_change(mapper, connection, target):
+    invalidate_product_catalog()
+
+
+class ProductPicker:
+    """
+    Постраничный выбор товара для всех сценариев (заказы, поступления).
+    Страницы выбираются keyset-пагинацией по (name, product_id) и кэшируются
+    вместе с кнопками до следующего изменения каталога.
+    """
+
+    def __init__(self, select_prefix: str, page_prefix: str, escape_labels: bool = False,
+                 page_size: int = settings.PRODUCT_PICKER_PAGE_SIZE):
+        self.select_prefix = select_prefix # callback_data кнопки товара: f"{select_prefix}{product_id}"
+        self.page_prefix = page_prefix     # callback_data навигации: f"{page_prefix}:{direction}:{anchor_id}"
+        self.escape_labels = escape_labels
+        self.page_size = page_size
+        _pickers.append(self)
+
+    def parse_page_callback(self, callback_data: str) -> tuple[str, int]:
+        """
+        Разбирает callback_data кнопки навигации в (direction, anchor_id).
+        """
+        _, direction, anchor_id = callback_data.split(":")
+        return direction, int(anchor_id)
+
+    async def build_keyboard(self, direction: str = "next", anchor_id: int | None = None,
+                             extra_rows: list | None = None) -> InlineKeyboardMarkup | None:
+        """
+        Возвращает клавиатуру страницы товаров после (direction='next') или перед (direction='prev')
+        товаром anchor_id; без anchor_id — первую страницу. None, если товаров в каталоге нет.
+        """
+        page = await self.get_page(direction, anchor_id)
+        if page is None and anchor_id is not None:
+            # Товар-якорь мог быть удален — начинаем с первой страницы
+            page = await self.get_page()
+        if page is None:
+            return None
+
+        buttons = list(page.rows)
+        nav_row = []
+        if page.has_prev:
+            nav_row.append(InlineKeyboardButton(text="◀️ Назад", callback_data=f"{self.page_prefix}:prev:{page.first_id}"))
+        if page.has_next:
+            nav_row.append(InlineKeyboardButton(text="Вперед ▶️", callback_data=f"{self.page_prefix}:next:{page.last_id}"))
+        if nav_row:
+            buttons.append(nav_row)
+        buttons.extend(extra_rows or [])
+        return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+    async def get_page(self, direction: str = "next", anchor_id: int | None = None) -> ProductPage | None:
+        cache_key = (_catalog_version, self.select_prefix, self.escape_labels, self.page_size, direction, anchor_id)
+        page = _page_cache.get(cache_key)
+        if page is not None:
+            _page_cache.move_to_end(cache_key)
+            return page
+
+        version = _catalog_version
+        page = await self._load_page(direction, anchor_id)
+        if page is not None and version == _catalog_version:
+            _page_cache[cache_key] = page
+            while len(_page_cache) > settings.PRODUCT_PICKER_CACHE_PAGES:
+                _page_cache.popitem(last=False)
+        return page
+
+    async def _load_page(self, direction: str, anchor_id: int | None) -> ProductPage | None:
+        stmt = select(Product.product_id, Product.name, Product.price)
+        if anchor_id is not None:
+            anchor_name = select(Product.name).where(Product.product_id == anchor_id).scalar_subquery()
+            anchor = tuple_(anchor_name, literal(anchor_id))
+            key = tuple_(Product.name, Product.product_id)
+            stmt = stmt.where(key < anchor if direction == "prev" else key > anchor)
+        if direction == "prev":
+            stmt = stmt.order_by(Product.name.desc(), Product.product_id.desc())
+        else:
+            stmt = stmt.order_by(Product.name, Product.product_id)
+        stmt = stmt.limit(self.page_size + 1) # Лишняя строка показывает, есть ли еще страница
+
+        async for session in get_db_session():
+            result = await session.execute(stmt)
+            products = result.all()
+
+        has_more = len(products) > self.page_size
+        products = products[:self.page_size]
+        if not products:
+            return None
+        if direction == "prev":
+            products.reverse()
+            has_prev, has_next = has_more, True
+        else:
+            has_prev, has_next = anchor_id is not None, has_more
+
+        rows = []
+        for product in products:
+            button_text = f"{product.name} ({product.price} грн)"
+            if self.escape_labels:
+                button_text = escape_markdown_v2(button_text)
+            rows.append([InlineKeyboardButton(text=button_text, callback_data=f"{self.select_prefix}{product.product_id}")])
+
+        return ProductPage(rows=tuple(rows), first_id=products[0].product_id, last_id=products[-1].product_id,
+                           has_prev=has_prev, has_next=has_next)
+
+
+async def warm_up_product_pickers():
+    """
+    Заранее строит первые страницы всех выборщиков товара (вызывается при старте бота).
+    """
+    for picker in _pickers:
+        await picker.get_page()
+
+
+# Выбор товара в заказе (создание заказа и добавление товара в существующий заказ)
+order_product_picker = ProductPicker(select_prefix="select_product_order_", page_prefix="products_order")
+# Выбор товара в поступлении от поставщика
+receipt_product_picker = ProductPicker(select_prefix="select_product_add_", page_prefix="products_add", escape_labels=True)
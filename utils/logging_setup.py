@@ -0,0 +1,127 @@
+# utils/logging_setup.py
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+
+from config import settings
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Кладет запись в очередь, не форматируя ее в потоке цикла событий.
+    Подставляются только аргументы сообщения (msg % args), чтобы изменение объектов
+    после вызова logging не влияло на запись; трассировки исключений и сам вывод
+    форматируются в фоновом потоке QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Переполнение очереди не должно блокировать бота — запись теряется
+            pass
+
+
+class DebugSamplingFilter(logging.Filter):
+    """
+    Пропускает только долю rate записей уровня DEBUG (остальные уровни — все).
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Одна запись — одна строка JSON (для сборщиков логов).
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def parse_log_levels(value: str) -> dict[str, str]:
+    """
+    Разбирает строку вида "aiogram=INFO,aiohttp.client=WARNING" в {логгер: уровень}.
+    """
+    levels = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        name, level = item.split("=", 1)
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging():
+    """
+    Настраивает логирование процесса: хэндлер корневого логгера только кладет записи
+    в очередь, вывод выполняет QueueListener в отдельном потоке. Уровни задаются
+    LOG_LEVEL и LOG_LEVELS, формат — LOG_FORMAT ('text' или 'json').
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    if settings.LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    output_handler = logging.StreamHandler(sys.stderr)
+    output_handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    queue_handler = _NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(DebugSamplingFilter(settings.LOG_DEBUG_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    for name, level in parse_log_levels(settings.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """
+    Дописывает оставшиеся в очереди записи и останавливает фоновый поток.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
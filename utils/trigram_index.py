@@ -0,0 +1,209 @@
+# utils/trigram_index.py
+
+import asyncio
+import logging
+import re
+import time
+from collections import Counter, defaultdict
+from typing import Any, Awaitable, Callable, Iterable
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def trigrams(text: str) -> set[str]:
+    """
+    Триграммы строки по правилам pg_trgm: каждое слово дополняется двумя пробелами слева и одним справа.
+    """
+    result = set()
+    for word in _WORD_RE.findall(text.lower()):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def _inner_trigrams(text: str) -> set[str]:
+    # Триграммы без дополнения пробелами: они есть в любой строке, содержащей text как подстроку
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """
+    Инвертированный индекс триграмм в памяти процесса: id -> текст.
+    Ищет по подстроке и по сходству триграмм (как similarity() в pg_trgm).
+    """
+
+    def __init__(self, threshold: float = 0.3):
+        self.threshold = threshold
+        self._texts: dict[int, str] = {}
+        self._normalized: dict[int, str] = {}
+        self._trigrams: dict[int, frozenset] = {}
+        self._postings: dict[str, set[int]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def add(self, item_id: int, text: str):
+        if item_id in self._texts:
+            self.remove(item_id)
+        item_trigrams = frozenset(trigrams(text))
+        self._texts[item_id] = text
+        self._normalized[item_id] = normalize(text)
+        self._trigrams[item_id] = item_trigrams
+        for trigram in item_trigrams:
+            self._postings[trigram].add(item_id)
+        # Для поиска по подстроке индексируем и триграммы без дополнения пробелами
+        for trigram in _inner_trigrams(self._normalized[item_id]) - item_trigrams:
+            self._postings[trigram].add(item_id)
+
+    def remove(self, item_id: int):
+        if item_id not in self._texts:
+            return
+        for trigram in self._trigrams.pop(item_id) | _inner_trigrams(self._normalized[item_id]):
+            postings = self._postings.get(trigram)
+            if postings is not None:
+                postings.discard(item_id)
+                if not postings:
+                    del self._postings[trigram]
+        del self._texts[item_id]
+        del self._normalized[item_id]
+
+    def clear(self):
+        self._texts.clear()
+        self._normalized.clear()
+        self._trigrams.clear()
+        self._postings.clear()
+
+    def search(self, query: str, limit: int = 15) -> list[tuple[int, str, float]]:
+        """
+        Возвращает до limit пар (id, текст, сходство): сначала совпадения с начала строки,
+        затем по подстроке, затем по убыванию сходства триграмм.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+        query_trigrams = trigrams(query)
+
+        overlap = Counter()
+        for trigram in query_trigrams | _inner_trigrams(query):
+            for item_id in self._postings.get(trigram, ()):
+                overlap[item_id] += 1
+        if len(query) < 3:
+            # У коротких запросов нет внутренних триграмм — подстроку ищем перебором
+            candidates = set(overlap) | {item_id for item_id, text in self._normalized.items() if query in text}
+        else:
+            candidates = overlap.keys()
+
+        ranked = []
+        for item_id in candidates:
+            text = self._normalized[item_id]
+            item_trigrams = self._trigrams[item_id]
+            common = len(query_trigrams & item_trigrams)
+            union = len(query_trigrams) + len(item_trigrams) - common
+            similarity = common / union if union else 0.0
+            is_substring = query in text
+            if not is_substring and similarity < self.threshold:
+                continue
+            ranked.append(((not text.startswith(query), not is_substring, -similarity, text), item_id, similarity))
+
+        ranked.sort()
+        return [(item_id, self._texts[item_id], similarity) for _, item_id, similarity in ranked[:limit]]
+
+
+class RefreshingTrigramIndex:
+    """
+    Индекс триграмм, который загружается из БД и перезагружается раз в refresh_interval секунд
+    (подтягивает записи, добавленные другими процессами бота). load возвращает тройки
+    (id, текст, дополнительное значение), например цену товара.
+
+    Первая загрузка выполняется при запросе (параллельные запросы ждут одну загрузку),
+    а перезагрузка — в фоновой задаче: поиск до ее окончания идет по старому индексу.
+    Изменения, пришедшие во время перезагрузки (add/remove), применяются и к новому индексу.
+    """
+
+    def __init__(self, name: str, load: Callable[[], Awaitable[Iterable[tuple[int, str, Any]]]],
+                 refresh_interval: float):
+        self.name = name
+        self.refresh_interval = refresh_interval
+        self._load = load
+        self._index = TrigramIndex()
+        self._values: dict[int, Any] = {}
+        self._loaded_at: float | None = None
+        self._lock = asyncio.Lock()
+        self._changes: list[tuple] | None = None # Изменения во время перезагрузки
+        self._refresh_task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    async def reload(self):
+        """
+        Загружает записи заново и подменяет индекс целиком.
+        """
+        async with self._lock:
+            await self._reload_locked()
+
+    async def _reload_locked(self):
+        self._changes = []
+        try:
+            rows = await self._load()
+            index, values = TrigramIndex(self._index.threshold), {}
+            for item_id, text, value in rows:
+                index.add(item_id, text)
+                values[item_id] = value
+            for change in self._changes:
+                self._apply(index, values, *change)
+        finally:
+            self._changes = None
+        self._index, self._values = index, values
+        self._loaded_at = time.monotonic()
+        logging.info("Индекс %s загружен: %s записей", self.name, len(index))
+
+    async def _refresh(self):
+        try:
+            await self.reload()
+        except Exception as e:
+            logging.error("Индекс %s: ошибка при перезагрузке: %s", self.name, e, exc_info=True)
+
+    async def search(self, query: str, limit: int = 15) -> list[tuple[int, str, Any]]:
+        """
+        Ищет по индексу (см. TrigramIndex.search) и возвращает тройки (id, текст, дополнительное значение).
+        """
+        if self._loaded_at is None:
+            async with self._lock:
+                if self._loaded_at is None: # Загрузку мог уже выполнить другой запрос
+                    await self._reload_locked()
+        elif time.monotonic() - self._loaded_at > self.refresh_interval:
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self._refresh())
+        return [(item_id, text, self._values.get(item_id)) for item_id, text, _ in self._index.search(query, limit)]
+
+    @staticmethod
+    def _apply(index: TrigramIndex, values: dict[int, Any], item_id: int, text: str | None, value: Any):
+        if text is None:
+            index.remove(item_id)
+            values.pop(item_id, None)
+        else:
+            index.add(item_id, text)
+            values[item_id] = value
+
+    def add(self, item_id: int, text: str, value: Any = None):
+        """
+        Добавляет или обновляет запись (для изменений через ORM в этом процессе).
+        """
+        if self._changes is not None:
+            self._changes.append((item_id, text, value))
+        if self._loaded_at is not None:
+            self._apply(self._index, self._values, item_id, text, value)
+
+    def remove(self, item_id: int):
+        if self._changes is not None:
+            self._changes.append((item_id, None, None))
+        self._apply(self._index, self._values, item_id, None, None)